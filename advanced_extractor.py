@@ -8,7 +8,9 @@
 import os
 import sys
 import json
-import asyncio
+import queue
+import threading
+import functools
 import concurrent.futures
 from pathlib import Path
 from typing import Dict, List, Optional
@@ -19,14 +21,40 @@ except ImportError:
     print("错误：未安装 yt-dlp，请运行: pip install yt-dlp")
     sys.exit(1)
 
+from download_archive import DownloadArchive, entry_key
+from metadata_cache import MetadataCache
+from ydl_pool import YoutubeDLPool
+from async_engine import AdaptiveConcurrencyController, AsyncDownloadEngine
+from metrics import MetricsCollector, MetricsLogger, MetricsReporter
+from segmented_download import SegmentedYoutubeDL
+from pipe_encoder import PipeEncoder, is_pipeable
+from playlist_stream import PlaylistStream
+from entry_record import iter_records, project_entries
+from rate_limiter import RateLimiter, with_rate_limit
+from batch_scheduler import FairShareScheduler, parse_batch_lines
+from transcoder import AUDIO_ENCODERS, transcode_audio
+from content_store import ContentStore, EntryCost
+from short_link import ShortLinkResolver, is_short_link
+from library_catalog import LibraryCatalog, print_files
+from retry_scheduler import RetryScheduler
+from audio_tags import ID3Error, build_tags, collect_tags, entry_tags, has_tags, retag, tag_context, with_tagging
+from format_policy import FormatPolicy
+from download_options import advanced_parser
+
 class AdvancedBilibiliExtractor:
     def __init__(self, config_file="config.json"):
         self.config = self.load_config(config_file)
         self.output_dir = Path(self.config['output_directory'])
         self.output_dir.mkdir(exist_ok=True)
+        self.metrics = MetricsCollector()
         
         # 设置yt-dlp选项
         self.setup_ydl_options()
+        self.setup_archive()
+        self.setup_metadata_cache()
+        self.setup_content_store()
+        self.setup_short_links()
+        self.setup_catalog()
     
     def load_config(self, config_file: str) -> Dict:
         """加载配置文件"""
@@ -48,6 +76,107 @@ class AdvancedBilibiliExtractor:
             "filename_template": "%(playlist_index)02d_%(title)s.%(ext)s",
             "max_concurrent_downloads": 3,
             "retry_attempts": 3,
+            "reuse_ydl_instances": True,
+            "transcode_mode": "auto",
+            "download_archive": {
+                "enabled": True,
+                "path": ".download_archive.sqlite"
+            },
+            "metadata_cache": {
+                "enabled": True,
+                "path": ".metadata_cache.sqlite",
+                "ttl": 86400,
+                "stream_url_ttl": 1800
+            },
+            "async_engine": {
+                "enabled": False,
+                "min_concurrency": 1,
+                "max_concurrency": 8,
+                "initial_concurrency": 2,
+                "backoff_factor": 0.5,
+                "adjust_interval": 5,
+                "throttle_retries": 3
+            },
+            "retry": {
+                "enabled": True,
+                "throttled": {"max_retries": 6, "base_delay": 10, "max_delay": 300},
+                "network": {"max_retries": 4, "base_delay": 2, "max_delay": 60},
+                "forbidden": {"max_retries": 0},
+                "not_found": {"max_retries": 0},
+                "other": {"max_retries": 1, "base_delay": 5, "max_delay": 30},
+                "circuit_breaker": {"enabled": True, "threshold": 5, "window": 30, "cooldown": 60,
+                                    "max_cooldown": 600}
+            },
+            "pipeline": {
+                "enabled": False,
+                "transcode_workers": 0,
+                "queue_size": 0
+            },
+            "streaming": {
+                "enabled": False,
+                "max_in_flight": 0
+            },
+            "rate_limits": {
+                "enabled": False,
+                "total_bytes_per_second": 0,
+                "hosts": {
+                    "api": {
+                        "match": ["api.bilibili.com", "bilibili.com", "*.bilibili.com", "b23.tv"],
+                        "requests_per_second": 2,
+                        "burst": 4
+                    },
+                    "cdn": {
+                        "match": ["*.bilivideo.com", "*.bilivideo.cn", "*.akamaized.net", "*.hdslb.com"],
+                        "bytes_per_second": 0
+                    }
+                }
+            },
+            "segmented_download": {
+                "enabled": False,
+                "segments": 4,
+                "min_segment_size": 8388608,
+                "chunk_retries": 3
+            },
+            "pipe_encode": {
+                "enabled": False,
+                "chunk_size": 262144
+            },
+            "metrics": {
+                "enabled": True,
+                "interval": 5,
+                "console_status": True,
+                "jsonl_path": "",
+                "prometheus_textfile": "",
+                "http_port": 0
+            },
+            "daemon": {
+                "host": "127.0.0.1",
+                "port": 8765,
+                "job_workers": 2,
+                "db_path": ".daemon_jobs.sqlite"
+            },
+            "content_store": {
+                "enabled": True,
+                "path": ".content_store",
+                "link_mode": "auto"
+            },
+            "short_links": {
+                "path": ".short_links.sqlite",
+                "ttl": 2592000,
+                "timeout": 10,
+                "max_workers": 8
+            },
+            "library_catalog": {
+                "enabled": True,
+                "path": ".library_catalog.sqlite"
+            },
+            "tagging": {
+                "enabled": True
+            },
+            "format_policy": {
+                "policy": "smallest-sufficient",
+                "min_ratio": 0.9
+            },
             "download_options": {
                 "writeinfojson": True,
                 "writethumbnail": False
@@ -60,21 +189,74 @@ class AdvancedBilibiliExtractor:
     
     def setup_ydl_options(self):
         """设置yt-dlp选项"""
+        # 按目标格式和码率选择不降低输出质量的最小音频流，而不是总是下载码率最高的
+        try:
+            self.format_policy = FormatPolicy.from_config(self.config.get('format_policy', {}),
+                                                          self.config['audio_format'], self.config['audio_quality'])
+        except ValueError as e:
+            print(f"⚠️ {e}，改用 best")
+            self.format_policy = FormatPolicy('best', self.config['audio_format'], self.config['audio_quality'])
+        
         self.ydl_opts = {
-            'format': 'bestaudio/best',
+            'format': self.format_policy,
             'outtmpl': str(self.output_dir / self.config['filename_template']),
             'extractaudio': True,
             'audioformat': self.config['audio_format'],
             'audioquality': self.config['audio_quality'],
+            # 源编码已满足 audio_format 时 FFmpegExtractAudio 直接流复制
             'postprocessors': [{
                 'key': 'FFmpegExtractAudio',
-                **self.config['postprocessor_options']
+                **self.config['postprocessor_options'],
+                'preferredcodec': self.config['audio_format'],
+                'preferredquality': self.config['audio_quality']
             }],
             'ignoreerrors': True,
             'retries': self.config.get('retry_attempts', 3),
+            # 中断的 .part 文件从已下载的字节处续传
+            'continuedl': True,
+            'nopart': False,
             **self.config.get('download_options', {})
         }
         
+        # always 模式：下载阶段不做后处理，下载完成后由 transcoder 按 audio_quality 重编码
+        # （FFmpegExtractAudio 在源编码已满足目标格式时直接跳过 FFmpeg，无法强制重编码）
+        self.force_transcode = (self.config.get('transcode_mode', 'auto') == 'always'
+                                and self.config['audio_format'] in AUDIO_ENCODERS)
+        if self.force_transcode:
+            self.ydl_opts['postprocessors'] = []
+        
+        # 曲目序号、专辑、艺术家和标题随提取音频的 FFmpeg 一起写入，不再单独处理一遍
+        self.tagging = self.config.get('tagging', {}).get('enabled', True)
+        if self.tagging:
+            self.ydl_opts['audio_tags'] = True
+        
+        # 单个音频流按 Range 分段并行下载
+        if self.config.get('segmented_download', {}).get('enabled'):
+            self.ydl_opts['segmented_download'] = self.config['segmented_download']
+        
+        # 边下载边编码：音频流直接写入 FFmpeg 标准输入，不落地原始文件
+        pipe_config = self.config.get('pipe_encode', {})
+        self.pipe_encoder = None
+        if pipe_config.get('enabled'):
+            self.pipe_encoder = PipeEncoder(
+                audio_format=self.config['audio_format'],
+                quality=self.config['audio_quality'],
+                mode=self.config.get('transcode_mode', 'auto'),
+                chunk_size=pipe_config.get('chunk_size', 256 * 1024)
+            )
+        
+        # 全局限速：所有工作线程共享同一组令牌桶
+        rate_config = self.config.get('rate_limits', {})
+        self.rate_limiter = RateLimiter.from_config(rate_config) if rate_config.get('enabled') else None
+        if self.rate_limiter is not None:
+            self.ydl_opts['rate_limiter'] = self.rate_limiter
+        
+        # 多线程下 yt-dlp 自带的进度条会互相覆盖，改由指标汇总器统一输出状态行
+        if self.config.get('metrics', {}).get('enabled', True):
+            self.ydl_opts['noprogress'] = True
+            self.ydl_opts['postprocessor_hooks'] = [self.metrics.postprocessor_hook]
+            self.ydl_opts['logger'] = MetricsLogger(self.metrics)
+        
         # 添加代理设置
         if self.config.get('proxy', {}).get('enabled'):
             proxy_config = self.config['proxy']
@@ -87,103 +269,866 @@ class AdvancedBilibiliExtractor:
         
         if self.config.get('headers'):
             self.ydl_opts['http_headers'] = self.config['headers']
+        
+        # 选项变化后旧实例作废
+        if getattr(self, 'ydl_pool', None) is not None:
+            self.ydl_pool.close()
+        self.ydl_pool = self.create_ydl_pool(self.ydl_opts)
+    
+    def create_ydl_pool(self, opts: Dict) -> YoutubeDLPool:
+        """创建按工作线程复用的 YoutubeDL 实例池"""
+        ydl_class = SegmentedYoutubeDL if opts.get('segmented_download') else yt_dlp.YoutubeDL
+        if opts.get('rate_limiter') is not None:
+            ydl_class = with_rate_limit(ydl_class)
+        if opts.get('audio_tags'):
+            ydl_class = with_tagging(ydl_class)
+        return YoutubeDLPool(opts, reuse=self.config.get('reuse_ydl_instances', True), ydl_class=ydl_class)
+    
+    def metadata_ydl_class(self, opts: Dict):
+        """枚举合集用的 YoutubeDL 类；启用限速时 API 请求同样计入（会在 opts 中加入限速器）"""
+        if self.rate_limiter is None:
+            return yt_dlp.YoutubeDL
+        opts['rate_limiter'] = self.rate_limiter
+        return with_rate_limit()
+    
+    def setup_archive(self):
+        """打开下载归档（路径相对于输出目录）"""
+        archive_config = self.config.get('download_archive', {})
+        if not archive_config.get('enabled', True):
+            self.archive = None
+            return
+        archive_path = Path(archive_config.get('path', '.download_archive.sqlite'))
+        if not archive_path.is_absolute():
+            archive_path = self.output_dir / archive_path
+        self.archive = DownloadArchive(archive_path)
+    
+    def setup_metadata_cache(self):
+        """打开元数据缓存（路径相对于输出目录）"""
+        cache_config = self.config.get('metadata_cache', {})
+        if not cache_config.get('enabled', True):
+            self.metadata_cache = None
+            return
+        cache_path = Path(cache_config.get('path', '.metadata_cache.sqlite'))
+        if not cache_path.is_absolute():
+            cache_path = self.output_dir / cache_path
+        self.metadata_cache = MetadataCache(
+            cache_path,
+            ttl=cache_config.get('ttl', 86400),
+            stream_url_ttl=cache_config.get('stream_url_ttl', 1800)
+        )
+    
+    def setup_content_store(self):
+        """打开内容去重存储（路径相对于输出目录；多个输出目录可共用同一个绝对路径）"""
+        store_config = self.config.get('content_store', {})
+        if not store_config.get('enabled', True):
+            self.content_store = None
+            return
+        store_path = Path(store_config.get('path', '.content_store'))
+        if not store_path.is_absolute():
+            store_path = self.output_dir / store_path
+        self.content_store = ContentStore(store_path, store_config.get('link_mode', 'auto'))
+    
+    def setup_short_links(self):
+        """创建短链接解析器（缓存路径相对于输出目录，请求计入全局限速）"""
+        link_config = self.config.get('short_links', {})
+        cache_path = Path(link_config.get('path', '.short_links.sqlite'))
+        if not cache_path.is_absolute():
+            cache_path = self.output_dir / cache_path
+        if getattr(self, 'short_links', None) is not None:
+            self.short_links.close()
+        self.short_links = ShortLinkResolver(
+            cache_path,
+            ttl=link_config.get('ttl', 30 * 86400),
+            timeout=link_config.get('timeout', 10),
+            max_workers=link_config.get('max_workers', 8),
+            proxy=self.ydl_opts.get('proxy'),
+            user_agent=self.config.get('user_agent'),
+            rate_limiter=self.rate_limiter
+        )
+    
+    def setup_catalog(self):
+        """打开输出目录的文件索引（路径相对于输出目录），完成的文件随归档一起写入"""
+        catalog_config = self.config.get('library_catalog', {})
+        if not catalog_config.get('enabled', True):
+            self.catalog = None
+            return
+        catalog_path = Path(catalog_config.get('path', '.library_catalog.sqlite'))
+        if not catalog_path.is_absolute():
+            catalog_path = self.output_dir / catalog_path
+        self.catalog = LibraryCatalog(self.output_dir, catalog_path)
+    
+    def resolve_urls(self, urls: List[str]) -> List[str]:
+        """并发解析其中的 b23.tv 短链接（结果缓存），其他URL原样返回"""
+        short_links = [url for url in urls if is_short_link(url)]
+        if not short_links:
+            return urls
+        print(f"🔗 解析 {len(short_links)} 个短链接...")
+        resolved = self.short_links.resolve_many(short_links)
+        return [resolved.get(url.strip(), url) for url in urls]
+    
+    def is_archived(self, key) -> bool:
+        """检查条目是否已在归档中完成"""
+        if self.archive is None or key is None:
+            return False
+        return self.archive.contains(*key, self.config['audio_format'], self.config['audio_quality'])
     
     def progress_hook(self, d):
-        """下载进度回调"""
-        if d['status'] == 'downloading':
-            if 'total_bytes' in d:
-                percent = d['downloaded_bytes'] / d['total_bytes'] * 100
-                print(f"\r下载进度: {percent:.1f}% ({d['downloaded_bytes']}/{d['total_bytes']} bytes)", end='')
-            elif '_percent_str' in d:
-                print(f"\r下载进度: {d['_percent_str']}", end='')
-        elif d['status'] == 'finished':
-            print(f"\n✓ 下载完成: {d['filename']}")
-    
-    def download_single_video(self, url: str, title: str = None) -> bool:
-        """下载单个视频的音频"""
-        try:
-            opts = self.ydl_opts.copy()
-            opts['progress_hooks'] = [self.progress_hook]
+        """下载进度回调：字节数和阶段耗时交给指标汇总器，只输出完整的行"""
+        self.metrics.progress_hook(d)
+        if d['status'] == 'finished':
+            print(f"✓ 下载完成: {d['filename']}")
+    
+    def start_metrics_reporter(self) -> Optional[MetricsReporter]:
+        """按配置启动指标输出（状态行、JSON lines、Prometheus 文本文件、/metrics 接口）"""
+        metrics_config = self.config.get('metrics', {})
+        if not metrics_config.get('enabled', True):
+            return None
+        reporter = MetricsReporter(
+            self.metrics,
+            interval=metrics_config.get('interval', 5),
+            jsonl_path=metrics_config.get('jsonl_path') or None,
+            prometheus_textfile=metrics_config.get('prometheus_textfile') or None,
+            http_port=metrics_config.get('http_port') or None,
+            console=metrics_config.get('console_status', True)
+        )
+        if reporter.http_port:
+            print(f"📈 指标接口: http://127.0.0.1:{reporter.http_port}/metrics")
+        return reporter.start()
+    
+    def run_download(self, url: str, pool: YoutubeDLPool, entry_id: str = None,
+                     progress_hook=None, entry: Dict = None, transcode: bool = True) -> Optional[str]:
+        """使用当前工作线程的 YoutubeDL 实例下载，成功时返回最终文件路径
+        
+        元数据缓存中有仍在媒体地址有效期内的解析结果时直接交给 yt-dlp 下载，
+        不再重复解析；否则解析并下载，同时把解析结果写回缓存。
+        条目在合集中的序号和合集标题随解析结果传给后处理器，写入标签；
+        transcode=False 时 always 模式也不在这里重编码（流水线由转码池处理）
+        """
+        self.metrics.begin_entry()
+        cache = self.metadata_cache if entry_id else None
+        cached_info = cache.get_entry(entry_id) if cache else None
+        extra_info = tag_context(entry)
+        if self.pipe_encoder is not None:
+            return self.run_pipe_download(url, pool, cached_info, entry_id, progress_hook, extra_info)
+        
+        with pool.acquire(progress_hook or self.progress_hook) as (ydl, finished_files):
+            if cached_info is not None:
+                info = None
+                try:
+                    info = ydl.process_ie_result(cached_info, download=True, extra_info=extra_info)
+                except yt_dlp.utils.DownloadError:
+                    pass
+                if finished_files:
+                    info = info or dict(cached_info, **extra_info)
+                    return self.transcode_download(finished_files[-1], info) if transcode else finished_files[-1]
+                # 缓存的媒体地址可能已失效，回退为重新解析
             
+            info = ydl.extract_info(url, download=True, extra_info=extra_info)
+            if info is not None and cache:
+                cache.put_entry(entry_id, ydl.sanitize_info(info, remove_private_keys=True))
+        if not finished_files:
+            return None
+        return self.transcode_download(finished_files[-1], info) if transcode else finished_files[-1]
+    
+    def transcode_download(self, filepath: str, info: Dict = None) -> Optional[str]:
+        """always 模式下把下载的原始音频按 audio_format / audio_quality 重编码（标签随编码写入），
+        返回最终文件路径，转码失败时返回 None；其他模式原样返回
+        """
+        if not self.force_transcode:
+            return filepath
+        source = Path(filepath)
+        target = source.with_suffix(f".{self.config['audio_format']}")
+        tags = build_tags(info, str(target)) if self.tagging and info else None
+        with self.metrics.stage('transcode'):
+            transcoded = transcode_audio(source, target, self.config['audio_format'], self.config['audio_quality'],
+                                         mode='always', tags=tags)
+        return str(target) if transcoded else None
+    
+    def run_pipe_download(self, url: str, pool: YoutubeDLPool, cached_info: Dict = None, entry_id: str = None,
+                          progress_hook=None, extra_info: Dict = None) -> Optional[str]:
+        """边下载边编码，成功时返回最终文件路径；下载或编码错误向上抛出
+        
+        只解析不下载，再把选定的音频流直接送入 FFmpeg；
+        不是单个 HTTP 音频流时（如音视频分离、分片协议）交给 yt-dlp 按普通流程下载
+        """
+        cache = self.metadata_cache if entry_id else None
+        with pool.acquire(progress_hook or self.progress_hook) as (ydl, finished_files):
+            info = None
+            if cached_info is not None:
+                info = ydl.process_ie_result(dict(cached_info), download=False, extra_info=extra_info)
+                if info is not None and is_pipeable(info):
+                    try:
+                        return self.pipe_encode(ydl, info)
+                    except yt_dlp.networking.exceptions.HTTPError:
+                        # 缓存的媒体地址可能已失效，回退为重新解析
+                        info = None
+            if info is None:
+                info = ydl.extract_info(url, download=False, extra_info=extra_info)
+                if info is None:
+                    return None
+                if cache:
+                    cache.put_entry(entry_id, ydl.sanitize_info(info, remove_private_keys=True))
+            if is_pipeable(info):
+                return self.pipe_encode(ydl, info)
+            ydl.process_ie_result(info, download=True)
+        return finished_files[-1] if finished_files else None
+    
+    def pipe_encode(self, ydl, info: Dict) -> str:
+        """把解析结果中的音频流编码为输出目录中的最终文件"""
+        output = ydl.prepare_filename(dict(info, ext=self.config['audio_format']))
+        Path(output).parent.mkdir(parents=True, exist_ok=True)
+        self.pipe_encoder.encode(ydl, info, output, build_tags(info, output) if self.tagging else None)
+        return output
+    
+    def restore_from_store(self, key, entry: Dict) -> Optional[str]:
+        """内容存储中已有该条目（相同格式和质量）时直接链接到输出目录，不再下载和转码"""
+        if self.content_store is None or key is None or entry is None:
+            return None
+        audio_format = self.config['audio_format']
+        with self.ydl_pool.acquire() as (ydl, _):
+            filename = ydl.prepare_filename(dict(entry, ext=audio_format))
+        try:
+            target = self.content_store.restore(key, audio_format, self.config['audio_quality'], filename,
+                                                shareable=self.store_shareable(entry))
+        except OSError as e:
+            print(f"⚠️ 无法从内容存储链接: {e}")
+            return None
+        if target is None:
+            return None
+        print(f"♻️ 从内容存储复用: {target.name}")
+        self.retag_output(target, entry)
+        return str(target)
+    
+    def store_shareable(self, entry: Dict):
+        """输出文件能否与存储对象共享硬链接的判断：对象已带本条目的标签（改写不会改变内容）时才共享"""
+        if not self.tagging or entry is None:
+            return None
+        return lambda object_path, target: has_tags(object_path, entry_tags(target, entry))
+    
+    def retag_output(self, filepath, entry: Dict):
+        """内容存储中的对象带着最先下载它的合集的标签，链接到输出目录后改写为本条目的专辑和曲目序号"""
+        if not self.tagging or entry is None:
+            return
+        try:
+            retag(filepath, entry)
+        except (OSError, ID3Error) as e:
+            print(f"⚠️ 无法改写标签: {e}")
+    
+    def store_output(self, key, filepath: str, cost: EntryCost = None, entry: Dict = None) -> str:
+        """把完成的文件存入内容存储，返回输出文件路径"""
+        if self.content_store is None or not filepath:
+            return filepath
+        try:
+            return str(self.content_store.add(key, self.config['audio_format'], self.config['audio_quality'],
+                                              filepath, cost, lambda path: self.retag_output(path, entry),
+                                              self.store_shareable(entry)))
+        except OSError as e:
+            print(f"⚠️ 无法写入内容存储: {e}")
+            return filepath
+    
+    def record_archive(self, key, title: str = None, filepath: str = None, entry: Dict = None):
+        """将完成的条目写入归档和文件索引"""
+        if self.archive is not None and key is not None:
+            self.archive.record(*key, self.config['audio_format'], self.config['audio_quality'],
+                                title=title, filepath=filepath or None)
+        if self.catalog is not None and filepath:
+            self.catalog.record(filepath, info=entry, title=None if entry else title)
+    
+    def fetch_entry(self, url: str, pool: YoutubeDLPool, key=None, entry_id: str = None,
+                    progress_hook=None, entry: Dict = None) -> Optional[str]:
+        """取得一个条目的音频文件（内容存储中已有时直接链接），返回文件路径；下载错误向上抛出"""
+        filepath = self.restore_from_store(key, entry)
+        if filepath is not None:
+            return filepath
+        cost = EntryCost()
+        with cost.measure():
+            filepath = self.run_download(url, pool, entry_id, cost.wrap(progress_hook or self.progress_hook), entry)
+        if filepath is None:
+            return None
+        return self.store_output(key, filepath, cost, entry)
+    
+    def download_single_video(self, url: str, title: str = None, key=None, entry_id: str = None,
+                              progress_hook=None, entry: Dict = None) -> bool:
+        """下载单个视频的音频（内容存储中已有时直接链接）"""
+        try:
             if title:
-                print(f"\n🎵 正在处理: {title}")
+                print(f"🎵 正在处理: {title}")
+            
+            filepath = self.fetch_entry(url, self.ydl_pool, key, entry_id, progress_hook, entry)
+            if filepath is None:
+                return False
             
-            with yt_dlp.YoutubeDL(opts) as ydl:
-                ydl.download([url])
-                return True
+            self.record_archive(key, title, filepath, entry)
+            return True
         except Exception as e:
-            print(f"\n❌ 下载失败: {e}")
+            print(f"❌ 下载失败: {e}")
             return False
     
-    def get_playlist_info(self, url: str) -> Optional[Dict]:
-        """获取播放列表信息"""
+    def get_playlist_info(self, url: str, flat: bool = False) -> Optional[Dict]:
+        """获取播放列表信息（flat=True 时只枚举条目，不解析每个视频）"""
         try:
-            with yt_dlp.YoutubeDL({'quiet': True}) as ydl:
+            opts = {'quiet': True}
+            if flat:
+                opts['extract_flat'] = 'in_playlist'
+            with self.metadata_ydl_class(opts)(opts) as ydl:
                 info = ydl.extract_info(url, download=False)
                 return info
         except Exception as e:
             print(f"获取视频信息失败: {e}")
             return None
     
-    def download_playlist_concurrent(self, url: str) -> bool:
+    def get_collection_info(self, url: str, refresh: bool = False) -> Optional[Dict]:
+        """获取平铺的合集信息，TTL 内直接使用元数据缓存"""
+        cache = self.metadata_cache
+        if cache and not refresh:
+            info = cache.get_collection(url)
+            if info is not None:
+                print(f"💾 使用缓存的合集信息")
+                return info
+        
+        info = self.get_playlist_info(url, flat=True)
+        if not info or not cache:
+            return info
+        
+        info = yt_dlp.YoutubeDL.sanitize_info(info)
+        if 'entries' in info:
+            stale = cache.put_collection(url, info)
+            if stale:
+                print(f"🔄 {stale} 个条目为新增或已变化，将重新解析")
+        else:
+            # 单个视频枚举时已完整解析，直接交给下载步骤
+            cache.put_entry(info.get('id'), yt_dlp.YoutubeDL.sanitize_info(info, remove_private_keys=True))
+        return info
+    
+    def download_playlist_concurrent(self, url: str, refresh: bool = False) -> bool:
         """并发下载播放列表"""
+        if self.config.get('streaming', {}).get('enabled'):
+            return self.download_playlist_streaming(url)
+        
         print(f"🔍 正在分析播放列表: {url}")
         
-        info = self.get_playlist_info(url)
+        with self.metrics.stage('metadata'):
+            info = self.get_collection_info(url, refresh)
         if not info:
             return False
         
         if 'entries' not in info:
-            # 单个视频
-            title = info.get('title', 'Unknown')
-            print(f"📹 检测到单个视频: {title}")
-            return self.download_single_video(url, title)
+            return self.download_single_info(url, info)
         
-        # 播放列表
-        entries = [entry for entry in info['entries'] if entry is not None]
+        # 播放列表：条目投影为紧凑记录，原始字典不再保留
+        entries = project_entries(info)
         total_videos = len(entries)
         
         print(f"📋 检测到播放列表，共 {total_videos} 个视频")
+        
+        # 在任何网络请求之前跳过归档中已完成的条目
+        pending = []
+        for entry in entries:
+            key = entry.key
+            if self.is_archived(key):
+                continue
+            pending.append((entry.index, entry, key))
+        
+        skipped_count = total_videos - len(pending)
+        if skipped_count:
+            self.metrics.inc('skipped', skipped_count)
+            print(f"⏭️ 归档中已完成 {skipped_count} 个，跳过")
+        if not pending:
+            print(f"\n🎉 播放列表已全部完成！")
+            return True
+        
+        # 边下载边编码时下载和转码已合并为一步，不再使用流水线
+        if self.config.get('pipeline', {}).get('enabled') and self.pipe_encoder is None:
+            success_count = skipped_count + self.download_entries_pipeline(pending, total_videos)
+        elif self.config.get('async_engine', {}).get('enabled'):
+            success_count = skipped_count + self.download_entries_async(pending, total_videos)
+        elif self.config.get('retry', {}).get('enabled', False):
+            success_count = skipped_count + self.download_entries_scheduled(pending, total_videos)
+        else:
+            success_count = skipped_count + self.download_entries_threaded(pending, total_videos)
+        
+        print(f"\n🎉 播放列表处理完成！")
+        print(f"📊 成功: {success_count}/{total_videos} 个视频")
+        print(f"📁 文件保存在: {self.output_dir.absolute()}")
+        
+        return success_count > 0
+    
+    def download_single_info(self, url: str, info: Dict) -> bool:
+        """枚举结果为单个视频时直接下载"""
+        title = info.get('title', 'Unknown')
+        print(f"📹 检测到单个视频: {title}")
+        key = entry_key(info)
+        if self.is_archived(key):
+            print(f"⏭️ 已在归档中，跳过: {title}")
+            return True
+        success = self.download_single_video(url, title, key, info.get('id'), entry=info)
+        self.metrics.inc('completed' if success else 'failed')
+        self.ydl_pool.close()
+        return success
+    
+    def download_playlist_streaming(self, url: str) -> bool:
+        """流式模式：边枚举边下载
+        
+        条目按页惰性取得，到达后立即提交给下载线程；在途任务数有上限（枚举在此阻塞），
+        已完成的条目不保留在内存中，内存占用与合集大小无关
+        """
+        print(f"🔍 正在流式枚举: {url}")
+        stream_opts = {}
+        stream = PlaylistStream(url, stream_opts, self.metadata_ydl_class(stream_opts))
+        try:
+            with self.metrics.stage('metadata'):
+                info = stream.open()
+        except Exception as e:
+            print(f"获取视频信息失败: {e}")
+            stream.close()
+            return False
+        if not info:
+            stream.close()
+            return False
+        
+        if not stream.is_playlist:
+            stream.close()
+            return self.download_single_info(url, info)
+        
+        total = stream.count
+        max_workers = self.config['max_concurrent_downloads']
+        max_in_flight = self.config.get('streaming', {}).get('max_in_flight') or max_workers * 2
+        print(f"📋 合集: {stream.title}" + (f"，共 {total} 个视频" if total else ""))
+        print(f"🔧 使用 {max_workers} 个并发下载，最多 {max_in_flight} 个在途任务")
+        
+        slots = threading.BoundedSemaphore(max_in_flight)
+        counts = {'success': 0, 'failed': 0, 'skipped': 0, 'in_flight': 0}
+        count_lock = threading.Lock()
+        
+        def on_done(label, title, future):
+            with count_lock:
+                counts['in_flight'] -= 1
+                self.metrics.set_queue_depth('download', max(counts['in_flight'] - max_workers, 0))
+                if future.result():
+                    counts['success'] += 1
+                else:
+                    counts['failed'] += 1
+            slots.release()
+            if future.result():
+                self.metrics.inc('completed')
+                print(f"✅ {label} 完成: {title}")
+            else:
+                self.metrics.inc('failed')
+                print(f"❌ {label} 失败: {title}")
+        
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            try:
+                for entry in iter_records(stream, stream.title):
+                    i, key = entry.index, entry.key
+                    if self.is_archived(key):
+                        counts['skipped'] += 1
+                        self.metrics.inc('skipped')
+                        continue
+                    title = entry.get('title', f'Video_{i}')
+                    video_url = entry.get('webpage_url') or entry.get('url')
+                    label = f"[{i}/{total}]" if total else f"[{i}]"
+                    # 在途任务已满时等待，枚举随下载进度推进
+                    slots.acquire()
+                    with count_lock:
+                        counts['in_flight'] += 1
+                    future = executor.submit(self.download_single_video, video_url, f"{label} {title}",
+                                             key, entry.get('id'), entry=entry)
+                    future.add_done_callback(functools.partial(on_done, label, title))
+            except Exception as e:
+                print(f"⚠️ 枚举中断: {e}，等待已提交的任务完成")
+        
+        stream.close()
+        self.ydl_pool.close()
+        
+        processed = counts['success'] + counts['failed'] + counts['skipped']
+        if counts['skipped']:
+            print(f"⏭️ 归档中已完成 {counts['skipped']} 个，跳过")
+        print(f"\n🎉 播放列表处理完成！")
+        print(f"📊 成功: {counts['success'] + counts['skipped']}/{processed} 个视频")
+        print(f"📁 文件保存在: {self.output_dir.absolute()}")
+        return counts['success'] + counts['skipped'] > 0
+    
+    def download_batch(self, batch: List, refresh: bool = False) -> bool:
+        """批量模式：枚举所有合集，按 BV 号全局去重，由一个全局工作线程池按公平份额下载
+        
+        batch 为 [(url, priority)]；优先级是调度权重，同一视频出现在多个合集中时归优先级最高的合集
+        """
+        max_workers = self.config['max_concurrent_downloads']
+        print(f"📚 批量模式: {len(batch)} 个URL，{max_workers} 个全局下载线程")
+        
+        def enumerate_collection(item):
+            with self.metrics.stage('metadata'):
+                info = self.get_collection_info(item[0], refresh)
+            if info and 'entries' in info:
+                project_entries(info)
+            return info
+        
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            infos = list(executor.map(enumerate_collection, batch))
+        
+        scheduler = FairShareScheduler()
+        seen = set()
+        duplicate_count = 0
+        skipped_count = 0
+        results = {}
+        # 优先级高的合集先认领共享的视频
+        for index in sorted(range(len(batch)), key=lambda k: -batch[k][1]):
+            url, priority = batch[index]
+            info = infos[index]
+            if not info:
+                print(f"❌ #{index + 1} 无法获取信息: {url}")
+                continue
+            entries = info['entries'] if 'entries' in info else [info]
+            items = []
+            for i, entry in enumerate(entries, 1):
+                key = entry_key(entry)
+                dedup_key = key or entry.get('webpage_url') or entry.get('url')
+                if dedup_key in seen:
+                    duplicate_count += 1
+                    continue
+                seen.add(dedup_key)
+                if self.is_archived(key):
+                    skipped_count += 1
+                    continue
+                if 'entries' not in info:
+                    entry = dict(entry, webpage_url=entry.get('webpage_url') or url)
+                items.append((i, len(entries), entry, key))
+            results[url] = {'index': index + 1, 'title': info.get('title', url), 'queued': len(items),
+                            'success': 0, 'failed': 0}
+            scheduler.add_queue(url, items, priority)
+            print(f"  #{index + 1} (优先级 {priority:g}) {info.get('title', url)}: {len(items)}/{len(entries)} 个待下载")
+        
+        if duplicate_count:
+            print(f"🔁 跨合集重复的视频 {duplicate_count} 个，只下载一次")
+        if skipped_count:
+            self.metrics.inc('skipped', skipped_count)
+            print(f"⏭️ 归档中已完成 {skipped_count} 个，跳过")
+        
+        count_lock = threading.Lock()
+        
+        def worker():
+            while True:
+                item = scheduler.next()
+                if item is None:
+                    return
+                url, (i, total, entry, key) = item
+                self.metrics.set_queue_depth('batch', scheduler.pending())
+                collection = results[url]
+                title = entry.get('title', f'Video_{i}')
+                label = f"#{collection['index']} [{i}/{total}]"
+                video_url = entry.get('webpage_url') or entry.get('url')
+                success = self.download_single_video(video_url, f"{label} {title}", key, entry.get('id'),
+                                                     entry=entry)
+                with count_lock:
+                    collection['success' if success else 'failed'] += 1
+                self.metrics.inc('completed' if success else 'failed')
+                print(f"{'✅' if success else '❌'} {label} {'完成' if success else '失败'}: {title}")
+        
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for _ in range(max_workers):
+                executor.submit(worker)
+        self.ydl_pool.close()
+        
+        print(f"\n🎉 批量处理完成！")
+        for url, collection in sorted(results.items(), key=lambda item: item[1]['index']):
+            print(f"  #{collection['index']} {collection['title']}: "
+                  f"成功 {collection['success']}/{collection['queued']}，失败 {collection['failed']}")
+        print(f"📁 文件保存在: {self.output_dir.absolute()}")
+        return bool(results) and all(collection['failed'] == 0 for collection in results.values())
+    
+    def download_entries_threaded(self, pending: List, total_videos: int) -> int:
+        """每个线程完整执行下载和转码，返回成功数"""
         print(f"🔧 使用 {self.config['max_concurrent_downloads']} 个并发下载")
         
         success_count = 0
         
         # 使用线程池进行并发下载
-        max_workers = min(self.config['max_concurrent_downloads'], total_videos)
+        max_workers = min(self.config['max_concurrent_downloads'], len(pending))
         
         with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # 提交所有下载任务
+            # 在途任务不超过线程数的两倍，其余条目只以紧凑记录留在 pending 中
+            upcoming = iter(pending)
             future_to_video = {}
-            for i, entry in enumerate(entries, 1):
-                if entry is None:
-                    continue
-                
+            
+            def submit_next():
+                item = next(upcoming, None)
+                if item is None:
+                    return
+                i, entry, key = item
                 title = entry.get('title', f'Video_{i}')
                 video_url = entry.get('webpage_url') or entry.get('url')
-                
-                future = executor.submit(self.download_single_video, video_url, f"[{i}/{total_videos}] {title}")
+                future = executor.submit(self.download_single_video, video_url, f"[{i}/{total_videos}] {title}",
+                                         key, entry.get('id'), entry=entry)
                 future_to_video[future] = (i, title)
             
-            # 等待所有任务完成
-            for future in concurrent.futures.as_completed(future_to_video):
-                video_num, title = future_to_video[future]
+            for _ in range(max_workers * 2):
+                submit_next()
+            
+            # 每完成一个提交下一个，直到全部完成
+            remaining = len(pending)
+            while future_to_video:
+                done, _ = concurrent.futures.wait(future_to_video, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    video_num, title = future_to_video.pop(future)
+                    remaining -= 1
+                    # 尚未开始的条目数
+                    self.metrics.set_queue_depth('download', max(remaining - max_workers, 0))
+                    try:
+                        if future.result():
+                            success_count += 1
+                            self.metrics.inc('completed')
+                            print(f"✅ [{video_num}/{total_videos}] 完成: {title}")
+                        else:
+                            self.metrics.inc('failed')
+                            print(f"❌ [{video_num}/{total_videos}] 失败: {title}")
+                    except Exception as e:
+                        self.metrics.inc('failed')
+                        print(f"❌ [{video_num}/{total_videos}] 异常: {title} - {e}")
+                    submit_next()
+        
+        # 工作线程已退出，释放其实例
+        self.ydl_pool.close()
+        return success_count
+    
+    def download_entries_scheduled(self, pending: List, total_videos: int) -> int:
+        """工作线程从重试队列领取条目，失败的条目按错误类型退避后放回队列末尾，返回成功数
+        
+        连接中断等瞬时错误仍由 yt-dlp 按 retries / fragment_retries 原地重试，
+        重试用尽或提取阶段的错误（412、地区限制等）抛出用于分类；
+        持续限流时熔断器暂停所有线程领取新条目
+        """
+        retry_config = self.config.get('retry', {})
+        scheduler = RetryScheduler.from_config(retry_config)
+        max_workers = min(self.config['max_concurrent_downloads'], len(pending))
+        print(f"🔧 使用 {max_workers} 个并发下载（失败按错误类型退避重试）")
+        
+        scheduled_opts = self.ydl_opts.copy()
+        scheduled_opts['ignoreerrors'] = False
+        scheduled_pool = self.create_ydl_pool(scheduled_opts)
+        
+        for index in range(len(pending)):
+            scheduler.add(index)
+        success_count = 0
+        count_lock = threading.Lock()
+        
+        def worker():
+            nonlocal success_count
+            while True:
+                index = scheduler.next()
+                if index is None:
+                    return
+                i, entry, key = pending[index]
+                title = entry.get('title', f'Video_{i}')
+                video_url = entry.get('webpage_url') or entry.get('url')
+                attempt = scheduler.attempts(index)
+                retry_note = f" (第 {attempt + 1} 次尝试)" if attempt else ""
+                print(f"🎵 正在处理: [{i}/{total_videos}] {title}{retry_note}")
                 try:
-                    if future.result():
-                        success_count += 1
-                        print(f"✅ [{video_num}/{total_videos}] 完成: {title}")
-                    else:
-                        print(f"❌ [{video_num}/{total_videos}] 失败: {title}")
+                    filepath = self.fetch_entry(video_url, scheduled_pool, key, entry.get('id'), entry=entry)
+                    if filepath is None:
+                        raise yt_dlp.utils.DownloadError("没有生成音频文件")
                 except Exception as e:
-                    print(f"❌ [{video_num}/{total_videos}] 异常: {title} - {e}")
+                    error_class, delay = scheduler.fail(index, e)
+                    self.metrics.set_queue_depth('retry', scheduler.deferred())
+                    if delay is None:
+                        self.metrics.inc('failed')
+                        print(f"❌ [{i}/{total_videos}] 失败 ({error_class}): {title} - {e}")
+                    else:
+                        self.metrics.inc('retries')
+                        print(f"🔁 [{i}/{total_videos}] {error_class}，{delay:.1f} 秒后重试: {title}")
+                    remaining = scheduler.breaker_remaining()
+                    if remaining and error_class == 'throttled':
+                        print(f"⛔ 持续限流，暂停领取新条目 {remaining:.0f} 秒")
+                    continue
+                scheduler.succeed(index)
+                self.record_archive(key, f"[{i}/{total_videos}] {title}", filepath, entry)
+                with count_lock:
+                    success_count += 1
+                self.metrics.inc('completed')
+                print(f"✅ [{i}/{total_videos}] 完成: {title}")
         
-        print(f"\n🎉 播放列表处理完成！")
-        print(f"📊 成功: {success_count}/{total_videos} 个视频")
-        print(f"📁 文件保存在: {self.output_dir.absolute()}")
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(max_workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        scheduled_pool.close()
         
-        return success_count > 0
+        stats = scheduler.stats
+        errors = '，'.join(f"{name[len('errors_'):]} {count}" for name, count in stats.items()
+                          if name.startswith('errors_') and count)
+        if errors:
+            print(f"📊 错误分类: {errors}；重试 {stats['retries']} 次，放弃 {stats['gave_up']} 个，"
+                  f"熔断 {stats['breaker_trips']} 次")
+        return success_count
+    
+    def download_entries_async(self, pending: List, total_videos: int) -> int:
+        """asyncio 引擎：并发数随吞吐量自适应，遇到限流时回退，返回成功数"""
+        engine_config = self.config.get('async_engine', {})
+        controller = AdaptiveConcurrencyController(
+            min_concurrency=engine_config.get('min_concurrency', 1),
+            max_concurrency=engine_config.get('max_concurrency', self.config['max_concurrent_downloads']),
+            initial_concurrency=engine_config.get('initial_concurrency'),
+            backoff_factor=engine_config.get('backoff_factor', 0.5),
+            adjust_interval=engine_config.get('adjust_interval', 5.0)
+        )
+        engine = AsyncDownloadEngine(controller, throttle_retries=engine_config.get('throttle_retries', 3),
+                                     metrics=self.metrics)
+        
+        print(f"🔧 自适应并发: {controller.min_concurrency}-{controller.max_concurrency}，初始 {controller.limit}")
+        
+        # 错误需要抛出才能识别限流
+        engine_opts = self.ydl_opts.copy()
+        engine_opts['ignoreerrors'] = False
+        engine_pool = self.create_ydl_pool(engine_opts)
+        
+        def worker(index):
+            i, entry, key = pending[index]
+            title = entry.get('title', f'Video_{i}')
+            video_url = entry.get('webpage_url') or entry.get('url')
+            last_bytes = 0
+            
+            def progress_hook(d):
+                nonlocal last_bytes
+                downloaded = d.get('downloaded_bytes') or 0
+                controller.record_bytes(downloaded - last_bytes)
+                last_bytes = downloaded
+                self.progress_hook(d)
+            
+            print(f"🎵 正在处理: [{i}/{total_videos}] {title}")
+            filepath = self.fetch_entry(video_url, engine_pool, key, entry.get('id'), progress_hook, entry)
+            if filepath is None:
+                return False
+            self.record_archive(key, f"[{i}/{total_videos}] {title}", filepath, entry)
+            return True
+        
+        success_count = 0
+        
+        def on_done(index, result, error):
+            nonlocal success_count
+            i, entry, _ = pending[index]
+            title = entry.get('title', f'Video_{i}')
+            if result:
+                success_count += 1
+                self.metrics.inc('completed')
+                print(f"✅ [{i}/{total_videos}] 完成: {title} (当前并发 {controller.limit})")
+            elif error is not None:
+                self.metrics.inc('failed')
+                print(f"❌ [{i}/{total_videos}] 异常: {title} - {error}")
+            else:
+                self.metrics.inc('failed')
+                print(f"❌ [{i}/{total_videos}] 失败: {title}")
+        
+        engine.run(range(len(pending)), worker, on_done)
+        engine_pool.close()
+        return success_count
+    
+    def download_entries_pipeline(self, pending: List, total_videos: int) -> int:
+        """两级流水线：下载池（网络）通过有界队列交给转码池（CPU），返回成功数"""
+        pipeline_config = self.config.get('pipeline', {})
+        download_workers = min(self.config['max_concurrent_downloads'], len(pending))
+        transcode_workers = pipeline_config.get('transcode_workers') or os.cpu_count() or 1
+        queue_size = pipeline_config.get('queue_size') or transcode_workers * 2
+        
+        print(f"🔧 流水线模式: {download_workers} 个下载线程, {transcode_workers} 个转码线程, 队列容量 {queue_size}")
+        
+        # 下载阶段只保留原始音频流，转码交给转码池
+        download_opts = self.ydl_opts.copy()
+        download_opts['postprocessors'] = []
+        download_pool = self.create_ydl_pool(download_opts)
+        
+        transcode_queue = queue.Queue(maxsize=queue_size)
+        success_count = 0
+        count_lock = threading.Lock()
+        
+        def download_stage(i, entry, key):
+            nonlocal success_count
+            title = entry.get('title', f'Video_{i}')
+            video_url = entry.get('webpage_url') or entry.get('url')
+            cost = EntryCost()
+            # 下载阶段不做后处理，标签在下载完成时从解析结果生成，转码时写入
+            tags = {}
+            try:
+                restored = self.restore_from_store(key, entry)
+                if restored is not None:
+                    self.record_archive(key, f"[{i}/{total_videos}] {title}", restored, entry)
+                    with count_lock:
+                        success_count += 1
+                    self.metrics.inc('completed')
+                    print(f"✅ [{i}/{total_videos}] 完成: {title}")
+                    return
+                print(f"🎵 正在下载: [{i}/{total_videos}] {title}")
+                with cost.measure():
+                    hook = cost.wrap(self.progress_hook)
+                    filepath = self.run_download(video_url, download_pool, entry.get('id'),
+                                                 collect_tags(tags, hook) if self.tagging else hook, entry,
+                                                 transcode=False)
+            except Exception as e:
+                self.metrics.inc('failed')
+                print(f"❌ [{i}/{total_videos}] 下载异常: {title} - {e}")
+                return
+            if not filepath:
+                self.metrics.inc('failed')
+                print(f"❌ [{i}/{total_videos}] 下载失败: {title}")
+                return
+            # 队列已满时阻塞，形成背压
+            transcode_queue.put((i, entry, key, filepath, cost, tags))
+            self.metrics.set_queue_depth('transcode', transcode_queue.qsize())
+        
+        def transcode_stage():
+            nonlocal success_count
+            while True:
+                item = transcode_queue.get()
+                if item is None:
+                    break
+                i, entry, key, filepath, cost, tags = item
+                title = entry.get('title', f'Video_{i}')
+                self.metrics.set_queue_depth('transcode', transcode_queue.qsize())
+                source = Path(filepath)
+                target = source.with_suffix(f".{self.config['audio_format']}")
+                with self.metrics.stage('transcode'), cost.measure():
+                    transcoded = transcode_audio(source, target, self.config['audio_format'],
+                                                 self.config['audio_quality'],
+                                                 mode=self.config.get('transcode_mode', 'auto'), tags=tags)
+                if transcoded:
+                    with self.metrics.stage('write'):
+                        self.record_archive(key, f"[{i}/{total_videos}] {title}",
+                                            self.store_output(key, str(target), cost, entry), entry)
+                    with count_lock:
+                        success_count += 1
+                    self.metrics.inc('completed')
+                    print(f"✅ [{i}/{total_videos}] 完成: {title}")
+                else:
+                    self.metrics.inc('failed')
+                    print(f"❌ [{i}/{total_videos}] 转码失败: {title}")
+        
+        transcoders = [threading.Thread(target=transcode_stage, daemon=True) for _ in range(transcode_workers)]
+        for thread in transcoders:
+            thread.start()
+        
+        with concurrent.futures.ThreadPoolExecutor(max_workers=download_workers) as executor:
+            for i, entry, key in pending:
+                executor.submit(download_stage, i, entry, key)
+        download_pool.close()
+        
+        for _ in transcoders:
+            transcode_queue.put(None)
+        for thread in transcoders:
+            thread.join()
+        
+        return success_count
     
     def list_downloaded_files(self):
-        """列出已下载的文件"""
+        """列出已下载的文件（有文件索引时增量扫描后查询索引，不逐个 stat）"""
+        if self.catalog is not None:
+            self.catalog.scan()
+            rows = self.catalog.files(self.config['audio_format'], directory='')
+            if rows:
+                print(f"\n📁 输出目录: {self.output_dir.absolute()}")
+                print_files(rows)
+            else:
+                print("\n❌ 未找到音频文件")
+            return
         audio_files = list(self.output_dir.glob(f'*.{self.config["audio_format"]}'))
         if audio_files:
             print(f"\n📁 输出目录: {self.output_dir.absolute()}")
@@ -194,15 +1139,41 @@ class AdvancedBilibiliExtractor:
         else:
             print("\n❌ 未找到音频文件")
     
-    def extract_audio(self, url: str) -> bool:
+    def extract_audio(self, url: str, refresh: bool = False) -> bool:
         """主要的音频提取方法"""
+        url = self.resolve_urls([url])[0]
+        return self.run_extraction(self.download_playlist_concurrent, url, refresh)
+    
+    def extract_batch(self, batch: List, refresh: bool = False) -> bool:
+        """批量提取多个URL（短链接先并发解析，解析到同一地址的只保留第一个）"""
+        resolved = self.resolve_urls([url for url, _ in batch])
+        unique = {}
+        for url, (_, priority) in zip(resolved, batch):
+            unique.setdefault(url, priority)
+        return self.run_extraction(self.download_batch, list(unique.items()), refresh)
+    
+    def run_extraction(self, download, *args) -> bool:
+        """输出配置、运行下载并汇总指标"""
         print("=== 高级B站音频提取器 ===")
         print(f"📋 配置: {self.config['audio_format'].upper()} @ {self.config['audio_quality']}kbps")
         print(f"📁 输出目录: {self.output_dir.absolute()}")
         print(f"🔧 最大并发: {self.config['max_concurrent_downloads']}")
         print()
         
-        success = self.download_playlist_concurrent(url)
+        reporter = self.start_metrics_reporter()
+        try:
+            success = download(*args)
+        finally:
+            if reporter is not None:
+                reporter.stop()
+                print()
+                for line in self.metrics.summary_lines():
+                    print(line)
+            for line in self.format_policy.summary_lines():
+                print(line)
+            if self.content_store is not None:
+                for line in self.content_store.summary_lines():
+                    print(line)
         
         if success:
             self.list_downloaded_files()
@@ -210,24 +1181,30 @@ class AdvancedBilibiliExtractor:
         return success
 
 def main():
-    import argparse
-    
-    parser = argparse.ArgumentParser(description='高级B站音频提取器')
-    parser.add_argument('url', nargs='?', help='B站视频URL')
-    parser.add_argument('-c', '--config', default='config.json', help='配置文件路径')
-    parser.add_argument('-o', '--output', help='输出目录')
-    parser.add_argument('-q', '--quality', help='音频质量 (如: 192, 320)')
-    parser.add_argument('-f', '--format', help='音频格式 (如: mp3, m4a)')
-    parser.add_argument('--concurrent', type=int, help='并发下载数')
+    args = advanced_parser().parse_args()
     
-    args = parser.parse_args()
+    # 批量模式读取URL列表
+    batch = None
+    if args.batch:
+        try:
+            if args.batch == '-':
+                batch = parse_batch_lines(sys.stdin)
+            else:
+                with open(args.batch, 'r', encoding='utf-8') as f:
+                    batch = parse_batch_lines(f)
+        except (OSError, ValueError) as e:
+            print(f"❌ 无法读取URL列表: {e}")
+            sys.exit(1)
+        if not batch:
+            print("❌ URL列表为空")
+            return
     
     # 获取URL
     url = args.url
-    if not url:
+    if batch is None and not url:
         url = input("请输入B站视频URL: ").strip()
     
-    if not url:
+    if batch is None and not url:
         print("❌ 请提供有效的URL")
         return
     
@@ -249,11 +1226,58 @@ def main():
     if args.concurrent:
         extractor.config['max_concurrent_downloads'] = args.concurrent
     
+    if args.transcode_mode:
+        extractor.config['transcode_mode'] = args.transcode_mode
+    
+    if args.pipeline:
+        extractor.config.setdefault('pipeline', {})['enabled'] = True
+    
+    if args.adaptive:
+        extractor.config.setdefault('async_engine', {})['enabled'] = True
+    
+    if args.stream:
+        extractor.config.setdefault('streaming', {})['enabled'] = True
+    
+    if args.max_bandwidth or args.max_api_rps:
+        rate_config = extractor.config.setdefault('rate_limits', {})
+        rate_config['enabled'] = True
+        if args.max_bandwidth:
+            rate_config['total_bytes_per_second'] = yt_dlp.utils.parse_bytes(args.max_bandwidth)
+        if args.max_api_rps:
+            api_config = rate_config.setdefault('hosts', {}).setdefault('api', {'match': ['*.bilibili.com']})
+            api_config['requests_per_second'] = args.max_api_rps
+    
+    if args.segments:
+        extractor.config.setdefault('segmented_download', {}).update({'enabled': True, 'segments': args.segments})
+    
+    if args.pipe:
+        extractor.config.setdefault('pipe_encode', {})['enabled'] = True
+    
+    if args.format_policy:
+        extractor.config.setdefault('format_policy', {})['policy'] = args.format_policy
+    
+    if args.metrics_jsonl:
+        extractor.config.setdefault('metrics', {})['jsonl_path'] = args.metrics_jsonl
+    
+    if args.prometheus_textfile:
+        extractor.config.setdefault('metrics', {})['prometheus_textfile'] = args.prometheus_textfile
+    
+    if args.metrics_port:
+        extractor.config.setdefault('metrics', {})['http_port'] = args.metrics_port
+    
     # 重新设置yt-dlp选项
     extractor.setup_ydl_options()
+    extractor.setup_archive()
+    extractor.setup_metadata_cache()
+    extractor.setup_content_store()
+    extractor.setup_short_links()
+    extractor.setup_catalog()
     
     # 开始提取
-    success = extractor.extract_audio(url)
+    if batch is not None:
+        success = extractor.extract_batch(batch, args.refresh)
+    else:
+        success = extractor.extract_audio(url, args.refresh)
     
     if not success:
         print("\n❌ 音频提取失败")
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+asyncio 下载引擎
+并发数由自适应控制器决定：吞吐量持续提升时逐步增加并发，
+遇到限流（412/429）或超时时按比例回退，始终限制在配置的最小/最大值之间
+"""
+
+import re
+import time
+import asyncio
+import threading
+import concurrent.futures
+from collections import deque
+from typing import Callable, Dict, Iterable, Optional
+
+THROTTLE_PATTERN = re.compile(r'HTTP Error (412|429)|Precondition Failed|Too Many Requests', re.IGNORECASE)
+TIMEOUT_PATTERN = re.compile(r'timed? ?out', re.IGNORECASE)
+
+def is_throttle_error(error) -> bool:
+    """是否为限流或超时错误（需要降低并发）"""
+    message = str(error)
+    return bool(THROTTLE_PATTERN.search(message) or TIMEOUT_PATTERN.search(message))
+
+class AdaptiveConcurrencyController:
+    """加性增、乘性减（AIMD）的并发控制器（线程安全）"""
+
+    def __init__(self, min_concurrency: int = 1, max_concurrency: int = 8, initial_concurrency: int = None,
+                 backoff_factor: float = 0.5, adjust_interval: float = 5.0, improvement_threshold: float = 0.05):
+        self.min_concurrency = max(1, min_concurrency)
+        self.max_concurrency = max(self.min_concurrency, max_concurrency)
+        initial = initial_concurrency or self.min_concurrency
+        self._limit = float(min(max(initial, self.min_concurrency), self.max_concurrency))
+        self.backoff_factor = backoff_factor
+        self.adjust_interval = adjust_interval
+        self.improvement_threshold = improvement_threshold
+
+        self._lock = threading.Lock()
+        self._window_bytes = 0
+        self._window_start = time.monotonic()
+        self._last_throughput = None
+        self._last_backoff = 0.0
+        self.history = []
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def record_bytes(self, nbytes: int):
+        """记录下载的字节数（由进度回调调用）"""
+        if nbytes > 0:
+            with self._lock:
+                self._window_bytes += nbytes
+
+    def maybe_adjust(self, now: float = None) -> Optional[float]:
+        """窗口结束时根据吞吐量调整并发，返回本窗口吞吐量（字节/秒）"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            elapsed = now - self._window_start
+            if elapsed < self.adjust_interval:
+                return None
+            throughput = self._window_bytes / elapsed
+            self._window_bytes = 0
+            self._window_start = now
+
+            if self._last_throughput is None or throughput > self._last_throughput * (1 + self.improvement_threshold):
+                self._limit = min(self._limit + 1, self.max_concurrency)
+            self._last_throughput = throughput
+            self.history.append((now, self.limit, throughput))
+            return throughput
+
+    def on_throttle(self, now: float = None):
+        """限流或超时：乘性回退（同一窗口内只回退一次）"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if now - self._last_backoff < self.adjust_interval:
+                return
+            self._last_backoff = now
+            self._limit = max(self._limit * self.backoff_factor, self.min_concurrency)
+            self._last_throughput = None
+            self._window_bytes = 0
+            self._window_start = now
+            self.history.append((now, self.limit, None))
+
+class AsyncDownloadEngine:
+    """按控制器给出的并发上限调度阻塞式下载任务"""
+
+    def __init__(self, controller: AdaptiveConcurrencyController, throttle_retries: int = 3, metrics=None):
+        self.controller = controller
+        self.throttle_retries = throttle_retries
+        # 可选的 MetricsCollector，记录等待队列深度和限流重试次数
+        self.metrics = metrics
+
+    def run(self, jobs: Iterable, worker: Callable, on_done: Callable = None) -> Dict:
+        """同步入口：在新的事件循环中运行所有任务"""
+        return asyncio.run(self.run_async(jobs, worker, on_done))
+
+    async def run_async(self, jobs: Iterable, worker: Callable, on_done: Callable = None) -> Dict:
+        """worker(job) 在线程中执行并返回结果；限流错误会重新排队
+
+        on_done(job, result, error) 在每个任务最终完成时调用，返回 {job: result}
+        """
+        loop = asyncio.get_running_loop()
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.controller.max_concurrency)
+        pending = deque(jobs)
+        attempts = {}
+        active = {}
+        results = {}
+
+        try:
+            while pending or active:
+                while pending and len(active) < self.controller.limit:
+                    job = pending.popleft()
+                    future = loop.run_in_executor(executor, worker, job)
+                    active[future] = job
+                if self.metrics is not None:
+                    self.metrics.set_queue_depth('async', len(pending))
+
+                done, _ = await asyncio.wait(
+                    list(active), timeout=self.controller.adjust_interval,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                self.controller.maybe_adjust()
+
+                for future in done:
+                    job = active.pop(future)
+                    error = future.exception()
+                    if error is not None and is_throttle_error(error):
+                        self.controller.on_throttle()
+                        attempts[job] = attempts.get(job, 0) + 1
+                        if attempts[job] <= self.throttle_retries:
+                            if self.metrics is not None:
+                                self.metrics.inc('retries')
+                            pending.append(job)
+                            continue
+                    result = None if error is not None else future.result()
+                    results[job] = result
+                    if on_done is not None:
+                        on_done(job, result, error)
+        finally:
+            executor.shutdown(wait=True)
+
+        return results
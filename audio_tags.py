@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+音频标签（曲目序号、专辑、艺术家、标题）
+下载时随已有的 FFmpeg 后处理（提取/转码/流复制）一起写入，不再单独对每个文件做一遍 FFmpeg；
+已有的音频库用原地 ID3 更新器批量补写：新标签放得进原有标签区（含填充）时只重写文件开头的标签区，
+放不下或文件是内容存储的硬链接时才整体重写一次（同时留出填充，下次即可原地更新）
+"""
+
+import os
+import re
+import sys
+import json
+import shutil
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import yt_dlp
+from yt_dlp.postprocessor.ffmpeg import FFmpegExtractAudioPP
+
+from entry_record import EntryRecord
+from library_catalog import open_catalog
+from rename_mp3 import extract_song_name
+from transcoder import build_copy_command, metadata_args, temp_output_path
+
+# 条目上下文（合集序号、合集标题）在解析结果中的字段名；
+# 以 __ 开头，写入元数据缓存和 .info.json 时被 yt-dlp 的 sanitize_info 去掉
+TAGS_FIELD = '__audio_tags'
+
+# 标签名 -> ID3v2 文本帧
+ID3_FRAMES = {
+    'title': b'TIT2',
+    'artist': b'TPE1',
+    'album': b'TALB',
+    'track': b'TRCK',
+}
+
+# 文本帧的编码字节 -> Python 编码名
+TEXT_ENCODINGS = {0: 'latin-1', 1: 'utf-16', 2: 'utf-16-be', 3: 'utf-8'}
+
+# 整体重写时在标签区后留出的填充（字节），之后的标签修改可以原地完成
+DEFAULT_PADDING = 2048
+
+TRACK_PREFIX = re.compile(r'^(\d+)_')
+
+class ID3Error(Exception):
+    """无法解析或写入 ID3v2 标签"""
+
+def tag_context(entry) -> Dict:
+    """条目在合集中的序号和合集标题，作为 extra_info 交给 yt-dlp，由写标签的后处理器读取"""
+    if entry is None:
+        return {}
+    index = entry.index if isinstance(entry, EntryRecord) else entry.get('playlist_index')
+    context = {'track': index, 'album': entry.get('playlist_title') or entry.get('playlist')}
+    context = {name: value for name, value in context.items() if value}
+    return {TAGS_FIELD: context} if context else {}
+
+def build_tags(info: Dict, filepath=None) -> Dict[str, str]:
+    """由解析结果生成标签：标题为从文件名解析出的歌曲名，艺术家为上传者，专辑为合集标题，曲目为合集序号"""
+    context = info.get(TAGS_FIELD) or {}
+    tags = {
+        'title': extract_song_name(Path(filepath).name) if filepath else info.get('title'),
+        'artist': info.get('uploader') or info.get('artist'),
+        'album': context.get('album') or info.get('playlist_title'),
+        'track': context.get('track') or info.get('playlist_index'),
+    }
+    return {name: str(value).strip() for name, value in tags.items() if value not in (None, '')}
+
+def collect_tags(tags: Dict, hook=None):
+    """包装进度钩子：下载完成时把由解析结果生成的标签存入 tags（流水线模式在转码时写入）"""
+    def wrapper(d):
+        if d.get('status') == 'finished' and d.get('info_dict'):
+            tags.update(build_tags(d['info_dict'], d.get('filename')))
+        if hook is not None:
+            hook(d)
+    return wrapper
+
+# ---- 下载时写入 ----
+
+class TaggingExtractAudioPP(FFmpegExtractAudioPP):
+    """提取音频的同时写入标签（FFmpeg 的 -metadata 参数），输出文件仍只写一次"""
+
+    @classmethod
+    def pp_key(cls):
+        # 沿用 ExtractAudio 的名称，postprocessor_args['extractaudio'] 和后处理钩子照常生效
+        return 'ExtractAudio'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._tags = None
+
+    def run(self, information):
+        self._tags = build_tags(information, information.get('filepath'))
+        files_to_delete, information = super().run(information)
+        # 源文件已是目标格式时 FFmpeg 不会运行；mp3 直接写入 ID3 标签（m4a 等容器保持原样）
+        if not files_to_delete and self._tags and information.get('ext') == 'mp3':
+            try:
+                write_tags(information['filepath'], self._tags)
+            except (OSError, ID3Error) as e:
+                self.report_warning(f'无法写入标签: {e}')
+        return files_to_delete, information
+
+    def run_ffmpeg(self, path, out_path, codec, more_opts):
+        audio_format = os.path.splitext(out_path)[1].lstrip('.')
+        super().run_ffmpeg(path, out_path, codec, [*more_opts, *metadata_args(self._tags, audio_format)])
+
+class TaggingMixin:
+    """为 YoutubeDL（或其子类）把 FFmpegExtractAudio 后处理器换成同时写入标签的版本"""
+
+    def __init__(self, params=None, *args, **kwargs):
+        params = dict(params or {})
+        definitions = params.get('postprocessors') or []
+        params['postprocessors'] = [d for d in definitions if d.get('key') != 'FFmpegExtractAudio']
+        super().__init__(params, *args, **kwargs)
+        for definition in definitions:
+            if definition.get('key') == 'FFmpegExtractAudio':
+                options = {k: v for k, v in definition.items() if k not in ('key', 'when')}
+                self.add_post_processor(TaggingExtractAudioPP(self, **options),
+                                        when=definition.get('when', 'post_process'))
+
+_tagging_classes = {}
+
+def with_tagging(ydl_class=yt_dlp.YoutubeDL):
+    """返回提取音频时写入标签的 ydl_class 子类"""
+    if ydl_class not in _tagging_classes:
+        _tagging_classes[ydl_class] = type(f'Tagging{ydl_class.__name__}', (TaggingMixin, ydl_class), {})
+    return _tagging_classes[ydl_class]
+
+# ---- ID3v2 原地更新 ----
+
+def _syncsafe(data: bytes) -> int:
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+def _to_syncsafe(value: int) -> bytes:
+    return bytes([(value >> 21) & 0x7f, (value >> 14) & 0x7f, (value >> 7) & 0x7f, value & 0x7f])
+
+def _frame_size(data: bytes, version: int) -> int:
+    # v2.4 的帧长度为同步安全整数，v2.3 为普通 32 位整数
+    return _syncsafe(data) if version == 4 else int.from_bytes(data, 'big')
+
+def _decode_text(body: bytes) -> str:
+    encoding = TEXT_ENCODINGS.get(body[0], 'latin-1') if body else 'latin-1'
+    return body[1:].decode(encoding, 'replace').rstrip('\x00')
+
+def _text_frame(frame_id: bytes, text: str, version: int) -> bytes:
+    try:
+        body = b'\x00' + text.encode('latin-1')
+    except UnicodeEncodeError:
+        # v2.3 只支持 UTF-16，v2.4 可用 UTF-8
+        body = b'\x03' + text.encode('utf-8') if version == 4 else b'\x01' + text.encode('utf-16')
+    size = _to_syncsafe(len(body)) if version == 4 else len(body).to_bytes(4, 'big')
+    return frame_id + size + b'\x00\x00' + body
+
+def read_id3(f) -> Optional[Tuple[int, int, int, List[Tuple[bytes, bytes]]]]:
+    """读取文件开头的 ID3v2 标签，返回 (版本, 标签标志, 标签区大小, [(帧ID, 整帧字节)])，没有标签时返回 None
+
+    标签区大小包含 10 字节头（v2.4 带尾部时也包含尾部），即音频数据的起始偏移
+    """
+    f.seek(0)
+    header = f.read(10)
+    if len(header) < 10 or header[:3] != b'ID3':
+        return None
+    version, flags, size = header[3], header[5], _syncsafe(header[6:10])
+    if version not in (3, 4):
+        raise ID3Error(f'不支持的 ID3v2.{version} 标签')
+    if flags & 0x80:
+        raise ID3Error('不支持非同步化（unsynchronisation）的标签')
+    data = f.read(size)
+    pos = 0
+    if flags & 0x40:
+        # 扩展头：v2.3 的长度不含自身 4 字节，v2.4 的长度为同步安全整数且包含自身
+        pos = _syncsafe(data[:4]) if version == 4 else 4 + int.from_bytes(data[:4], 'big')
+    frames = []
+    while pos + 10 <= len(data) and data[pos:pos + 1] != b'\x00':
+        frame_id = data[pos:pos + 4]
+        if not re.fullmatch(rb'[A-Z0-9]{4}', frame_id):
+            break
+        frame_size = _frame_size(data[pos + 4:pos + 8], version)
+        frames.append((frame_id, data[pos:pos + 10 + frame_size]))
+        pos += 10 + frame_size
+    tag_size = 10 + size + (10 if version == 4 and flags & 0x10 else 0)
+    return version, flags, tag_size, frames
+
+def write_tags(path, tags: Dict[str, str], padding: int = DEFAULT_PADDING) -> Tuple[str, int]:
+    """把 tags 写入 mp3 的 ID3v2 标签，保留其他帧（封面、歌词等），返回 (结果, 写入字节数)
+
+    结果为 unchanged（标签已一致，不写入）、in_place（只重写文件开头的标签区）
+    或 rewritten（标签区放不下或文件有多个硬链接，整体重写一次并断开链接）
+    """
+    path = Path(path)
+    with open(path, 'rb') as f:
+        existing = read_id3(f)
+    version, flags, tag_size, frames = existing or (3, 0, 0, [])
+
+    wanted = {ID3_FRAMES[name]: value for name, value in tags.items() if name in ID3_FRAMES}
+    current = {frame_id: _decode_text(frame[10:]) for frame_id, frame in frames if frame_id in wanted}
+    if current == wanted:
+        return 'unchanged', 0
+
+    body = b''.join(frame for frame_id, frame in frames if frame_id not in wanted)
+    body += b''.join(_text_frame(frame_id, value, version) for frame_id, value in wanted.items())
+    # v2.4 的尾部只在原地更新时保留（大小不变，尾部内容也不变）
+    footer = 10 if version == 4 and flags & 0x10 else 0
+    area = tag_size - 10 - footer
+
+    # 内容存储中的对象被多个输出目录共享，写入前断开链接，不改动其他合集中的文件
+    if existing is not None and len(body) <= area and os.stat(path).st_nlink == 1:
+        header = b'ID3' + bytes([version, 0, flags & ~0x40 & 0xff]) + _to_syncsafe(area)
+        with open(path, 'r+b') as f:
+            f.write(header + body + b'\x00' * (area - len(body)))
+        return 'in_place', 10 + area
+
+    area = len(body) + padding
+    header = b'ID3' + bytes([version, 0, 0]) + _to_syncsafe(area)
+    temp_file = temp_output_path(path)
+    try:
+        with open(path, 'rb') as source, open(temp_file, 'wb') as target:
+            target.write(header + body + b'\x00' * padding)
+            source.seek(tag_size)
+            shutil.copyfileobj(source, target, 1024 * 1024)
+            written = target.tell()
+        shutil.copymode(path, temp_file)
+        os.replace(temp_file, path)
+    except BaseException:
+        temp_file.unlink(missing_ok=True)
+        raise
+    return 'rewritten', written
+
+def entry_tags(path, entry) -> Dict[str, str]:
+    """条目（解析结果或 EntryRecord）保存为 path 时应有的标签"""
+    info = dict(entry.to_dict() if isinstance(entry, EntryRecord) else entry or {})
+    info.update(tag_context(entry))
+    return build_tags(info, path)
+
+def has_tags(path, tags: Dict[str, str]) -> bool:
+    """文件已带有 tags 中的全部标签（改写时内容不会变化）；只比较 mp3 的 ID3v2 标签，其他格式返回 False"""
+    path = Path(path)
+    if path.suffix.lower() != '.mp3':
+        return False
+    try:
+        with open(path, 'rb') as f:
+            existing = read_id3(f)
+    except (OSError, ID3Error):
+        return False
+    frames = dict(existing[3]) if existing else {}
+    return all(ID3_FRAMES[name] in frames and _decode_text(frames[ID3_FRAMES[name]][10:]) == value
+               for name, value in tags.items() if name in ID3_FRAMES)
+
+def retag(path, entry) -> str:
+    """把内容存储链接来的文件改写为本条目的标签，返回 write_tags 的结果（其他格式为 remuxed）
+
+    存储中的对象带着第一次下载它的合集的专辑和曲目序号；这里只替换标题、专辑、曲目（条目带上传者时还有艺术家），
+    其他帧保留。mp3 原地更新（reflink 只复制改写的块），其他格式用 FFmpeg 流复制重写一次。
+    标签不同的条目不应与对象共享硬链接（见 has_tags），否则改写时整体重写并断开链接
+    """
+    path = Path(path)
+    tags = entry_tags(path, entry)
+    if path.suffix.lower() == '.mp3':
+        return write_tags(path, tags)[0]
+
+    temp_file = temp_output_path(path)
+    try:
+        subprocess.run(build_copy_command(path, temp_file, path.suffix.lstrip('.').lower(), tags),
+                       check=True, capture_output=True)
+        os.replace(temp_file, path)
+    except subprocess.CalledProcessError as e:
+        temp_file.unlink(missing_ok=True)
+        raise OSError(f"FFmpeg 改写标签失败: {path.name}") from e
+    except BaseException:
+        temp_file.unlink(missing_ok=True)
+        raise
+    return 'remuxed'
+
+# ---- 批量补写已有音频库 ----
+
+def sidecar_info(path: Path) -> Dict:
+    """yt-dlp 写出的 .info.json（不存在时为空字典）"""
+    try:
+        with open(path.with_suffix('.info.json'), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def library_tags(path: Path, metadata: Dict = None, album: str = None, artist: str = None) -> Dict[str, str]:
+    """已有文件的标签：合集序号取自文件名前缀，上传者和合集标题取自 .info.json 和目录索引"""
+    info = dict(sidecar_info(path))
+    match = TRACK_PREFIX.match(path.name)
+    info[TAGS_FIELD] = {
+        'track': int(match.group(1)) if match else None,
+        'album': album or (metadata or {}).get('collection'),
+    }
+    if artist:
+        info['uploader'] = artist
+    return build_tags(info, path)
+
+def tag_library(directory, album: str = None, artist: str = None, pattern: str = None,
+                dry_run: bool = False) -> Dict[str, int]:
+    """为目录中的 mp3 补写标签，返回各结果的文件数和写入字节数"""
+    dir_path = Path(directory)
+    catalog = open_catalog(dir_path)
+    if catalog is not None:
+        paths = [catalog.absolute(row['path']) for row in catalog.files('mp3', pattern, directory='')]
+    else:
+        paths = sorted(path for path in dir_path.glob(pattern or '*.mp3') if path.suffix.lower() == '.mp3')
+
+    stats = {'unchanged': 0, 'in_place': 0, 'rewritten': 0, 'failed': 0, 'bytes_written': 0, 'bytes_total': 0}
+    for i, path in enumerate(paths, 1):
+        tags = library_tags(path, catalog.metadata(path) if catalog else None, album, artist)
+        summary = ' / '.join(f'{name}={value}' for name, value in tags.items())
+        if dry_run:
+            print(f"[{i:3d}/{len(paths)}] {path.name}: {summary}")
+            continue
+        try:
+            result, written = write_tags(path, tags)
+        except (OSError, ID3Error) as e:
+            stats['failed'] += 1
+            print(f"❌ [{i:3d}/{len(paths)}] {path.name}: {e}")
+            continue
+        stats[result] += 1
+        stats['bytes_written'] += written
+        stats['bytes_total'] += path.stat().st_size
+        if result != 'unchanged':
+            print(f"🏷️ [{i:3d}/{len(paths)}] {path.name}: {summary}" + (" (整体重写)" if result == 'rewritten' else ''))
+            if catalog is not None:
+                catalog.record(path)
+    if catalog is not None:
+        catalog.close()
+    return stats
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='为已下载的MP3批量补写标签（曲目序号、专辑、艺术家、标题）')
+    parser.add_argument('directory', nargs='?', default='./downloads', help='MP3文件目录')
+    parser.add_argument('--album', help='专辑名（默认取目录索引中的合集标题）')
+    parser.add_argument('--artist', help='艺术家（默认取 .info.json 中的上传者）')
+    parser.add_argument('-p', '--pattern', help='文件名通配符（如 "*周华健*"）')
+    parser.add_argument('--dry-run', action='store_true', help='只显示将写入的标签')
+    args = parser.parse_args()
+
+    if not Path(args.directory).is_dir():
+        print(f"❌ 目录不存在: {args.directory}")
+        sys.exit(1)
+
+    stats = tag_library(args.directory, args.album, args.artist, args.pattern, args.dry_run)
+    if args.dry_run:
+        return
+    print(f"\n🎉 原地更新 {stats['in_place']} 个，整体重写 {stats['rewritten']} 个，"
+          f"无需修改 {stats['unchanged']} 个，失败 {stats['failed']} 个")
+    print(f"💾 写入 {stats['bytes_written'] / (1024 * 1024):.2f} MB"
+          f"（文件总大小 {stats['bytes_total'] / (1024 * 1024):.1f} MB）")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量模式调度
+解析批量 URL 列表（每行一个 URL，可跟优先级），并按公平份额在多个合集之间分配下载名额：
+每个合集一个队列，按步长调度（stride scheduling）轮流取条目，优先级即权重，
+超大合集不会饿死其他合集
+"""
+
+import threading
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+def parse_batch_lines(lines: Iterable[str]) -> List[Tuple[str, float]]:
+    """解析批量输入，返回 [(url, priority)]
+
+    每行格式为 "URL [优先级]"，优先级默认为 1；空行和 # 开头的注释行忽略，重复的 URL 只保留第一次
+    """
+    batch = []
+    seen = set()
+    for line_number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        parts = line.split()
+        url = parts[0]
+        priority = 1.0
+        if len(parts) > 1:
+            try:
+                priority = float(parts[1])
+            except ValueError:
+                raise ValueError(f"第 {line_number} 行的优先级无效: {parts[1]}")
+            if priority <= 0:
+                raise ValueError(f"第 {line_number} 行的优先级必须大于 0: {parts[1]}")
+        if url in seen:
+            continue
+        seen.add(url)
+        batch.append((url, priority))
+    return batch
+
+class FairShareScheduler:
+    """多队列公平份额调度器（线程安全）
+
+    每个队列记录一个 pass 值，每次取出条目后增加 1/权重；
+    总是从 pass 最小的非空队列取，长期来看各队列获得的名额与权重成正比
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queues: Dict[str, deque] = {}
+        self._weights: Dict[str, float] = {}
+        self._pass: Dict[str, float] = {}
+        self._order: Dict[str, int] = {}
+        self.dispatched: Dict[str, int] = {}
+
+    def add_queue(self, name: str, items: Iterable, weight: float = 1.0):
+        with self._lock:
+            self._queues[name] = deque(items)
+            self._weights[name] = weight
+            # 新队列从当前最小 pass 开始，不会因为加入得晚而连续占用名额
+            active = [self._pass[other] for other, queue in self._queues.items() if queue and other != name]
+            self._pass[name] = min(active, default=0.0)
+            self._order.setdefault(name, len(self._order))
+            self.dispatched.setdefault(name, 0)
+
+    def next(self) -> Optional[Tuple[str, object]]:
+        """取出下一个 (队列名, 条目)，全部为空时返回 None"""
+        with self._lock:
+            candidates = [name for name, queue in self._queues.items() if queue]
+            if not candidates:
+                return None
+            name = min(candidates, key=lambda n: (self._pass[n], -self._weights[n], self._order[n]))
+            self._pass[name] += 1.0 / self._weights[name]
+            self.dispatched[name] += 1
+            return name, self._queues[name].popleft()
+
+    def remove_queue(self, name: str) -> int:
+        """丢弃队列中尚未取出的条目，返回丢弃的数量"""
+        with self._lock:
+            queue = self._queues.pop(name, None)
+            self._weights.pop(name, None)
+            self._pass.pop(name, None)
+            return len(queue) if queue else 0
+
+    def pending(self) -> int:
+        with self._lock:
+            return sum(len(queue) for queue in self._queues.values())
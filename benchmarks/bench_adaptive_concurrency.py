@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+自适应并发基准测试
+本地服务器限制单连接带宽，并在并发请求超过上限时返回 429（模拟B站限流），
+比较固定并发（过低 / 过高）和自适应并发的完成时间、吞吐量与被限流次数
+"""
+
+import sys
+import json
+import time
+import shutil
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from local_server import LocalAudioServer
+from ydl_pool import YoutubeDLPool
+from async_engine import AdaptiveConcurrencyController, AsyncDownloadEngine
+
+def run_case(server: LocalAudioServer, entries: int, controller: AdaptiveConcurrencyController) -> dict:
+    work_dir = Path(tempfile.mkdtemp(prefix='bench_adaptive_'))
+    pool = YoutubeDLPool({
+        'quiet': True,
+        'no_warnings': True,
+        'noprogress': True,
+        'retries': 0,
+        'ignoreerrors': False,
+        'outtmpl': str(work_dir / '%(id)s.%(ext)s'),
+    })
+    engine = AsyncDownloadEngine(controller, throttle_retries=20)
+    server.reset_stats()
+
+    def worker(index):
+        last_bytes = 0
+
+        def progress_hook(d):
+            nonlocal last_bytes
+            downloaded = d.get('downloaded_bytes') or 0
+            controller.record_bytes(downloaded - last_bytes)
+            last_bytes = downloaded
+
+        with pool.acquire(progress_hook) as (ydl, finished_files):
+            ydl.download([server.track_url(index)])
+            return bool(finished_files)
+
+    start = time.perf_counter()
+    results = engine.run(range(entries), worker)
+    elapsed = time.perf_counter() - start
+    pool.close()
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        'concurrency': f'{controller.min_concurrency}-{controller.max_concurrency}',
+        'succeeded': sum(1 for ok in results.values() if ok),
+        'seconds': elapsed,
+        'throughput_kib_s': server.stats['bytes_sent'] / elapsed / 1024,
+        'throttled_responses': server.stats['throttled'],
+        'final_limit': controller.limit,
+        'limit_history': [limit for _, limit, _ in controller.history],
+    }
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='自适应并发基准测试')
+    parser.add_argument('--entries', type=int, default=40, help='条目数')
+    parser.add_argument('--size', type=int, default=256 * 1024, help='每个条目的字节数')
+    parser.add_argument('--bandwidth', type=int, default=256 * 1024, help='服务器单连接带宽（字节/秒）')
+    parser.add_argument('--server-limit', type=int, default=6, help='服务器允许的最大并发请求数')
+    parser.add_argument('--max-concurrency', type=int, default=16, help='自适应并发上限')
+    parser.add_argument('--json', help='将结果写入JSON文件')
+    args = parser.parse_args()
+
+    cases = {
+        '固定并发 2': AdaptiveConcurrencyController(2, 2, adjust_interval=1),
+        f'固定并发 {args.max_concurrency}': AdaptiveConcurrencyController(
+            args.max_concurrency, args.max_concurrency, adjust_interval=1),
+        '自适应': AdaptiveConcurrencyController(1, args.max_concurrency, initial_concurrency=2, adjust_interval=1),
+    }
+
+    results = {}
+    with LocalAudioServer(tracks=args.entries, payload=bytes(args.size),
+                          bandwidth_per_connection=args.bandwidth,
+                          max_concurrent_requests=args.server_limit) as server:
+        for name, controller in cases.items():
+            result = run_case(server, args.entries, controller)
+            results[name] = result
+            print(f"  {name:<10s} 用时 {result['seconds']:6.1f} s  吞吐 {result['throughput_kib_s']:8.1f} KiB/s  "
+                  f"被限流 {result['throttled_responses']:3d} 次  成功 {result['succeeded']}/{args.entries}  "
+                  f"并发变化 {result['limit_history']}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"💾 结果已保存: {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+目录索引基准测试
+在临时目录中生成带 info.json 的合成音频库，比较旧的列出方式（glob 后逐个 stat，
+元数据从 info.json 读取）与目录索引的首次扫描、无变化时的增量扫描、
+少量新增后的增量扫描和纯查询的耗时
+"""
+
+import sys
+import json
+import time
+import shutil
+import tempfile
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_DIR = BENCH_DIR.parent
+sys.path.insert(0, str(REPO_DIR))
+
+from library_catalog import RACY_SECONDS, LibraryCatalog
+
+def make_library(root: Path, count: int, per_dir: int):
+    """每 per_dir 个文件一个子目录（per_dir 为 0 时全部放在根目录）"""
+    for i in range(count):
+        directory = root / f"collection_{i // per_dir:04d}" if per_dir else root
+        directory.mkdir(exist_ok=True)
+        stem = f"{i:06d}_合集 p{i % 100 + 1:02d} 歌曲{i}"
+        (directory / f"{stem}.m4a").write_bytes(b'\0' * 64)
+        with open(directory / f"{stem}.info.json", 'w', encoding='utf-8') as f:
+            json.dump({'id': f"BV{i:010d}", 'title': f"歌曲{i}", 'playlist_title': '合集'}, f, ensure_ascii=False)
+
+def legacy_listing(root: Path) -> int:
+    """旧方式：遍历、stat 每个音频，并读取 info.json 取得 BV号和标题"""
+    total = 0
+    for path in root.rglob('*.m4a'):
+        total += path.stat().st_size
+        info_path = path.with_suffix('.info.json')
+        if info_path.exists():
+            with open(info_path, 'r', encoding='utf-8') as f:
+                json.load(f)
+    return total
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='目录索引基准测试')
+    parser.add_argument('--count', type=int, default=20000, help='合成音频数量')
+    parser.add_argument('--per-dir', type=int, default=500, help='每个子目录的文件数（0 表示不分子目录）')
+    parser.add_argument('--added', type=int, default=20, help='增量扫描前新增的文件数')
+    parser.add_argument('--dir', help='在此目录下创建临时音频库（例如 NFS 挂载点）')
+    parser.add_argument('--json', help='将结果写入JSON文件')
+    args = parser.parse_args()
+
+    work_dir = Path(tempfile.mkdtemp(prefix='bench_catalog_', dir=args.dir))
+    results = {'count': args.count, 'per_dir': args.per_dir}
+    try:
+        make_library(work_dir, args.count, args.per_dir)
+        # 等过“过新”窗口，让首次扫描就能记录目录 mtime
+        time.sleep(RACY_SECONDS + 0.1)
+
+        _, results['legacy_seconds'] = timed(legacy_listing, work_dir)
+        catalog = LibraryCatalog(work_dir)
+        stats, results['first_scan_seconds'] = timed(catalog.scan)
+        results['first_scan'] = stats
+        stats, results['unchanged_scan_seconds'] = timed(catalog.scan)
+        results['unchanged_scan'] = stats
+
+        target = work_dir / 'collection_0000' if args.per_dir else work_dir
+        for i in range(args.added):
+            (target / f"new_{i:04d}.m4a").write_bytes(b'\0' * 64)
+        stats, results['added_scan_seconds'] = timed(catalog.scan)
+        results['added_scan'] = stats
+        rows, results['query_seconds'] = timed(catalog.files, 'm4a')
+        results['query_rows'] = len(rows)
+        catalog.close()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"  旧方式（遍历 + stat + info.json） {results['legacy_seconds']:8.3f} s")
+    for key, label in (('first_scan', '首次扫描'), ('unchanged_scan', '无变化增量扫描'),
+                       ('added_scan', f"新增 {args.added} 个后增量扫描")):
+        stats = results[key]
+        print(f"  {label:<24s} {results[key + '_seconds']:8.3f} s  "
+              f"(列出 {stats['listed']}/{stats['dirs']} 个目录，新增 {stats['added']})")
+    print(f"  查询                             {results['query_seconds']:8.3f} s  ({results['query_rows']} 条)")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"💾 结果已保存: {args.json}")
+
+if __name__ == "__main__":
+    main()
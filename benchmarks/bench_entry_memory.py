@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+合集条目内存占用基准测试
+生成带格式列表、缩略图、HTTP 头等字段的合成条目（接近 yt-dlp 完整解析结果），
+每种模式在独立子进程中构建待下载列表，测量峰值 RSS、构建完成后的 RSS 增量，
+以及另一次运行中 tracemalloc 统计的存活对象大小（释放的内存留在 Python 的内存池中供后续分配复用，
+不一定归还系统，RSS 增量因此高于存活对象）：
+  dicts    保留原始条目字典，并为每个条目提交一个 future（旧的线程池模式）
+  records  整个合集枚举完成后投影为 EntryRecord，原始字典释放，在途 future 有上限
+  stream   条目逐个产出并立即投影（流式枚举），原始字典从不同时存在
+"""
+
+import gc
+import os
+import sys
+import json
+import resource
+import tracemalloc
+import subprocess
+import concurrent.futures
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_DIR = BENCH_DIR.parent
+sys.path.insert(0, str(REPO_DIR))
+
+MODES = ('dicts', 'records', 'stream')
+
+def synthetic_entry(index: int) -> dict:
+    """一个条目的完整解析结果（字段和大小参照B站视频的 yt-dlp 输出）"""
+    bvid = f"BV1{index:09d}"
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) '
+                      'Chrome/120.0 Safari/537.36',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+        'Accept-Language': 'en-us,en;q=0.5',
+        'Sec-Fetch-Mode': 'navigate',
+        'Referer': f'https://www.bilibili.com/video/{bvid}',
+    }
+    formats = [{
+        'format_id': f'{30200 + n}',
+        'url': f'https://upos-sz-mirrorcos.bilivideo.com/upgcxcode/{index:08d}/{n}/{bvid}-1-{30200 + n}.m4s'
+               f'?e=ig8euxZM2rNcNbdlhoNvNC8BqJIzNbfqXBvEqxTEto8BTrNvN0GvT90W5JZMkX_YN0MvXg8gNEV4NC8xNEV4N03eN0B5tZlqNxT'
+               f'EtoNN9yhqNbTeNbM5nEbaNbTeNbM5tZ2TNbfq&uipk=5&nbs=1&deadline={1700000000 + index}'
+               f'&gen=playurlv2&os=cosbv',
+        'ext': 'm4a' if n < 3 else 'mp4',
+        'acodec': 'mp4a.40.2' if n < 3 else 'none',
+        'vcodec': 'none' if n < 3 else 'avc1.640032',
+        'tbr': 64.0 * (n + 1),
+        'filesize': 1_000_000 * (n + 1),
+        'protocol': 'https',
+        'http_headers': dict(headers),
+        'format_note': f'{360 + n * 120}P',
+        'width': None if n < 3 else 640 + n * 320,
+        'height': None if n < 3 else 360 + n * 180,
+    } for n in range(8)]
+    return {
+        'id': bvid,
+        'title': f'【高品质】经典歌曲合集 第{index}首 精选无损音质立体声',
+        'description': '经典歌曲高品质立体声合集，收录八九十年代华语流行金曲。' * 6,
+        'uploader': '精品伴奏馆',
+        'uploader_id': '12345678',
+        'timestamp': 1700000000 + index,
+        'duration': 240.5,
+        'webpage_url': f'https://www.bilibili.com/video/{bvid}',
+        'thumbnail': f'https://i0.hdslb.com/bfs/archive/{index:040x}.jpg',
+        'thumbnails': [{'url': f'https://i0.hdslb.com/bfs/archive/{index:040x}.jpg@{w}w', 'width': w}
+                       for w in (160, 320, 480, 640, 960, 1280)],
+        'tags': ['音乐', '华语', '经典', '金曲', '合集', '伴奏'],
+        'formats': formats,
+        'http_headers': dict(headers),
+        'extractor': 'BiliBili',
+        'extractor_key': 'BiliBili',
+    }
+
+def read_rss() -> int:
+    """当前常驻内存（字节）"""
+    with open('/proc/self/statm', 'r') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+def run_driver(mode: str, count: int, workers: int, heap: bool = False) -> dict:
+    from entry_record import iter_records, project_entries
+    from download_archive import entry_key
+
+    if heap:
+        tracemalloc.start()
+    baseline = read_rss()
+    entries = (synthetic_entry(i) for i in range(count))
+    if mode == 'dicts':
+        info = {'title': '合集', 'entries': list(entries)}
+        pending = [(i, entry, entry_key(entry)) for i, entry in enumerate(info['entries'], 1)]
+        # 旧实现在开始时为每个条目提交任务，future 和映射表在整个运行期间保留
+        future_to_video = {concurrent.futures.Future(): (i, entry.get('title')) for i, entry, _ in pending}
+        retained = (info, pending, future_to_video)  # 测量时仍被引用
+    elif mode == 'records':
+        info = {'title': '合集', 'entries': list(entries)}
+        records = project_entries(info)
+        pending = [(record.index, record, record.key) for record in records]
+        future_to_video = {concurrent.futures.Future(): (i, record.title) for i, record, _ in pending[:workers * 2]}
+        retained = (info, pending, future_to_video)
+    else:
+        pending = [(record.index, record, record.key) for record in iter_records(entries, '合集')]
+        future_to_video = {concurrent.futures.Future(): (i, record.title) for i, record, _ in pending[:workers * 2]}
+        retained = (pending, future_to_video)
+    gc.collect()
+    if heap:
+        return {'live_heap': tracemalloc.get_traced_memory()[0]}
+    return {
+        'mode': mode,
+        'entries': len(pending),
+        'peak_rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        'retained_rss': read_rss() - baseline,
+    }
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='合集条目内存占用基准测试')
+    parser.add_argument('--entries', type=int, nargs='+', default=[10000], help='合成合集的条目数')
+    parser.add_argument('--workers', type=int, default=4, help='下载线程数（决定在途 future 的数量）')
+    parser.add_argument('--json', help='将结果写入JSON文件')
+    parser.add_argument('--driver', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--heap', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.driver:
+        print(json.dumps(run_driver(args.driver, args.entries[0], args.workers, args.heap)))
+        return
+
+    results = []
+    print(f"{'条目数':>7s} {'模式':<8s} {'峰值 RSS':>10s} {'RSS 增量':>10s} {'存活对象':>10s} {'每条目':>9s}")
+    for count in args.entries:
+        for mode in MODES:
+            command = [sys.executable, str(Path(__file__).resolve()), '--driver', mode,
+                       '--entries', str(count), '--workers', str(args.workers)]
+            result = json.loads(subprocess.run(command, capture_output=True, text=True, check=True).stdout)
+            result.update(json.loads(subprocess.run(command + ['--heap'], capture_output=True, text=True,
+                                                    check=True).stdout))
+            results.append(result)
+            print(f"{count:7d} {mode:<8s} {result['peak_rss'] / (1024 * 1024):8.1f}MB "
+                  f"{result['retained_rss'] / (1024 * 1024):8.1f}MB {result['live_heap'] / (1024 * 1024):8.1f}MB "
+                  f"{result['live_heap'] / max(result['entries'], 1):7.0f} B")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'settings': vars(args), 'results': results}, f, ensure_ascii=False, indent=2)
+        print(f"💾 结果已保存: {args.json}")
+
+if __name__ == "__main__":
+    main()
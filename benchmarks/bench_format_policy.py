@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+音频格式选择策略的下载量对比
+合成带B站音频档位（64K / 132K / 192K AAC，部分条目另有杜比全景声和 Hi-Res FLAC）和视频流的解析结果，
+交给 yt-dlp 完成格式排序和大小估算（不下载），统计各目标格式、码率和策略下需要下载的字节数
+"""
+
+import sys
+import json
+import random
+from collections import Counter
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_DIR = BENCH_DIR.parent
+sys.path.insert(0, str(REPO_DIR))
+
+import yt_dlp
+
+from format_policy import POLICIES, FormatPolicy
+
+TARGETS = (('mp3', '128'), ('mp3', '192'), ('mp3', '320'), ('m4a', '192'), ('flac', '0'))
+
+def synthetic_info(index: int, rng: random.Random, hires_ratio: float) -> dict:
+    """一个B站视频的解析结果（与 yt-dlp B站提取器的格式字段一致，不带 filesize，由 yt-dlp 按码率估算）"""
+    bvid = f"BV1{index:09d}"
+    audio = [('30216', 'mp4a.40.2', 67.0), ('30232', 'mp4a.40.2', 132.0), ('30280', 'mp4a.40.2', 192.0)]
+    if rng.random() < hires_ratio:
+        audio += [('30250', 'ec-3', 448.0), ('30251', 'flac', rng.uniform(800, 1600))]
+    formats = [{
+        'format_id': format_id,
+        'url': f'https://upos-sz-mirrorcos.bilivideo.com/{bvid}-1-{format_id}.m4a',
+        'ext': 'm4a',
+        'acodec': acodec,
+        'vcodec': 'none',
+        'tbr': tbr * rng.uniform(0.95, 1.05),
+    } for format_id, acodec, tbr in audio]
+    formats += [{
+        'format_id': f'{100022 + n}',
+        'url': f'https://upos-sz-mirrorcos.bilivideo.com/{bvid}-1-{100022 + n}.m4s',
+        'ext': 'mp4',
+        'acodec': 'none',
+        'vcodec': 'avc1.640032',
+        'height': height,
+        'tbr': height * 2.5,
+    } for n, height in enumerate((360, 480, 720, 1080))]
+    return {
+        'id': bvid,
+        'title': f'第{index}首',
+        'duration': rng.uniform(180, 300),
+        'webpage_url': f'https://www.bilibili.com/video/{bvid}',
+        'extractor': 'BiliBili',
+        'extractor_key': 'BiliBili',
+        'formats': formats,
+    }
+
+def run_case(infos, audio_format: str, audio_quality: str, policy: str) -> dict:
+    format_policy = FormatPolicy(policy, audio_format, audio_quality)
+    chosen = Counter()
+    with yt_dlp.YoutubeDL({'format': format_policy, 'quiet': True, 'no_warnings': True, 'ignoreerrors': True,
+                           'ignore_no_formats_error': True}) as ydl:
+        for info in infos:
+            result = ydl.process_ie_result(dict(info, formats=[dict(f) for f in info['formats']]), download=False)
+            chosen[(result or {}).get('format_id') or 'none'] += 1
+    stats = format_policy.stats
+    return {
+        'target': f'{audio_format}@{audio_quality}',
+        'policy': policy,
+        'selected': stats['selected'],
+        'selected_bytes': stats['selected_bytes'],
+        'best_bytes': stats['best_bytes'],
+        'formats': dict(chosen),
+    }
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='音频格式选择策略的下载量对比')
+    parser.add_argument('--entries', type=int, default=200, help='合成合集的条目数')
+    parser.add_argument('--hires-ratio', type=float, default=0.5, help='带杜比全景声和 Hi-Res FLAC 的条目比例')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help='将结果写入JSON文件')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    infos = [synthetic_info(i, rng, args.hires_ratio) for i in range(1, args.entries + 1)]
+
+    results = []
+    print(f"{'目标':<9s} {'策略':<20s} {'条目':>5s} {'下载':>10s} {'最高码率':>10s} {'节省':>6s}  选择的格式")
+    for audio_format, audio_quality in TARGETS:
+        for policy in POLICIES:
+            result = run_case(infos, audio_format, audio_quality, policy)
+            results.append(result)
+            saved = 1 - result['selected_bytes'] / result['best_bytes'] if result['best_bytes'] else 0
+            formats = ' '.join(f'{format_id}×{count}' for format_id, count in sorted(result['formats'].items()))
+            print(f"{result['target']:<9s} {policy:<20s} {result['selected']:5d} "
+                  f"{result['selected_bytes'] / (1024 * 1024):8.1f}MB {result['best_bytes'] / (1024 * 1024):8.1f}MB "
+                  f"{saved:6.0%}  {formats}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'settings': vars(args), 'results': results}, f, ensure_ascii=False, indent=2)
+        print(f"💾 结果已保存: {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+边下载边编码的磁盘写入量对比
+用本地B站替身服务器分别以普通流程（先写完整 m4a，再由 FFmpegExtractAudio 读回写出最终文件）
+和管道模式（下载的字节直接写入 FFmpeg 标准输入）下载同一个合集，
+在子进程中读取 /proc/self/io 的 write_bytes（包含已回收的 FFmpeg 子进程），
+统计每个音频写入存储层的字节数与最终文件大小之比
+"""
+
+import sys
+import json
+import time
+import shutil
+import tempfile
+import subprocess
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_DIR = BENCH_DIR.parent
+sys.path.insert(0, str(REPO_DIR))
+sys.path.insert(0, str(BENCH_DIR))
+
+MODES = ('file', 'pipe')
+
+def read_io() -> dict:
+    """当前进程的 I/O 计数（Linux），不可用时返回空字典"""
+    try:
+        with open('/proc/self/io', 'r') as f:
+            return {name: int(value) for name, value in (line.split(':') for line in f)}
+    except OSError:
+        return {}
+
+def run_driver(args):
+    """子进程入口：下载合集，把 I/O 计数的差值写入 --result"""
+    from advanced_extractor import AdvancedBilibiliExtractor
+
+    extractor = AdvancedBilibiliExtractor(args.config)
+    before = read_io()
+    start = time.perf_counter()
+    success = extractor.extract_audio(args.url)
+    elapsed = time.perf_counter() - start
+    after = read_io()
+    with open(args.result, 'w', encoding='utf-8') as f:
+        json.dump({
+            'success': success,
+            'seconds': elapsed,
+            'io': {name: after[name] - before.get(name, 0) for name in after},
+        }, f)
+    sys.exit(0 if success else 1)
+
+def make_config(output: Path, audio_format: str, mode: str, concurrency: int) -> dict:
+    """基于仓库的 config.json，关闭归档、缓存、内容库和 info.json，只保留音频本身的写入"""
+    with open(REPO_DIR / 'config.json', 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    config.update({
+        'output_directory': str(output),
+        'audio_format': audio_format,
+        'max_concurrent_downloads': concurrency,
+    })
+    config['download_archive'] = {'enabled': False}
+    config['metadata_cache'] = {'enabled': False}
+    config['content_store'] = {'enabled': False}
+    config.setdefault('metrics', {})['console_status'] = False
+    config['pipeline'] = {'enabled': False}
+    config['streaming'] = {'enabled': False}
+    config['async_engine'] = {'enabled': False}
+    config.setdefault('download_options', {})['writeinfojson'] = False
+    config['pipe_encode'] = {'enabled': mode == 'pipe'}
+    return config
+
+def run_case(server, work_dir: Path, audio_format: str, mode: str, concurrency: int) -> dict:
+    name = f'{mode}-{audio_format}'
+    output = work_dir / name
+    config_path = work_dir / f'{name}.json'
+    result_path = work_dir / f'{name}.result.json'
+    with open(config_path, 'w', encoding='utf-8') as f:
+        json.dump(make_config(output, audio_format, mode, concurrency), f, ensure_ascii=False)
+
+    server.reset_stats()
+    subprocess.run([sys.executable, str(Path(__file__).resolve()), '--driver', '--url', server.collection_url,
+                    '--config', str(config_path), '--result', str(result_path)],
+                   cwd=work_dir, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    with open(result_path, 'r', encoding='utf-8') as f:
+        driver = json.load(f)
+
+    files = [path for path in output.glob(f'*.{audio_format}') if not path.name.startswith('.')]
+    output_bytes = sum(path.stat().st_size for path in files)
+    write_bytes = driver['io'].get('write_bytes')
+    tracks = max(len(files), 1)
+    return {
+        'case': name,
+        'files': len(files),
+        'seconds': driver['seconds'],
+        'downloaded_bytes': server.stats['bytes_sent'],
+        'output_bytes': output_bytes,
+        'disk_write_bytes': write_bytes,
+        'disk_write_per_track': write_bytes / tracks if write_bytes is not None else None,
+        'write_amplification': write_bytes / output_bytes if write_bytes is not None and output_bytes else None,
+    }
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='边下载边编码的磁盘写入量对比')
+    parser.add_argument('--formats', nargs='+', default=['m4a', 'mp3'], help='输出格式（m4a 为流复制，mp3 为重编码）')
+    parser.add_argument('--tracks', type=int, default=8, help='合集条目数')
+    parser.add_argument('--track-seconds', type=int, default=60, help='每个音频的时长（秒）')
+    parser.add_argument('--concurrency', type=int, default=4, help='并发下载数')
+    parser.add_argument('--dir', default='.', help='在此目录下创建临时输出目录（tmpfs 上的写入不计入 write_bytes）')
+    parser.add_argument('--json', help='将结果写入JSON文件')
+    # 子进程参数
+    parser.add_argument('--driver', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--url', help=argparse.SUPPRESS)
+    parser.add_argument('--config', help=argparse.SUPPRESS)
+    parser.add_argument('--result', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.driver:
+        run_driver(args)
+        return
+
+    if not read_io():
+        print("⚠️ 当前系统没有 /proc/self/io，只能统计文件大小")
+
+    from fake_bilibili import FakeBilibiliServer
+
+    work_dir = Path(tempfile.mkdtemp(prefix='bench_pipe_', dir=args.dir))
+    results = []
+    print(f"{'用例':<10s} {'文件':>4s} {'每个写入':>10s} {'每个大小':>10s} {'写放大':>7s} {'用时':>8s}")
+    try:
+        with FakeBilibiliServer(tracks=args.tracks, track_seconds=args.track_seconds) as server:
+            for audio_format in args.formats:
+                for mode in MODES:
+                    result = run_case(server, work_dir, audio_format, mode, args.concurrency)
+                    results.append(result)
+                    per_track = result['disk_write_per_track']
+                    amplification = result['write_amplification']
+                    size = result['output_bytes'] / max(result['files'], 1)
+                    print(f"{result['case']:<10s} {result['files']:4d} "
+                          f"{(per_track or 0) / (1024 * 1024):8.2f}MB {size / (1024 * 1024):8.2f}MB "
+                          f"{(amplification or 0):6.2f}x {result['seconds']:7.1f}s")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'settings': {key: getattr(args, key) for key in ('formats', 'tracks', 'track_seconds',
+                                                                         'concurrency')},
+                       'results': results}, f, ensure_ascii=False, indent=2)
+        print(f"💾 结果已保存: {args.json}")
+
+if __name__ == "__main__":
+    main()
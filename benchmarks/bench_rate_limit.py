@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+全局限速验证
+同一个本地服务器分别以 localhost（模拟 API）和 127.0.0.1（模拟 CDN）访问，
+多个工作线程共享一个 RateLimiter，由服务器统计实际观测到的请求速率和带宽，
+与配置的预算对比
+"""
+
+import sys
+import json
+import time
+import shutil
+import tempfile
+import threading
+import concurrent.futures
+from pathlib import Path
+
+import yt_dlp
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from local_server import LocalAudioServer
+from rate_limiter import RateLimiter, with_rate_limit
+from ydl_pool import YoutubeDLPool
+
+def measure_requests(server: LocalAudioServer, limiter: RateLimiter, workers: int, duration: float) -> dict:
+    """多个线程尽可能快地发 API 请求，统计服务器看到的每秒请求数"""
+    ydl_class = with_rate_limit()
+    api_url = server.track_url(0).replace('127.0.0.1', 'localhost')
+    stop = threading.Event()
+    server.reset_stats()
+
+    def worker():
+        with ydl_class({'quiet': True, 'rate_limiter': limiter}) as ydl:
+            while not stop.is_set():
+                ydl.urlopen(api_url).close()
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return {'requests': server.stats['requests'], 'seconds': elapsed,
+            'observed_rps': server.stats['requests'] / elapsed}
+
+def resolve_entries(server: LocalAudioServer, entries: int) -> list:
+    """预先解析条目（通用提取器解析时会读取整个响应），之后只统计下载流量"""
+    with yt_dlp.YoutubeDL({'quiet': True, 'no_warnings': True}) as ydl:
+        return [ydl.sanitize_info(ydl.extract_info(server.track_url(i), download=False))
+                for i in range(entries)]
+
+def measure_bandwidth(server: LocalAudioServer, limiter: RateLimiter, workers: int, infos: list) -> dict:
+    """多个线程通过 yt-dlp 下载 CDN 音频，统计服务器发出的总带宽"""
+    work_dir = Path(tempfile.mkdtemp(prefix='bench_rate_limit_'))
+    pool = YoutubeDLPool({
+        'quiet': True,
+        'no_warnings': True,
+        'noprogress': True,
+        'outtmpl': str(work_dir / '%(id)s.%(ext)s'),
+        'rate_limiter': limiter,
+    }, ydl_class=with_rate_limit())
+    server.reset_stats()
+
+    def download(info):
+        with pool.acquire() as (ydl, finished_files):
+            ydl.process_ie_result(dict(info), download=True)
+            return bool(finished_files)
+
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        ok = sum(executor.map(download, infos))
+    elapsed = time.perf_counter() - start
+    pool.close()
+    shutil.rmtree(work_dir, ignore_errors=True)
+    return {'succeeded': ok, 'bytes': server.stats['bytes_sent'], 'seconds': elapsed,
+            'observed_bytes_per_second': server.stats['bytes_sent'] / elapsed}
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='全局限速验证')
+    parser.add_argument('--workers', type=int, default=8, help='工作线程数')
+    parser.add_argument('--rps', type=float, default=5, help='API 每秒请求数预算')
+    parser.add_argument('--bandwidth', type=int, default=1024 * 1024, help='CDN 带宽预算（字节/秒）')
+    parser.add_argument('--entries', type=int, default=16, help='下载条目数')
+    parser.add_argument('--size', type=int, default=512 * 1024, help='每个条目的字节数')
+    parser.add_argument('--duration', type=float, default=5, help='请求速率测试时长（秒）')
+    parser.add_argument('--json', help='将结果写入JSON文件')
+    args = parser.parse_args()
+
+    limiter = RateLimiter({
+        'api': {'match': ['localhost'], 'requests_per_second': args.rps, 'burst': 1},
+        'cdn': {'match': ['127.0.0.1'], 'bytes_per_second': args.bandwidth},
+    })
+
+    results = {}
+    with LocalAudioServer(tracks=args.entries, payload=bytes(args.size)) as server:
+        requests_result = measure_requests(server, limiter, args.workers, args.duration)
+        results['api'] = dict(requests_result, target_rps=args.rps)
+        print(f"  API  目标 {args.rps:8.2f} 请求/s   观测 {requests_result['observed_rps']:8.2f} 请求/s "
+              f"({args.workers} 个线程)")
+
+        infos = resolve_entries(server, args.entries)
+        bandwidth_result = measure_bandwidth(server, limiter, args.workers, infos)
+        results['cdn'] = dict(bandwidth_result, target_bytes_per_second=args.bandwidth)
+        print(f"  CDN  目标 {args.bandwidth / 1024:8.1f} KiB/s    "
+              f"观测 {bandwidth_result['observed_bytes_per_second'] / 1024:8.1f} KiB/s "
+              f"(成功 {bandwidth_result['succeeded']}/{args.entries})")
+
+        unlimited = measure_bandwidth(server, RateLimiter(), args.workers, infos)
+        results['cdn_unlimited'] = unlimited
+        print(f"  CDN  不限速            观测 {unlimited['observed_bytes_per_second'] / 1024:8.1f} KiB/s")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"💾 结果已保存: {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+重命名引擎基准测试
+按 rename_mp3.py 文档中列出的文件名格式生成合成语料，比较逐条调用未编译正则的旧实现
+与编译规则表的提取速度，并测量生成计划和在临时目录中批量执行计划的耗时
+"""
+
+import re
+import sys
+import json
+import time
+import random
+import shutil
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from rename_mp3 import DEFAULT_RULES, RenameRules, apply_plan, build_rename_plan, list_mp3_names
+
+SONGS = ['爱相随', '谁明浪子心', 'My heart will go on', 'Say You, Say Me', '朋友', '红日', '一场游戏一场梦']
+SINGERS = ['周华健', '王杰', '李克勤', 'Celine Dion']
+
+FORMATS = [
+    lambda i, song: f"{i:02d}_【合集11首】{random.choice(SINGERS)}-经典歌曲高品质立体声伴奏合集-精品伴奏馆 p{i:02d} {song}-{random.choice(SINGERS)}-立体声伴奏.mp3",
+    lambda i, song: f"{i:02d}_【Hi-Res无损音质】2025年王杰100首精选歌曲合集（只选播放量最高的）值得单曲循环的歌单！ p{i:02d} {i}.{song}.mp3",
+    lambda i, song: f"{i:02d}_70后 80后 90后 欧美奥斯卡电影金曲精选合集（1940-2015）珍藏版 值得回味收藏！ p{i:02d} 【开头王炸】{song}-泰坦尼克号-1997.mp3",
+    lambda i, song: f"NA_奥斯卡百年金曲《{song}》，歌声飘过36年，永恒的经典 {i}.mp3",
+]
+
+def legacy_extract_song_name(filename):
+    """旧实现：每个文件依次对字符串模式调用 re.search"""
+    name_without_ext = filename.rsplit('.', 1)[0]
+    for rule in DEFAULT_RULES:
+        match = re.search(rule['pattern'], name_without_ext)
+        if match:
+            song_name = match.group(1).strip()
+            if rule.get('split_dash') and '-' in song_name:
+                song_name = song_name.split('-')[0].strip()
+            return song_name
+    return name_without_ext
+
+def generate_corpus(count: int, seed: int = 0):
+    random.seed(seed)
+    return [FORMATS[i % len(FORMATS)](i % 100 + 1, f"{random.choice(SONGS)}{i % 1000}") for i in range(count)]
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='重命名引擎基准测试')
+    parser.add_argument('--count', type=int, default=100000, help='合成文件名数量')
+    parser.add_argument('--apply-count', type=int, default=5000, help='在临时目录中实际执行的文件数')
+    parser.add_argument('--json', help='将结果写入JSON文件')
+    args = parser.parse_args()
+
+    corpus = generate_corpus(args.count)
+    rules = RenameRules()
+    results = {'count': args.count}
+
+    _, legacy_seconds = timed(lambda: [legacy_extract_song_name(name) for name in corpus])
+    _, compiled_seconds = timed(lambda: [rules.extract(name) for name in corpus])
+    plan, plan_seconds = timed(build_rename_plan, corpus, rules)
+    results.update({
+        'legacy_extract_seconds': legacy_seconds,
+        'compiled_extract_seconds': compiled_seconds,
+        'plan_seconds': plan_seconds,
+        'planned_renames': len(plan),
+        'collisions_resolved': sum(1 for _, new_name in plan if new_name.endswith(').mp3')),
+    })
+    print(f"  提取（旧实现）  {legacy_seconds:7.3f} s")
+    print(f"  提取（规则表）  {compiled_seconds:7.3f} s")
+    print(f"  生成计划        {plan_seconds:7.3f} s  ({len(plan)} 项, {results['collisions_resolved']} 个重名已解决)")
+
+    # 确定性：打乱输入顺序后计划不变
+    shuffled = corpus[:]
+    random.shuffle(shuffled)
+    results['deterministic'] = build_rename_plan(shuffled, rules) == plan
+    print(f"  计划与输入顺序无关: {results['deterministic']}")
+
+    work_dir = Path(tempfile.mkdtemp(prefix='bench_rename_'))
+    try:
+        for name in corpus[:args.apply_count]:
+            (work_dir / name).touch()
+        names, _ = timed(list_mp3_names, work_dir)
+        small_plan = build_rename_plan(names, rules)
+        renamed, apply_seconds = timed(apply_plan, work_dir, small_plan)
+        results.update({'apply_count': renamed, 'apply_seconds': apply_seconds})
+        print(f"  批量执行        {apply_seconds:7.3f} s  ({renamed} 个文件)")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"💾 结果已保存: {args.json}")
+
+if __name__ == "__main__":
+    main()
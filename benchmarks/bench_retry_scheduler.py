@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按错误类型重试的对比测试
+本地B站替身服务器注入三类错误：随机 503（网络抖动）、一段时间内全部返回 429（持续限流）、
+合集中列出但不存在的条目（404），分别用原地重试（retry.enabled = false，yt-dlp 自身重试）
+和重试队列（退避后放回队列末尾 + 熔断器）下载同一个合集，
+统计完成数、失败数、服务器收到的音频请求数和总耗时
+"""
+
+import sys
+import json
+import time
+import shutil
+import tempfile
+import contextlib
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_DIR = BENCH_DIR.parent
+sys.path.insert(0, str(REPO_DIR))
+sys.path.insert(0, str(BENCH_DIR))
+
+from fake_bilibili import FakeBilibiliServer
+
+SCENARIOS = ('flaky', 'outage', 'missing')
+
+# 缩短退避和冷却时间，让测试在几十秒内完成
+FAST_RETRY = {
+    'enabled': True,
+    'throttled': {'max_retries': 6, 'base_delay': 0.5, 'max_delay': 4},
+    'network': {'max_retries': 4, 'base_delay': 0.2, 'max_delay': 2},
+    'forbidden': {'max_retries': 0},
+    'not_found': {'max_retries': 0},
+    'other': {'max_retries': 1, 'base_delay': 0.2, 'max_delay': 1},
+    'circuit_breaker': {'enabled': True, 'threshold': 3, 'window': 5, 'cooldown': 1.5, 'max_cooldown': 6},
+}
+
+def make_config(output: Path, concurrency: int, scheduled: bool) -> dict:
+    """基于仓库的 config.json，关闭归档、缓存和内容库，使用线程池模式"""
+    with open(REPO_DIR / 'config.json', 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    config.update({
+        'output_directory': str(output),
+        'audio_format': 'm4a',
+        'max_concurrent_downloads': concurrency,
+    })
+    config['download_archive'] = {'enabled': False}
+    config['metadata_cache'] = {'enabled': False}
+    config['content_store'] = {'enabled': False}
+    config.setdefault('metrics', {})['console_status'] = False
+    config['pipeline'] = {'enabled': False}
+    config['streaming'] = {'enabled': False}
+    config['async_engine'] = {'enabled': False}
+    config['retry'] = FAST_RETRY if scheduled else {'enabled': False}
+    return config
+
+def start_server(scenario: str, args) -> FakeBilibiliServer:
+    options = {'tracks': args.tracks, 'track_seconds': args.track_seconds, 'latency': 0.02, 'seed': 7}
+    if scenario == 'flaky':
+        options.update(error_rate=args.error_rate, error_status=503)
+    elif scenario == 'missing':
+        options['missing_tracks'] = args.missing
+    return FakeBilibiliServer(**options).start()
+
+def run_case(server: FakeBilibiliServer, scenario: str, scheduled: bool, work_dir: Path, args) -> dict:
+    from advanced_extractor import AdvancedBilibiliExtractor
+
+    name = f"{scenario}-{'scheduled' if scheduled else 'in_place'}"
+    output = work_dir / name
+    config_path = work_dir / f'{name}.json'
+    with open(config_path, 'w', encoding='utf-8') as f:
+        json.dump(make_config(output, args.concurrency, scheduled), f, ensure_ascii=False)
+
+    with open(work_dir / f'{name}.log', 'w', encoding='utf-8') as log:
+        with contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(log):
+            extractor = AdvancedBilibiliExtractor(str(config_path))
+            server.reset_stats()
+            if scenario == 'outage':
+                server.outage(args.outage_seconds, 429)
+            start = time.perf_counter()
+            extractor.extract_audio(server.collection_url)
+            elapsed = time.perf_counter() - start
+    server.outage_until = 0.0
+
+    counters = extractor.metrics.snapshot()['counters']
+    files = [path for path in output.glob('*.m4a') if not path.name.startswith('.')]
+    return {
+        'case': name,
+        'completed': len(files),
+        'failed': counters.get('failed', 0),
+        'retries': counters.get('retries', 0),
+        'requests': server.stats['requests'] - server.stats['metadata_requests'],
+        'rejected': server.stats['errors'] + server.stats['outage'],
+        'seconds': elapsed,
+    }
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='按错误类型重试的对比测试')
+    parser.add_argument('--scenarios', nargs='+', default=list(SCENARIOS), choices=SCENARIOS, help='要运行的场景')
+    parser.add_argument('--tracks', type=int, default=12, help='合集条目数')
+    parser.add_argument('--track-seconds', type=int, default=5, help='每个音频的时长（秒）')
+    parser.add_argument('--concurrency', type=int, default=4, help='并发下载数')
+    parser.add_argument('--error-rate', type=float, default=0.3, help='flaky 场景中音频请求返回 503 的概率')
+    parser.add_argument('--outage-seconds', type=float, default=4, help='outage 场景中持续返回 429 的秒数')
+    parser.add_argument('--missing', type=int, default=3, help='missing 场景中不存在的条目数')
+    parser.add_argument('--verbose', action='store_true', help='显示提取器输出')
+    parser.add_argument('--json', help='将结果写入JSON文件')
+    args = parser.parse_args()
+
+    work_dir = Path(tempfile.mkdtemp(prefix='bench_retry_'))
+    results = []
+    print(f"{'用例':<22s} {'完成':>5s} {'失败':>5s} {'重试':>5s} {'请求数':>7s} {'被拒':>5s} {'用时':>8s}")
+    try:
+        for scenario in args.scenarios:
+            for scheduled in (False, True):
+                server = start_server(scenario, args)
+                try:
+                    result = run_case(server, scenario, scheduled, work_dir, args)
+                finally:
+                    server.stop()
+                results.append(result)
+                print(f"{result['case']:<22s} {result['completed']:5d} {result['failed']:5d} {result['retries']:5d} "
+                      f"{result['requests']:7d} {result['rejected']:5d} {result['seconds']:7.1f}s")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'settings': vars(args), 'results': results}, f, ensure_ascii=False, indent=2)
+        print(f"💾 结果已保存: {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分段下载基准测试
+本地服务器限制单连接带宽，比较单连接和多连接 Range 分段下载同一个长音频的耗时，
+并可让服务器随机中断连接，验证各分段独立重试后内容与原始数据一致
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from local_server import LocalAudioServer
+from segmented_download import SegmentedDownloader, SegmentedYoutubeDL
+from ydl_pool import YoutubeDLPool
+
+def run_case(server: LocalAudioServer, segments: int, min_segment_size: int) -> dict:
+    work_dir = Path(tempfile.mkdtemp(prefix='bench_segmented_'))
+    downloader = SegmentedDownloader(segments=segments, min_segment_size=min_segment_size, chunk_retries=10)
+    server.reset_stats()
+    try:
+        output = work_dir / 'track.m4a'
+        start = time.perf_counter()
+        downloader.download(server.track_url(0), output)
+        elapsed = time.perf_counter() - start
+        digest = hashlib.sha256(output.read_bytes()).hexdigest()
+    finally:
+        downloader.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return {
+        'segments': segments,
+        'seconds': elapsed,
+        'throughput_kib_s': len(server.payload) / elapsed / 1024,
+        'requests': server.stats['requests'],
+        'dropped_connections': server.stats['dropped'],
+        'content_ok': digest == hashlib.sha256(server.payload).hexdigest(),
+    }
+
+def run_ydl_case(server: LocalAudioServer, segments: int, min_segment_size: int) -> dict:
+    """通过 SegmentedYoutubeDL 走完整的 yt-dlp 下载流程"""
+    work_dir = Path(tempfile.mkdtemp(prefix='bench_segmented_ydl_'))
+    pool = YoutubeDLPool({
+        'quiet': True,
+        'no_warnings': True,
+        'noprogress': True,
+        'outtmpl': str(work_dir / '%(id)s.%(ext)s'),
+        'segmented_download': {'segments': segments, 'min_segment_size': min_segment_size, 'chunk_retries': 10},
+    }, ydl_class=SegmentedYoutubeDL)
+    server.reset_stats()
+    try:
+        start = time.perf_counter()
+        with pool.acquire() as (ydl, finished_files):
+            ydl.download([server.track_url(0)])
+        elapsed = time.perf_counter() - start
+        content_ok = bool(finished_files) and Path(finished_files[-1]).read_bytes() == server.payload
+    finally:
+        pool.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return {'segments': segments, 'seconds': elapsed, 'content_ok': content_ok}
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='分段下载基准测试')
+    parser.add_argument('--size', type=int, default=16 * 1024 * 1024, help='音频大小（字节）')
+    parser.add_argument('--bandwidth', type=int, default=2 * 1024 * 1024, help='服务器单连接带宽（字节/秒）')
+    parser.add_argument('--segments', type=int, nargs='+', default=[1, 4, 8], help='要比较的分段数')
+    parser.add_argument('--drop-rate', type=float, default=0.0, help='服务器中途断开连接的概率')
+    parser.add_argument('--json', help='将结果写入JSON文件')
+    args = parser.parse_args()
+
+    min_segment_size = 256 * 1024
+    results = {'size': args.size, 'bandwidth': args.bandwidth, 'drop_rate': args.drop_rate, 'cases': []}
+    with LocalAudioServer(tracks=1, payload=os.urandom(args.size), bandwidth_per_connection=args.bandwidth,
+                          drop_rate=args.drop_rate) as server:
+        for segments in args.segments:
+            result = run_case(server, segments, min_segment_size)
+            results['cases'].append(result)
+            print(f"  {segments:2d} 段  用时 {result['seconds']:6.2f} s  吞吐 {result['throughput_kib_s']:9.1f} KiB/s  "
+                  f"请求 {result['requests']:3d}  断开 {result['dropped_connections']:2d}  内容一致 {result['content_ok']}")
+
+        server.drop_rate = 0.0
+        results['yt_dlp'] = run_ydl_case(server, max(args.segments), min_segment_size)
+        print(f"  yt-dlp 流程 ({results['yt_dlp']['segments']} 段)  用时 {results['yt_dlp']['seconds']:6.2f} s  "
+              f"内容一致 {results['yt_dlp']['content_ok']}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"💾 结果已保存: {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+启动开销基准测试
+分别测量冷启动（删除仓库的 __pycache__ 和工具探测缓存）和热启动的耗时：
+统一入口 bili.py 的 --help / list / download --help 与直接运行各脚本的 --help 对比，
+以及 yt-dlp / FFmpeg 探测（每次启动子进程 vs 使用缓存）的开销；
+同时用 -X importtime 统计每条命令导入的模块数
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import statistics
+import subprocess
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_DIR = BENCH_DIR.parent
+
+PROBE_UNCACHED = ("import subprocess\n"
+                  "for cmd in (['yt-dlp', '--version'], ['ffmpeg', '-version']):\n"
+                  "    try:\n"
+                  "        subprocess.run(cmd, capture_output=True)\n"
+                  "    except FileNotFoundError:\n"
+                  "        pass\n")
+PROBE_CACHED = "from toolchain import find_tool\nfind_tool('yt-dlp')\nfind_tool('ffmpeg')\n"
+
+def commands(list_dir: Path):
+    python = sys.executable
+    return [
+        ('bili.py --help', [python, 'bili.py', '--help']),
+        ('bili.py list', [python, 'bili.py', 'list', str(list_dir)]),
+        ('bili.py download --help', [python, 'bili.py', 'download', '--help']),
+        ('advanced_extractor.py --help', [python, 'advanced_extractor.py', '--help']),
+        ('bilibili_audio_extractor.py --help', [python, 'bilibili_audio_extractor.py', '--help']),
+        ('convert_to_mp3.py --help', [python, 'convert_to_mp3.py', '--help']),
+        ('工具探测（子进程）', [python, '-c', PROBE_UNCACHED]),
+        ('工具探测（缓存）', [python, '-c', PROBE_CACHED]),
+    ]
+
+def clear_bytecode():
+    for path in REPO_DIR.rglob('__pycache__'):
+        shutil.rmtree(path, ignore_errors=True)
+
+def run_once(cmd, env) -> float:
+    start = time.perf_counter()
+    subprocess.run(cmd, cwd=REPO_DIR, env=env, stdin=subprocess.DEVNULL,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+def imported_modules(cmd, env) -> int:
+    """-X importtime 输出中的模块数"""
+    result = subprocess.run([cmd[0], '-X', 'importtime', *cmd[1:]], cwd=REPO_DIR, env=env,
+                            stdin=subprocess.DEVNULL, capture_output=True, text=True)
+    return sum(1 for line in result.stderr.splitlines() if line.startswith('import time:')) - 1
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='启动开销基准测试')
+    parser.add_argument('--runs', type=int, default=10, help='每条命令的热启动次数')
+    parser.add_argument('--cold-runs', type=int, default=3, help='每条命令的冷启动次数')
+    parser.add_argument('--json', help='将结果写入JSON文件')
+    args = parser.parse_args()
+
+    work_dir = Path(tempfile.mkdtemp(prefix='bench_startup_'))
+    list_dir = work_dir / 'audio'
+    list_dir.mkdir()
+    for i in range(50):
+        (list_dir / f'{i:02d}_track.mp3').write_bytes(b'\0' * 1024)
+    cache_file = work_dir / 'toolchain.json'
+    env = dict(os.environ, BILI_TOOLCHAIN_CACHE=str(cache_file))
+
+    results = []
+    print(f"{'命令':<36s} {'冷启动':>9s} {'热启动':>9s} {'模块数':>6s}")
+    try:
+        for label, cmd in commands(list_dir):
+            cold = []
+            for _ in range(args.cold_runs):
+                clear_bytecode()
+                cache_file.unlink(missing_ok=True)
+                cold.append(run_once(cmd, env))
+            # 预热后测量（字节码和探测缓存都已存在）
+            run_once(cmd, env)
+            warm = [run_once(cmd, env) for _ in range(args.runs)]
+            result = {
+                'command': label,
+                'cold_ms': statistics.median(cold) * 1000,
+                'warm_ms': statistics.median(warm) * 1000,
+                'modules': imported_modules(cmd, env),
+            }
+            results.append(result)
+            print(f"{label:<36s} {result['cold_ms']:7.0f}ms {result['warm_ms']:7.0f}ms {result['modules']:6d}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'python': sys.version.split()[0], 'results': results}, f, ensure_ascii=False, indent=2)
+        print(f"💾 结果已保存: {args.json}")
+
+if __name__ == "__main__":
+    main()
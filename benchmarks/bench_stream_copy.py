@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流复制 vs 重编码基准测试
+生成与B站DASH音频相同的 AAC/m4a 测试文件，分别用流复制和 libmp3lame
+重编码处理，按每小时音频统计墙钟时间和 CPU 秒数
+"""
+
+import sys
+import json
+import time
+import shutil
+import resource
+import tempfile
+import subprocess
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from transcoder import build_copy_command, build_transcode_command
+
+def children_cpu_seconds() -> float:
+    """已结束子进程累计的 CPU 秒数（用户态 + 内核态）"""
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+def generate_source(path: Path, seconds: int):
+    """生成 AAC 编码的 m4a 测试音频"""
+    cmd = [
+        'ffmpeg', '-hide_banner', '-loglevel', 'error',
+        '-f', 'lavfi', '-i', f'sine=frequency=440:duration={seconds}',
+        '-ac', '2', '-c:a', 'aac', '-b:a', '192k', '-y', str(path)
+    ]
+    subprocess.run(cmd, check=True)
+
+def measure(cmd, runs: int):
+    """多次运行命令，返回平均墙钟时间和 CPU 秒数"""
+    wall_total = 0.0
+    cpu_total = 0.0
+    for _ in range(runs):
+        cpu_before = children_cpu_seconds()
+        start = time.perf_counter()
+        subprocess.run(cmd, check=True, capture_output=True)
+        wall_total += time.perf_counter() - start
+        cpu_total += children_cpu_seconds() - cpu_before
+    return wall_total / runs, cpu_total / runs
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='流复制 vs 重编码基准测试')
+    parser.add_argument('--seconds', type=int, default=600, help='测试音频时长（秒）')
+    parser.add_argument('--runs', type=int, default=3, help='每种模式的运行次数')
+    parser.add_argument('--json', help='将结果写入JSON文件')
+    args = parser.parse_args()
+
+    if not shutil.which('ffmpeg'):
+        print("❌ 未找到 FFmpeg")
+        sys.exit(1)
+
+    work_dir = Path(tempfile.mkdtemp(prefix='bench_stream_copy_'))
+    try:
+        source = work_dir / 'source.m4a'
+        print(f"🎵 生成 {args.seconds} 秒 AAC 测试音频...")
+        generate_source(source, args.seconds)
+
+        cases = {
+            'copy_m4a': build_copy_command(source, work_dir / 'copy.m4a', 'm4a'),
+            'transcode_mp3': build_transcode_command(source, work_dir / 'out.mp3', 'mp3', '192'),
+        }
+
+        hours = args.seconds / 3600
+        results = {'audio_seconds': args.seconds, 'runs': args.runs, 'cases': {}}
+        for name, cmd in cases.items():
+            wall, cpu = measure(cmd, args.runs)
+            results['cases'][name] = {
+                'wall_seconds': wall,
+                'cpu_seconds': cpu,
+                'wall_seconds_per_audio_hour': wall / hours,
+                'cpu_seconds_per_audio_hour': cpu / hours,
+            }
+            print(f"  {name:<14s} 墙钟 {wall / hours:8.2f} s/小时音频   CPU {cpu / hours:8.2f} s/小时音频")
+
+        copy_cpu = results['cases']['copy_m4a']['cpu_seconds'] or 1e-9
+        print(f"📊 重编码 CPU 开销约为流复制的 {results['cases']['transcode_mp3']['cpu_seconds'] / copy_cpu:.0f} 倍")
+
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+            print(f"💾 结果已保存: {args.json}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
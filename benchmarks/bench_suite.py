@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+离线端到端基准测试
+启动本地B站替身服务器（合集元数据 + 生成的音频流，可设置延迟、带宽、错误注入），
+在子进程中分别运行 simple_extractor / bilibili_audio_extractor / advanced_extractor
+（高级版按每种模式和并发数各跑一次），统计吞吐量、首个文件完成时间、CPU 秒数和峰值内存，
+结果保存为 JSON，可与上一版本的结果对比
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import tempfile
+import subprocess
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_DIR = BENCH_DIR.parent
+sys.path.insert(0, str(REPO_DIR))
+sys.path.insert(0, str(BENCH_DIR))
+
+ADVANCED_MODES = ('threaded', 'pipeline', 'adaptive', 'stream')
+
+def run_driver(args):
+    """子进程入口：运行一个提取器，退出码表示是否成功"""
+    if args.driver == 'simple':
+        from simple_extractor import SimpleBilibiliExtractor
+        success = SimpleBilibiliExtractor(args.output, args.format).extract_audio_simple(args.url)
+    elif args.driver == 'full':
+        from bilibili_audio_extractor import BilibiliAudioExtractor
+        success = BilibiliAudioExtractor(args.output, args.format).extract_audio_from_url(args.url)
+    else:
+        from advanced_extractor import AdvancedBilibiliExtractor
+        success = AdvancedBilibiliExtractor(args.config).extract_audio(args.url)
+    sys.exit(0 if success else 1)
+
+def advanced_config(output: Path, audio_format: str, mode: str, concurrency: int) -> dict:
+    """基于仓库的 config.json，关闭归档和缓存，保证每次都是完整的冷启动运行"""
+    with open(REPO_DIR / 'config.json', 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    config.update({
+        'output_directory': str(output),
+        'audio_format': audio_format,
+        'max_concurrent_downloads': concurrency,
+    })
+    config['download_archive'] = {'enabled': False}
+    config['metadata_cache'] = {'enabled': False}
+    config.setdefault('metrics', {})['console_status'] = False
+    config.setdefault('pipeline', {})['enabled'] = mode == 'pipeline'
+    config.setdefault('streaming', {})['enabled'] = mode == 'stream'
+    config.setdefault('async_engine', {}).update({
+        'enabled': mode == 'adaptive',
+        'max_concurrency': concurrency,
+        'initial_concurrency': min(2, concurrency),
+    })
+    return config
+
+def finished_files(output: Path, audio_format: str):
+    return [path for path in output.glob(f'*.{audio_format}') if not path.name.startswith('.')]
+
+def rss_mib(rusage) -> float:
+    # Linux 上 ru_maxrss 以 KiB 为单位，macOS 上以字节为单位
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return rusage.ru_maxrss / divisor
+
+def run_case(server, work_dir: Path, extractor: str, mode: str, concurrency: int, audio_format: str,
+             timeout: float) -> dict:
+    name = f'{extractor}-{mode}-c{concurrency}'
+    output = work_dir / name
+    output.mkdir()
+    cmd = [sys.executable, str(Path(__file__).resolve()), '--driver', extractor,
+           '--url', server.collection_url, '--output', str(output), '--format', audio_format]
+    if extractor == 'advanced':
+        config_path = work_dir / f'{name}.json'
+        with open(config_path, 'w', encoding='utf-8') as f:
+            json.dump(advanced_config(output, audio_format, mode, concurrency), f, ensure_ascii=False)
+        cmd += ['--config', str(config_path)]
+
+    server.reset_stats()
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=work_dir, stdin=subprocess.DEVNULL,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    first_file = None
+    timed_out = False
+    while True:
+        # wait4 返回该子进程（含其已回收的子进程，如 yt-dlp / ffmpeg）的资源用量
+        pid, status, rusage = os.wait4(proc.pid, os.WNOHANG)
+        if pid:
+            break
+        if first_file is None and finished_files(output, audio_format):
+            first_file = time.perf_counter() - start
+        if time.perf_counter() - start > timeout and not timed_out:
+            proc.kill()
+            timed_out = True
+        time.sleep(0.02)
+    elapsed = time.perf_counter() - start
+    proc.returncode = os.waitstatus_to_exitcode(status)
+
+    files = finished_files(output, audio_format)
+    output_bytes = sum(path.stat().st_size for path in files)
+    if first_file is None and files:
+        first_file = elapsed
+    return {
+        'case': name,
+        'extractor': extractor,
+        'mode': mode,
+        'concurrency': concurrency,
+        'exit_code': proc.returncode,
+        'timed_out': timed_out,
+        'files': len(files),
+        'expected_files': server.tracks,
+        'seconds': elapsed,
+        'time_to_first_file': first_file,
+        'output_bytes': output_bytes,
+        'server_bytes': server.stats['bytes_sent'],
+        'throughput_mib_s': output_bytes / elapsed / (1024 * 1024),
+        'cpu_seconds': rusage.ru_utime + rusage.ru_stime,
+        'peak_rss_mib': rss_mib(rusage),
+        'requests': server.stats['requests'],
+        'injected_errors': server.stats['errors'],
+        'dropped_connections': server.stats['dropped'],
+    }
+
+def environment() -> dict:
+    import yt_dlp
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                                capture_output=True, text=True).stdout.strip() or None
+    except FileNotFoundError:
+        commit = None
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'yt_dlp': yt_dlp.version.__version__,
+        'ffmpeg': shutil.which('ffmpeg'),
+        'cpu_count': os.cpu_count(),
+    }
+
+def print_comparison(results: dict, baseline_path: str):
+    """与基线结果逐项对比"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {run['case']: run for run in json.load(f)['runs']}
+    print(f"\n📊 与基线对比 ({baseline_path})")
+    for run in results['runs']:
+        old = baseline.get(run['case'])
+        if old is None:
+            continue
+        changes = []
+        for key, label in (('seconds', '用时'), ('time_to_first_file', '首个文件'),
+                           ('cpu_seconds', 'CPU'), ('peak_rss_mib', '内存')):
+            if run.get(key) and old.get(key):
+                changes.append(f"{label} {(run[key] - old[key]) / old[key] * 100:+.1f}%")
+        print(f"  {run['case']:<24s} " + '  '.join(changes))
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='离线端到端基准测试')
+    parser.add_argument('--extractors', nargs='+', default=['simple', 'full', 'advanced'],
+                        choices=['simple', 'full', 'advanced'], help='要测试的提取器')
+    parser.add_argument('--advanced-modes', nargs='+', default=['threaded'], choices=ADVANCED_MODES,
+                        help='高级版的运行模式')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4], help='高级版的并发数')
+    parser.add_argument('--tracks', type=int, default=12, help='合集条目数')
+    parser.add_argument('--track-seconds', type=int, default=20, help='每个音频的时长（秒）')
+    parser.add_argument('--format', default='m4a', help='输出音频格式')
+    parser.add_argument('--latency', type=float, default=0.05, help='每个请求的延迟（秒）')
+    parser.add_argument('--bandwidth', type=int, default=1024 * 1024, help='单连接带宽（字节/秒，0 为不限）')
+    parser.add_argument('--server-limit', type=int, help='服务器允许的最大并发请求数（超出返回 429）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='音频请求返回 503 的概率')
+    parser.add_argument('--drop-rate', type=float, default=0.0, help='音频响应中途断开的概率')
+    parser.add_argument('--timeout', type=float, default=600, help='单个用例的超时（秒）')
+    parser.add_argument('--json', help='将结果写入JSON文件')
+    parser.add_argument('--baseline', help='与之前保存的JSON结果对比')
+    # 子进程参数
+    parser.add_argument('--driver', choices=['simple', 'full', 'advanced'], help=argparse.SUPPRESS)
+    parser.add_argument('--url', help=argparse.SUPPRESS)
+    parser.add_argument('--output', help=argparse.SUPPRESS)
+    parser.add_argument('--config', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.driver:
+        run_driver(args)
+        return
+
+    from fake_bilibili import FakeBilibiliServer
+
+    results = {
+        'environment': environment(),
+        'settings': {key: getattr(args, key) for key in (
+            'tracks', 'track_seconds', 'format', 'latency', 'bandwidth', 'server_limit',
+            'error_rate', 'drop_rate')},
+        'runs': [],
+    }
+    cases = []
+    for extractor in args.extractors:
+        if extractor == 'advanced':
+            cases += [(extractor, mode, c) for mode in args.advanced_modes for c in args.concurrency]
+        else:
+            # 简化版和完整版都是顺序下载
+            cases.append((extractor, 'sequential', 1))
+
+    work_dir = Path(tempfile.mkdtemp(prefix='bench_suite_'))
+    try:
+        print(f"🎵 生成测试音频并启动本地服务器（{args.tracks} 个条目）...")
+        with FakeBilibiliServer(tracks=args.tracks, track_seconds=args.track_seconds, latency=args.latency,
+                                bandwidth_per_connection=args.bandwidth or None,
+                                max_concurrent_requests=args.server_limit,
+                                error_rate=args.error_rate, drop_rate=args.drop_rate, seed=0) as server:
+            for extractor, mode, concurrency in cases:
+                run = run_case(server, work_dir, extractor, mode, concurrency, args.format, args.timeout)
+                results['runs'].append(run)
+                ttff = f"{run['time_to_first_file']:6.2f} s" if run['time_to_first_file'] is not None else '     -  '
+                print(f"  {run['case']:<24s} 用时 {run['seconds']:7.2f} s  首个文件 {ttff}  "
+                      f"{run['throughput_mib_s']:6.2f} MiB/s  CPU {run['cpu_seconds']:6.2f} s  "
+                      f"内存 {run['peak_rss_mib']:6.1f} MiB  文件 {run['files']}/{run['expected_files']}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.baseline:
+        print_comparison(results, args.baseline)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"💾 结果已保存: {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量补写标签的磁盘写入量基准测试
+生成一批带 ID3v2 标签（含填充）的合成 MP3，分别用两种方式改写曲目序号、专辑、艺术家和标题：
+  rewrite   每个文件整体重写一遍（相当于再跑一遍 FFmpeg 的后处理）
+  in_place  原地 ID3 更新器，只重写文件开头的标签区
+统计写入的字节数和耗时（--dir 指向要测量的存储，如 NAS 挂载点）
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_DIR = BENCH_DIR.parent
+sys.path.insert(0, str(REPO_DIR))
+
+from audio_tags import write_tags
+
+def make_library(directory: Path, count: int, size: int):
+    """合成音频库：每个文件带一个只有标题的 ID3v2.3 标签，之后是随机的“音频”数据"""
+    directory.mkdir(parents=True, exist_ok=True)
+    audio = os.urandom(size)
+    for i in range(1, count + 1):
+        path = directory / f'{i:02d}_【合集】经典歌曲 p{i:02d} 歌曲{i}-歌手-立体声伴奏.mp3'
+        path.write_bytes(audio)
+        # 第一次写入：插入标签并留出填充（之后才能原地更新）
+        write_tags(path, {'title': f'歌曲{i}'})
+
+def run_case(directory: Path, mode: str) -> dict:
+    written = 0
+    start = time.perf_counter()
+    for n, path in enumerate(sorted(directory.glob('*.mp3')), 1):
+        tags = {'title': f'歌曲{n}', 'artist': '精品伴奏馆', 'album': '【合集】经典歌曲', 'track': str(n)}
+        if mode == 'rewrite':
+            # 第二遍后处理：连同新标签写出一份完整的新文件，再替换原文件
+            temp = path.with_name(f'.{path.name}.rewrite')
+            shutil.copyfile(path, temp)
+            _, tag_size = write_tags(temp, tags)
+            os.replace(temp, path)
+            size = path.stat().st_size + tag_size
+        else:
+            _, size = write_tags(path, tags)
+        written += size
+    return {'mode': mode, 'bytes_written': written, 'seconds': time.perf_counter() - start}
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='批量补写标签的磁盘写入量基准测试')
+    parser.add_argument('--count', type=int, default=500, help='文件数')
+    parser.add_argument('--size', type=int, default=4 * 1024 * 1024, help='每个文件的大小（字节）')
+    parser.add_argument('--dir', help='测试目录所在的存储（默认系统临时目录）')
+    parser.add_argument('--json', help='将结果写入JSON文件')
+    args = parser.parse_args()
+
+    work_dir = Path(tempfile.mkdtemp(prefix='bench_tagging_', dir=args.dir))
+    results = []
+    total = args.count * args.size
+    print(f"📁 {args.count} 个文件，共 {total / (1024 * 1024):.0f} MB")
+    print(f"{'模式':<10s} {'写入':>12s} {'写入/总大小':>10s} {'用时':>8s}")
+    try:
+        for mode in ('rewrite', 'in_place'):
+            directory = work_dir / mode
+            make_library(directory, args.count, args.size)
+            result = run_case(directory, mode)
+            results.append(result)
+            print(f"{mode:<10s} {result['bytes_written'] / (1024 * 1024):10.1f}MB "
+                  f"{result['bytes_written'] / total:10.2%} {result['seconds']:7.2f}s")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'settings': vars(args), 'results': results}, f, ensure_ascii=False, indent=2)
+        print(f"💾 结果已保存: {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+共享租约队列的多进程测试
+本地B站替身服务器限制每个连接的带宽，协调进程把合集加入队列后，
+分别用 1 个和多个工作进程（各自独立的进程，共同的输出目录）下载；
+多进程时在运行中用 SIGKILL 杀掉一个工作进程，验证它持有的租约到期后由其他进程接手，
+统计完成数、服务器收到的音频请求数（重复下载的次数）、接手的租约数和总耗时
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import signal
+import sqlite3
+import tempfile
+import subprocess
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_DIR = BENCH_DIR.parent
+sys.path.insert(0, str(REPO_DIR))
+sys.path.insert(0, str(BENCH_DIR))
+
+from fake_bilibili import FakeBilibiliServer
+
+WORK_QUEUE = str(REPO_DIR / 'work_queue.py')
+
+def make_config(output: Path, lease_seconds: float) -> dict:
+    """基于仓库的 config.json，关闭归档、缓存和内容库，缩短租约让被杀进程的条目尽快回到队列"""
+    with open(REPO_DIR / 'config.json', 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    config.update({'output_directory': str(output), 'audio_format': 'm4a'})
+    config['download_archive'] = {'enabled': False}
+    config['metadata_cache'] = {'enabled': False}
+    config['content_store'] = {'enabled': False}
+    config.setdefault('metrics', {})['console_status'] = False
+    config['work_queue'] = {'path': '.work_queue.sqlite', 'lease_seconds': lease_seconds,
+                            'heartbeat_interval': max(lease_seconds / 4, 0.5), 'max_leases': 5,
+                            'poll_interval': 0.5}
+    return config
+
+def queue_counts(db_path: Path) -> dict:
+    conn = sqlite3.connect(str(db_path), timeout=30)
+    try:
+        counts = dict(conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall())
+        counts['reclaimed'] = conn.execute("SELECT COUNT(*) FROM tasks WHERE leases > 1").fetchone()[0]
+    finally:
+        conn.close()
+    return counts
+
+def run_case(server: FakeBilibiliServer, work_dir: Path, workers: int, kill_after: float, args) -> dict:
+    name = f'workers-{workers}' + ('-kill' if kill_after else '')
+    output = work_dir / name
+    config_path = work_dir / f'{name}.json'
+    with open(config_path, 'w', encoding='utf-8') as f:
+        json.dump(make_config(output, args.lease_seconds), f, ensure_ascii=False)
+
+    base = [sys.executable, WORK_QUEUE, '-c', str(config_path)]
+    with open(work_dir / f'{name}-enqueue.log', 'w', encoding='utf-8') as log:
+        subprocess.run(base + ['enqueue', server.collection_url], stdout=log, stderr=subprocess.STDOUT, check=True)
+
+    server.reset_stats()
+    start = time.perf_counter()
+    processes = []
+    for n in range(workers):
+        log = open(work_dir / f'{name}-{n}.log', 'w', encoding='utf-8')
+        command = base + ['worker', '--name', f'bench-{n}', '--concurrent', str(args.concurrency)]
+        processes.append((subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT), log))
+
+    killed = None
+    if kill_after:
+        time.sleep(kill_after)
+        victim = processes[-1][0]
+        if victim.poll() is None:
+            os.kill(victim.pid, signal.SIGKILL)
+            killed = victim.pid
+    for process, log in processes:
+        process.wait()
+        log.close()
+    elapsed = time.perf_counter() - start
+
+    counts = queue_counts(output / '.work_queue.sqlite')
+    files = [path for path in output.glob('*.m4a') if not path.name.startswith('.')]
+    return {
+        'case': name,
+        'killed': killed,
+        'completed': len(files),
+        'done': counts.get('done', 0),
+        'failed': counts.get('failed', 0),
+        'requests': server.stats['requests'] - server.stats['metadata_requests'],
+        'reclaimed': counts['reclaimed'],
+        'seconds': elapsed,
+    }
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='共享租约队列的多进程测试')
+    parser.add_argument('--workers', type=int, default=4, help='多进程用例的工作进程数')
+    parser.add_argument('--concurrency', type=int, default=2, help='每个工作进程的下载线程数')
+    parser.add_argument('--tracks', type=int, default=24, help='合集条目数')
+    parser.add_argument('--track-seconds', type=int, default=20, help='每个音频的时长（秒）')
+    parser.add_argument('--bandwidth', type=int, default=256 * 1024, help='每个连接的带宽（字节/秒）')
+    parser.add_argument('--lease-seconds', type=float, default=3, help='租约时长（秒）')
+    parser.add_argument('--kill-after', type=float, default=5, help='多进程用例中多少秒后杀掉一个工作进程（0 不杀）')
+    parser.add_argument('--json', help='将结果写入JSON文件')
+    args = parser.parse_args()
+
+    work_dir = Path(tempfile.mkdtemp(prefix='bench_work_queue_'))
+    results = []
+    print(f"{'用例':<16s} {'文件':>5s} {'完成':>5s} {'失败':>5s} {'请求数':>7s} {'接手':>5s} {'用时':>8s}")
+    try:
+        with FakeBilibiliServer(tracks=args.tracks, track_seconds=args.track_seconds,
+                                bandwidth_per_connection=args.bandwidth) as server:
+            for workers, kill_after in ((1, 0), (args.workers, 0), (args.workers, args.kill_after)):
+                if kill_after and workers < 2:
+                    continue
+                result = run_case(server, work_dir, workers, kill_after, args)
+                results.append(result)
+                print(f"{result['case']:<16s} {result['completed']:5d} {result['done']:5d} {result['failed']:5d} "
+                      f"{result['requests']:7d} {result['reclaimed']:5d} {result['seconds']:7.1f}s")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'settings': vars(args), 'results': results}, f, ensure_ascii=False, indent=2)
+        print(f"💾 结果已保存: {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YoutubeDL 实例复用基准测试
+对本地服务器上的 N 个小音频条目，分别用“每条目新建实例”和“按线程复用实例”下载，
+比较每条目的额外开销和服务器看到的 TCP 连接数
+"""
+
+import sys
+import json
+import time
+import shutil
+import tempfile
+import concurrent.futures
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from local_server import LocalAudioServer
+from ydl_pool import YoutubeDLPool
+
+def run_case(server: LocalAudioServer, entries: int, workers: int, reuse: bool) -> dict:
+    work_dir = Path(tempfile.mkdtemp(prefix='bench_ydl_pool_'))
+    opts = {
+        'quiet': True,
+        'no_warnings': True,
+        'noprogress': True,
+        'outtmpl': str(work_dir / '%(id)s.%(ext)s'),
+    }
+    pool = YoutubeDLPool(opts, reuse=reuse)
+    server.reset_stats()
+
+    def download(index):
+        with pool.acquire() as (ydl, finished_files):
+            ydl.download([server.track_url(index)])
+            return bool(finished_files)
+
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        ok = sum(executor.map(download, range(entries)))
+    elapsed = time.perf_counter() - start
+    pool.close()
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        'reuse': reuse,
+        'entries': entries,
+        'succeeded': ok,
+        'seconds': elapsed,
+        'ms_per_entry': elapsed / entries * 1000,
+        'connections': server.stats['connections'],
+        'requests': server.stats['requests'],
+    }
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='YoutubeDL 实例复用基准测试')
+    parser.add_argument('--entries', type=int, default=500, help='条目数')
+    parser.add_argument('--workers', type=int, default=4, help='工作线程数')
+    parser.add_argument('--size', type=int, default=16 * 1024, help='每个条目的字节数')
+    parser.add_argument('--json', help='将结果写入JSON文件')
+    args = parser.parse_args()
+
+    results = []
+    with LocalAudioServer(tracks=args.entries, payload=bytes(args.size)) as server:
+        for reuse in (False, True):
+            result = run_case(server, args.entries, args.workers, reuse)
+            results.append(result)
+            label = '复用实例' if reuse else '每条目新建'
+            print(f"  {label}: {result['ms_per_entry']:.2f} ms/条目, "
+                  f"{result['connections']} 个连接, {result['requests']} 个请求, 成功 {result['succeeded']}")
+
+    fresh, pooled = results
+    print(f"📊 每条目开销降低 {fresh['ms_per_entry'] - pooled['ms_per_entry']:.2f} ms "
+          f"({fresh['ms_per_entry'] / pooled['ms_per_entry']:.2f}x)")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"💾 结果已保存: {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+离线B站替身服务器
+在 LocalAudioServer 的基础上提供合集元数据：/collection.xml 以 RSS 形式列出所有分P
+（?start=&count= 可取其中一段，用来构造互相重叠的多个合集；missing_tracks 个额外条目指向不存在的音频），
+yt-dlp 的通用提取器会把它解析成播放列表，因此三个提取器都能不经修改地跑完
+“枚举合集 → 逐个解析 → 下载 → 后处理”的完整流程。
+音频流由 FFmpeg 生成（不可用时为随机字节），延迟、带宽、限流和错误注入沿用 LocalAudioServer
+"""
+
+import os
+import time
+import shutil
+import tempfile
+import subprocess
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+from xml.sax.saxutils import escape
+
+from local_server import AudioRequestHandler, LocalAudioServer
+
+SONGS = ['爱相随', '谁明浪子心', '朋友', '红日', '一场游戏一场梦', '忘情水', '吻别', '海阔天空']
+
+class FakeBilibiliHandler(AudioRequestHandler):
+    def do_GET(self):
+        if self.path.split('?', 1)[0] == '/collection.xml':
+            self.send_collection()
+        else:
+            super().do_GET()
+
+    def send_collection(self):
+        owner = self.server.owner
+        owner.count('requests')
+        owner.count('metadata_requests')
+        if owner.metadata_latency:
+            time.sleep(owner.metadata_latency)
+        query = parse_qs(urlparse(self.path).query)
+        start = int(query.get('start', ['0'])[0])
+        count = int(query['count'][0]) if 'count' in query else None
+        body = owner.collection_feed(start, count).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/rss+xml; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def generate_audio(seconds: int) -> bytes:
+    """生成与B站DASH音频相同编码的 AAC/m4a 数据，FFmpeg 不可用时返回同等大小的随机字节"""
+    if not shutil.which('ffmpeg'):
+        return os.urandom(seconds * 24 * 1024)
+    work_dir = Path(tempfile.mkdtemp(prefix='fake_bilibili_'))
+    try:
+        path = work_dir / 'track.m4a'
+        subprocess.run([
+            'ffmpeg', '-hide_banner', '-loglevel', 'error',
+            '-f', 'lavfi', '-i', f'sine=frequency=440:duration={seconds}',
+            '-ac', '2', '-c:a', 'aac', '-b:a', '192k', '-y', str(path)
+        ], check=True, capture_output=True)
+        return path.read_bytes()
+    except subprocess.CalledProcessError:
+        return os.urandom(seconds * 24 * 1024)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+class FakeBilibiliServer(LocalAudioServer):
+    """提供合集 RSS 和音频流的本地服务器"""
+
+    def __init__(self, tracks: int = 10, track_seconds: int = 30, payload: bytes = None,
+                 collection_title: str = '【合集】经典歌曲高品质立体声合集', metadata_latency: float = 0,
+                 missing_tracks: int = 0, **kwargs):
+        if payload is None:
+            payload = generate_audio(track_seconds)
+        kwargs.setdefault('handler_class', FakeBilibiliHandler)
+        super().__init__(tracks=tracks, payload=payload, **kwargs)
+        self.collection_title = collection_title
+        self.metadata_latency = metadata_latency
+        self.missing_tracks = missing_tracks
+        self.stats['metadata_requests'] = 0
+
+    @property
+    def collection_url(self) -> str:
+        return f'{self.base_url}/collection.xml'
+
+    def collection_slice_url(self, start: int, count: int) -> str:
+        return f'{self.collection_url}?start={start}&count={count}'
+
+    def track_title(self, index: int) -> str:
+        return f'p{index + 1:02d} {SONGS[index % len(SONGS)]}{index + 1}'
+
+    def collection_feed(self, start: int = 0, count: int = None) -> str:
+        listed = self.tracks + self.missing_tracks
+        end = listed if count is None else min(start + count, listed)
+        items = ''.join(
+            f'<item><title>{escape(self.track_title(i))}</title><guid>BVfake{i:06d}</guid>'
+            f'<enclosure url="{self.track_url(i)}" type="{self.content_type}" length="{len(self.payload)}"/></item>'
+            for i in range(start, end)
+        )
+        return (f'<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+                f'<title>{escape(self.collection_title)}</title><link>{self.base_url}</link>{items}'
+                f'</channel></rss>')
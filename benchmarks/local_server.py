@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地测试服务器
+在后台线程中提供音频文件（支持 keep-alive 和 Range 请求），
+可模拟延迟、单连接带宽上限、并发限流（超过上限返回 429）、随机错误响应、
+一段时间内的持续故障（如持续限流）和中途断开，
+并统计连接数和请求数，供各基准测试替代B站CDN使用
+"""
+
+import re
+import time
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TRACK_PATTERN = re.compile(r'^/audio/(\d+)\.m4a$')
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+class AudioRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.server.owner.count('connections')
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self.handle_audio(send_body=False)
+
+    def do_GET(self):
+        self.handle_audio(send_body=True)
+
+    def handle_audio(self, send_body: bool):
+        owner = self.server.owner
+        owner.count('requests')
+        if owner.latency:
+            time.sleep(owner.latency)
+
+        if not owner.enter_request():
+            owner.count('throttled')
+            self.send_error(429, 'Too Many Requests')
+            return
+        try:
+            if owner.outage_until and time.monotonic() < owner.outage_until:
+                owner.count('outage')
+                self.send_error(owner.outage_status)
+                return
+            if owner.error_rate and owner.random.random() < owner.error_rate:
+                owner.count('errors')
+                self.send_error(owner.error_status)
+                return
+            self.send_audio(send_body)
+        finally:
+            owner.leave_request()
+
+    def send_audio(self, send_body: bool):
+        owner = self.server.owner
+        match = TRACK_PATTERN.match(self.path.split('?', 1)[0])
+        if not match or int(match.group(1)) >= owner.tracks:
+            self.send_error(404)
+            return
+
+        payload = owner.payload
+        start, end = 0, len(payload) - 1
+        status = 200
+        range_header = self.headers.get('Range')
+        if range_header:
+            range_match = RANGE_PATTERN.match(range_header.strip())
+            if not range_match:
+                self.send_error(416)
+                return
+            if range_match.group(1):
+                start = int(range_match.group(1))
+                if range_match.group(2):
+                    end = min(int(range_match.group(2)), end)
+            elif range_match.group(2):
+                start = max(len(payload) - int(range_match.group(2)), 0)
+            if start > end:
+                self.send_error(416)
+                return
+            status = 206
+
+        self.send_response(status)
+        self.send_header('Content-Type', owner.content_type)
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(end - start + 1))
+        if status == 206:
+            self.send_header('Content-Range', f'bytes {start}-{end}/{len(payload)}')
+        self.end_headers()
+        if send_body:
+            self.write_body(payload[start:end + 1])
+
+    def write_body(self, body: bytes):
+        owner = self.server.owner
+        if owner.drop_rate and owner.random.random() < owner.drop_rate:
+            # 发送一部分后断开连接
+            body = body[:owner.random.randint(0, max(len(body) - 1, 0))]
+            owner.count('dropped')
+            self.close_connection = True
+        chunk_size = 16 * 1024
+        for offset in range(0, len(body), chunk_size):
+            chunk = body[offset:offset + chunk_size]
+            self.wfile.write(chunk)
+            owner.count('bytes_sent', len(chunk))
+            if owner.bandwidth_per_connection:
+                time.sleep(len(chunk) / owner.bandwidth_per_connection)
+
+class QuietHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # 客户端提前断开（如只读取响应头）属于正常情况
+        pass
+
+class LocalAudioServer:
+    """后台运行的本地音频服务器"""
+
+    def __init__(self, tracks: int = 10, payload: bytes = None, content_type: str = 'audio/mp4',
+                 latency: float = 0, bandwidth_per_connection: int = None, max_concurrent_requests: int = None,
+                 error_rate: float = 0, error_status: int = 503, drop_rate: float = 0, seed: int = None,
+                 handler_class=AudioRequestHandler):
+        self.tracks = tracks
+        self.payload = payload if payload is not None else bytes(64 * 1024)
+        self.content_type = content_type
+        self.latency = latency
+        self.bandwidth_per_connection = bandwidth_per_connection
+        self.max_concurrent_requests = max_concurrent_requests
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.drop_rate = drop_rate
+        self.random = random.Random(seed)
+        self.outage_until = 0.0
+        self.outage_status = 429
+        self.stats = {'connections': 0, 'requests': 0, 'bytes_sent': 0, 'throttled': 0, 'errors': 0, 'dropped': 0,
+                      'outage': 0}
+        self._stats_lock = threading.Lock()
+        self._in_flight = 0
+        self._httpd = QuietHTTPServer(('127.0.0.1', 0), handler_class)
+        self._httpd.owner = self
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def track_url(self, index: int) -> str:
+        return f'{self.base_url}/audio/{index}.m4a'
+
+    def count(self, name: str, amount: int = 1):
+        with self._stats_lock:
+            self.stats[name] = self.stats.get(name, 0) + amount
+
+    def enter_request(self) -> bool:
+        """占用一个并发名额，超过上限时返回 False"""
+        with self._stats_lock:
+            if self.max_concurrent_requests and self._in_flight >= self.max_concurrent_requests:
+                return False
+            self._in_flight += 1
+            return True
+
+    def leave_request(self):
+        with self._stats_lock:
+            self._in_flight -= 1
+
+    def outage(self, seconds: float, status: int = 429):
+        """接下来 seconds 秒内所有音频请求都返回 status"""
+        self.outage_status = status
+        self.outage_until = time.monotonic() + seconds
+
+    def reset_stats(self):
+        with self._stats_lock:
+            for name in self.stats:
+                self.stats[name] = 0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+B站音频工具统一入口
+子命令: download（下载）/ convert（转换为MP3）/ rename（重命名）/ list（列出音频文件）/
+catalog（目录索引）/ tools（外部工具）
+
+只在执行对应子命令时才导入相关模块：--help、list、download --help 等不会导入 yt-dlp；
+download / convert / rename 的参数原样交给各自的脚本解析（download 的帮助取自 download_options）
+"""
+
+import os
+import sys
+import json
+import importlib
+from pathlib import Path
+
+# 下载引擎 -> 模块
+DOWNLOAD_ENGINES = {
+    'advanced': 'advanced_extractor',
+    'full': 'bilibili_audio_extractor',
+    'simple': 'simple_extractor',
+}
+
+# 参数定义在 download_options 中的下载引擎 -> 生成解析器的函数名（帮助信息不需要导入提取器）
+DOWNLOAD_PARSERS = {
+    'advanced': 'advanced_parser',
+    'full': 'full_parser',
+}
+
+AUDIO_EXTENSIONS = ('mp3', 'm4a', 'aac', 'opus', 'ogg', 'flac', 'wav')
+
+def forward(module_name: str, prog: str, argv):
+    """导入模块并以给定参数运行它的 main()"""
+    module = importlib.import_module(module_name)
+    sys.argv = [prog, *argv]
+    return module.main()
+
+def default_output_dir(config_file: str = 'config.json') -> str:
+    """配置文件中的输出目录（只读取JSON，不导入提取器）"""
+    try:
+        with open(config_file, 'r', encoding='utf-8') as f:
+            return json.load(f).get('output_directory', './downloads')
+    except (OSError, ValueError):
+        return './downloads'
+
+def list_audio_files(directory: str, audio_format: str = None) -> bool:
+    """列出目录中的音频文件（目录已有索引时增量扫描后查询，没有索引时直接遍历，不创建索引）"""
+    audio_dir = Path(directory)
+    if not audio_dir.is_dir():
+        print(f"❌ 目录不存在: {audio_dir}")
+        return False
+    from library_catalog import open_catalog, print_files
+    catalog = open_catalog(audio_dir, create=False)
+    if catalog is not None:
+        rows = catalog.files(audio_format, directory='')
+        catalog.close()
+        if not rows:
+            print(f"❌ 未找到音频文件: {audio_dir.absolute()}")
+            return False
+        print(f"📁 {audio_dir.absolute()}")
+        print_files(rows)
+        return True
+    extensions = (audio_format,) if audio_format else AUDIO_EXTENSIONS
+    files = sorted(path for path in audio_dir.iterdir()
+                   if path.suffix.lstrip('.').lower() in extensions and not path.name.startswith('.'))
+    if not files:
+        print(f"❌ 未找到音频文件: {audio_dir.absolute()}")
+        return False
+    total_size = 0
+    print(f"📁 {audio_dir.absolute()}")
+    for i, path in enumerate(files, 1):
+        size = path.stat().st_size
+        total_size += size
+        print(f"  {i:3d}. {path.name} ({size / (1024 * 1024):.1f} MB)")
+    print(f"🎵 共 {len(files)} 个文件，{total_size / (1024 * 1024):.1f} MB")
+    return True
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='bili.py', description='B站音频工具')
+    subparsers = parser.add_subparsers(dest='command', metavar='命令')
+    download = subparsers.add_parser('download', add_help=False, allow_abbrev=False,
+                                     help='下载音频（--engine 选择 advanced / full / simple，其余参数同对应脚本）')
+    download.add_argument('--engine', choices=list(DOWNLOAD_ENGINES), default='advanced',
+                          help='advanced: 高级版（默认）; full: 完整版; simple: 简化版')
+    subparsers.add_parser('convert', add_help=False, help='转换为MP3（参数同 convert_to_mp3.py）')
+    subparsers.add_parser('rename', add_help=False, help='重命名MP3文件（参数同 rename_mp3.py）')
+    list_parser = subparsers.add_parser('list', help='列出音频文件')
+    list_parser.add_argument('directory', nargs='?', help='目录（默认为配置文件中的输出目录）')
+    list_parser.add_argument('-f', '--format', help='只列出指定格式')
+    list_parser.add_argument('-c', '--config', default='config.json', help='配置文件路径')
+    subparsers.add_parser('catalog', add_help=False, help='目录索引：扫描 / 查询 / 统计（参数同 library_catalog.py）')
+    subparsers.add_parser('queue', add_help=False, help='多进程 / 多节点分片下载（参数同 work_queue.py）')
+    subparsers.add_parser('tools', add_help=False, help='探测 FFmpeg / yt-dlp（结果缓存）')
+    args, rest = parser.parse_known_args()
+
+    if args.command is None:
+        parser.print_help()
+        return
+    prog = f"{os.path.basename(sys.argv[0])} {args.command}"
+
+    if args.command == 'download':
+        if args.engine in DOWNLOAD_PARSERS and ('-h' in rest or '--help' in rest):
+            import download_options
+            getattr(download_options, DOWNLOAD_PARSERS[args.engine])(prog).parse_args(rest)
+        forward(DOWNLOAD_ENGINES[args.engine], prog, rest)
+    elif args.command == 'convert':
+        forward('convert_to_mp3', prog, rest)
+    elif args.command == 'rename':
+        forward('rename_mp3', prog, rest)
+    elif args.command == 'catalog':
+        forward('library_catalog', prog, rest)
+    elif args.command == 'queue':
+        forward('work_queue', prog, rest)
+    elif args.command == 'tools':
+        forward('toolchain', prog, rest)
+    else:
+        if rest:
+            parser.error(f"无法识别的参数: {' '.join(rest)}")
+        directory = args.directory or default_output_dir(args.config)
+        if not list_audio_files(directory, args.format):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
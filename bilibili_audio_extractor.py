@@ -9,10 +9,18 @@ import os
 import sys
 import re
 import json
-import subprocess
 from pathlib import Path
 from urllib.parse import urlparse, parse_qs
 
+from download_archive import entry_key
+from content_store import ContentStore, EntryCost
+from short_link import ShortLinkError, ShortLinkResolver, is_short_link
+from toolchain import find_tool
+from library_catalog import LibraryCatalog
+from audio_tags import ID3Error, entry_tags, has_tags, retag, tag_context, with_tagging
+from format_policy import FormatPolicy
+from download_options import full_parser
+
 try:
     import yt_dlp
 except ImportError:
@@ -20,33 +28,43 @@ except ImportError:
     sys.exit(1)
 
 class BilibiliAudioExtractor:
-    def __init__(self, output_dir="./downloads"):
+    def __init__(self, output_dir="./downloads", audio_format="mp3", audio_quality="192", store_dir=None,
+                 format_policy="smallest-sufficient"):
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
+        self.audio_format = audio_format
+        self.audio_quality = audio_quality
+        # 内容去重存储：多个合集中重复的曲目只下载一次
+        self.content_store = ContentStore(store_dir) if store_dir else None
+        # 短链接解析结果缓存在输出目录中
+        self.short_links = ShortLinkResolver(self.output_dir / '.short_links.sqlite')
+        # 输出目录的文件索引，下载完成的文件随即写入
+        self.catalog = LibraryCatalog(self.output_dir)
+        # 选择不低于目标码率的最小音频流，不总是下载码率最高的
+        self.format_policy = FormatPolicy(format_policy, audio_format, audio_quality)
         
         # yt-dlp 配置
+        # B站DASH音频本身就是m4a/AAC，audio_format为m4a时FFmpegExtractAudio直接流复制，不重编码
         self.ydl_opts = {
-            'format': 'bestaudio/best',
+            'format': self.format_policy,
             'outtmpl': str(self.output_dir / '%(title)s.%(ext)s'),
             'extractaudio': True,
-            'audioformat': 'mp3',
-            'audioquality': '192',
+            'audioformat': audio_format,
+            'audioquality': audio_quality,
             'postprocessors': [{
                 'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'mp3',
-                'preferredquality': '192',
+                'preferredcodec': audio_format,
+                'preferredquality': audio_quality,
             }],
             'writeinfojson': True,
             'ignoreerrors': True,
         }
     
     def check_dependencies(self):
-        """检查必要的依赖是否安装"""
-        try:
-            subprocess.run(['ffmpeg', '-version'], 
-                         capture_output=True, check=True)
+        """检查必要的依赖是否安装（探测结果缓存，FFmpeg 未变化时不启动子进程）"""
+        if find_tool('ffmpeg'):
             print("✓ FFmpeg 已安装")
-        except (subprocess.CalledProcessError, FileNotFoundError):
+        else:
             print("❌ 错误：未找到 FFmpeg")
             print("请安装 FFmpeg:")
             print("  macOS: brew install ffmpeg")
@@ -56,10 +74,12 @@ class BilibiliAudioExtractor:
         return True
     
     def extract_video_id(self, url):
-        """从B站URL中提取视频ID"""
+        """从B站URL中提取视频ID（短链接先查缓存，未缓存时才解析）"""
+        if is_short_link(url):
+            return self.short_links.video_id(url)
+        
         patterns = [
             r'bilibili\.com/video/([^/?]+)',
-            r'b23\.tv/([^/?]+)',
             r'BV([A-Za-z0-9]+)'
         ]
         
@@ -82,17 +102,26 @@ class BilibiliAudioExtractor:
             print(f"获取视频信息失败: {e}")
             return None
     
-    def download_audio(self, url, custom_title=None):
-        """下载单个视频的音频"""
+    def safe_filename(self, title):
+        """清理文件名中的非法字符"""
+        return re.sub(r'[<>:"/\\|?*]', '_', title)
+    
+    def download_audio(self, url, custom_title=None, cost=None, collection=None, entry=None):
+        """下载单个视频的音频（曲目序号、专辑、艺术家和标题在提取音频时一并写入）"""
         try:
             opts = self.ydl_opts.copy()
             if custom_title:
-                # 清理文件名中的非法字符
-                safe_title = re.sub(r'[<>:"/\\|?*]', '_', custom_title)
-                opts['outtmpl'] = str(self.output_dir / f'{safe_title}.%(ext)s')
+                opts['outtmpl'] = str(self.output_dir / f'{self.safe_filename(custom_title)}.%(ext)s')
+            if cost is not None:
+                opts['progress_hooks'] = [cost.wrap(lambda d: None)]
+            # 后处理完成的最终文件
+            finished_files = []
+            opts['post_hooks'] = [finished_files.append]
             
-            with yt_dlp.YoutubeDL(opts) as ydl:
-                ydl.download([url])
+            with with_tagging()(opts) as ydl:
+                info = ydl.extract_info(url, download=True, extra_info=tag_context(entry))
+                for filepath in finished_files:
+                    self.catalog.record(filepath, collection=collection, info=info)
                 print(f"✓ 音频提取完成: {custom_title or url}")
                 return True
         except Exception as e:
@@ -122,10 +151,11 @@ class BilibiliAudioExtractor:
                 
                 print(f"\n[{i}/{len(info['entries'])}] 正在处理: {title}")
                 
-                if self.download_audio(video_url, f"{i:02d}_{title}"):
+                if self.download_entry(entry, video_url, f"{i:02d}_{title}"):
                     success_count += 1
             
             print(f"\n合集处理完成！成功提取 {success_count}/{len(info['entries'])} 个音频文件")
+            self.print_store_summary()
             return success_count > 0
         else:
             # 单个视频
@@ -133,6 +163,56 @@ class BilibiliAudioExtractor:
             title = info.get('title', 'Unknown')
             return self.download_audio(url, title)
     
+    def download_entry(self, entry, url, custom_title):
+        """下载合集中的一个条目；内容存储中已有时直接链接，下载完成后存入存储"""
+        collection = entry.get('playlist_title')
+        if self.content_store is None:
+            return self.download_audio(url, custom_title, collection=collection, entry=entry)
+        
+        key = entry_key(entry)
+        target = self.output_dir / f'{self.safe_filename(custom_title)}.{self.audio_format}'
+        if key is not None:
+            try:
+                if self.content_store.restore(key, self.audio_format, self.audio_quality, target,
+                                              shareable=self.store_shareable(entry)):
+                    print(f"♻️ 从内容存储复用: {target.name}")
+                    self.retag_output(target, entry)
+                    self.catalog.record(target, collection=collection, info=entry)
+                    return True
+            except OSError as e:
+                print(f"⚠️ 无法从内容存储链接: {e}")
+        
+        cost = EntryCost()
+        with cost.measure():
+            success = self.download_audio(url, custom_title, cost, collection, entry)
+        if success and target.exists():
+            try:
+                self.content_store.add(key, self.audio_format, self.audio_quality, target, cost,
+                                       lambda path: self.retag_output(path, entry), self.store_shareable(entry))
+                # 与存储中已有的对象合并后文件被替换为链接，重新记录大小和 mtime
+                self.catalog.record(target, collection=collection, info=entry)
+            except OSError as e:
+                print(f"⚠️ 无法写入内容存储: {e}")
+        return success
+    
+    def store_shareable(self, entry):
+        """输出文件能否与存储对象共享硬链接的判断：对象已带本条目的标签（改写不会改变内容）时才共享"""
+        return lambda object_path, target: has_tags(object_path, entry_tags(target, entry))
+    
+    def retag_output(self, filepath, entry):
+        """内容存储中的对象带着最先下载它的合集的标签，链接到输出目录后改写为本条目的专辑和曲目序号"""
+        try:
+            retag(filepath, entry)
+        except (OSError, ID3Error) as e:
+            print(f"⚠️ 无法改写标签: {e}")
+    
+    def print_store_summary(self):
+        for line in self.format_policy.summary_lines():
+            print(line)
+        if self.content_store is not None:
+            for line in self.content_store.summary_lines():
+                print(line)
+    
     def extract_audio_from_url(self, url):
         """主要的音频提取方法"""
         if not self.check_dependencies():
@@ -140,26 +220,24 @@ class BilibiliAudioExtractor:
         
         print(f"开始处理: {url}")
         
-        # 标准化URL
-        if 'b23.tv' in url:
-            # 处理短链接
+        # 标准化URL（短链接解析结果会缓存）
+        if is_short_link(url):
             try:
-                import requests
-                response = requests.head(url, allow_redirects=True)
-                url = response.url
-            except:
-                pass
+                url = self.short_links.resolve(url)
+            except ShortLinkError as e:
+                print(f"⚠️ 短链接解析失败: {e}")
         
         return self.extract_from_collection(url)
 
 def main():
+    args = full_parser().parse_args()
+    
     print("=== B站视频音频提取器 ===")
     print("支持单个视频和合集视频的音频提取")
     print()
     
-    if len(sys.argv) > 1:
-        url = sys.argv[1]
-    else:
+    url = args.url
+    if not url:
         url = input("请输入B站视频URL: ").strip()
     
     if not url:
@@ -167,7 +245,8 @@ def main():
         return
     
     # 创建提取器实例
-    extractor = BilibiliAudioExtractor()
+    extractor = BilibiliAudioExtractor(audio_format=args.format, audio_quality=args.quality, store_dir=args.store,
+                                       format_policy=args.format_policy)
     
     # 开始提取
     success = extractor.extract_audio_from_url(url)
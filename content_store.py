@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+内容寻址去重存储
+同一首歌经常出现在多个合集中。完成的音频按内容 SHA-256 存入 objects/ 目录，
+同时记录 (BV号, 分P, 音频格式/质量) → 内容哈希 的映射：
+再次遇到同一条目时不下载、不转码，直接把存储中的文件链接到输出目录；
+不同条目下载出相同内容时，输出文件同样替换为指向已有对象的链接。
+链接方式依次尝试 reflink（写时复制）、硬链接、复制。
+内容哈希不含文件开头的 ID3v2 标签：同一首歌在不同合集中只有专辑和曲目序号不同，
+链接后由调用方改写为本条目的标签。改写会断开硬链接，所以只有标签已经一致（调用方的 shareable 判断）时
+才使用硬链接，否则只用 reflink（改写只复制标签所在的块）或复制
+"""
+
+import os
+import sys
+import time
+import shutil
+import hashlib
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+LINK_MODES = ('auto', 'reflink', 'hardlink', 'copy')
+
+# Linux ioctl FICLONE（btrfs / XFS / bcachefs 等支持写时复制的文件系统）
+FICLONE = 0x40049409
+
+def audio_data_offset(f) -> int:
+    """文件开头 ID3v2 标签（含 v2.4 尾部）之后的偏移，没有标签时为 0"""
+    header = f.read(10)
+    if len(header) < 10 or header[:3] != b'ID3':
+        return 0
+    size = (header[6] << 21) | (header[7] << 14) | (header[8] << 7) | header[9]
+    return 10 + size + (10 if header[3] == 4 and header[5] & 0x10 else 0)
+
+def file_sha256(path, chunk_size: int = 1024 * 1024) -> str:
+    """音频内容的 SHA-256（跳过开头的 ID3v2 标签）"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        f.seek(audio_data_offset(f))
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def reflink(source, target):
+    """写时复制克隆文件，文件系统不支持时抛出 OSError"""
+    try:
+        import fcntl
+    except ImportError:
+        raise OSError("当前平台不支持 reflink")
+    with open(source, 'rb') as src, open(target, 'wb') as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+
+def link_file(source, target, mode: str = 'auto', hardlink: bool = True) -> str:
+    """把 source 放到 target（已存在时原子替换），返回实际使用的方式
+
+    hardlink=False 时不使用硬链接（target 之后会被改写），hardlink 模式退化为复制
+    """
+    target = Path(target)
+    temp = target.with_name(f".{target.name}.linking")
+    methods = ['reflink', 'hardlink', 'copy'] if mode == 'auto' else [mode]
+    if not hardlink:
+        methods = [method for method in methods if method != 'hardlink'] or ['copy']
+    for method in methods:
+        temp.unlink(missing_ok=True)
+        try:
+            if method == 'reflink':
+                reflink(source, temp)
+            elif method == 'hardlink':
+                os.link(source, temp)
+            else:
+                shutil.copyfile(source, temp)
+        except OSError:
+            temp.unlink(missing_ok=True)
+            if method == methods[-1]:
+                raise
+            continue
+        os.replace(temp, target)
+        return method
+
+def cpu_seconds() -> float:
+    """当前线程加上已回收子进程（FFmpeg）的 CPU 秒数"""
+    times = os.times()
+    return time.thread_time() + times.children_user + times.children_system
+
+class EntryCost:
+    """单个条目下载和转码的开销（下载字节数、CPU 秒数）
+
+    子进程 CPU 按进程统计，多个线程同时转码时为估算值
+    """
+
+    def __init__(self):
+        self.download_bytes = 0
+        self.cpu_seconds = 0.0
+
+    @contextmanager
+    def measure(self):
+        start = cpu_seconds()
+        try:
+            yield self
+        finally:
+            self.cpu_seconds += cpu_seconds() - start
+
+    def wrap(self, hook: Callable) -> Callable:
+        """包装进度回调，记录下载完成的字节数"""
+        def progress_hook(d):
+            if d['status'] == 'finished':
+                self.download_bytes += d.get('total_bytes') or d.get('downloaded_bytes') or 0
+            hook(d)
+        return progress_hook
+
+class ContentStore:
+    """内容寻址的音频存储（线程安全）"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS objects (
+            sha256 TEXT PRIMARY KEY,
+            ext TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            download_bytes INTEGER NOT NULL DEFAULT 0,
+            cpu_seconds REAL NOT NULL DEFAULT 0,
+            created_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS sources (
+            bvid TEXT NOT NULL,
+            page INTEGER NOT NULL,
+            audio_format TEXT NOT NULL,
+            audio_quality TEXT NOT NULL,
+            sha256 TEXT NOT NULL,
+            recorded_at REAL NOT NULL,
+            PRIMARY KEY (bvid, page, audio_format, audio_quality)
+        );
+    """
+
+    def __init__(self, root, link_mode: str = 'auto'):
+        if link_mode not in LINK_MODES:
+            raise ValueError(f"不支持的链接方式: {link_mode}")
+        self.root = Path(root)
+        self.objects_dir = self.root / 'objects'
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.link_mode = link_mode
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.root / 'index.sqlite'), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._conn:
+            self._conn.executescript(self.SCHEMA)
+        # 本次运行节省的开销
+        self.stats = {
+            'restored': 0,
+            'download_bytes_saved': 0,
+            'cpu_seconds_saved': 0.0,
+            'deduplicated': 0,
+            'disk_bytes_saved': 0,
+            'stored': 0,
+        }
+        self.link_methods: Dict[str, int] = {}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def object_path(self, sha256: str, ext: str) -> Path:
+        return self.objects_dir / sha256[:2] / f"{sha256}.{ext}"
+
+    def lookup(self, key: Tuple[str, int], audio_format: str, audio_quality: str) -> Optional[sqlite3.Row]:
+        """按 (BV号, 分P) 查找已存储的对象，对象文件丢失时清除映射"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT o.* FROM sources s JOIN objects o ON o.sha256 = s.sha256 "
+                "WHERE s.bvid=? AND s.page=? AND s.audio_format=? AND s.audio_quality=?",
+                (*key, audio_format, str(audio_quality))).fetchone()
+            if row is None:
+                return None
+            if not self.object_path(row['sha256'], row['ext']).exists():
+                with self._conn:
+                    self._conn.execute("DELETE FROM objects WHERE sha256=?", (row['sha256'],))
+                    self._conn.execute("DELETE FROM sources WHERE sha256=?", (row['sha256'],))
+                return None
+            return row
+
+    def restore(self, key: Tuple[str, int], audio_format: str, audio_quality: str, target,
+                shareable: Callable[[Path, Path], bool] = None) -> Optional[Path]:
+        """存储中已有该条目时链接到 target，返回目标路径；没有时返回 None
+
+        shareable(对象路径, target) 为 False 时 target 之后会被改写，不与对象共享硬链接
+        """
+        row = self.lookup(key, audio_format, audio_quality)
+        if row is None:
+            return None
+        target = Path(target)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        object_path = self.object_path(row['sha256'], row['ext'])
+        method = link_file(object_path, target, self.link_mode,
+                           shareable is None or shareable(object_path, target))
+        with self._lock:
+            self.stats['restored'] += 1
+            self.stats['download_bytes_saved'] += row['download_bytes'] or row['size']
+            self.stats['cpu_seconds_saved'] += row['cpu_seconds']
+            self.link_methods[method] = self.link_methods.get(method, 0) + 1
+        return target
+
+    def add(self, key: Optional[Tuple[str, int]], audio_format: str, audio_quality: str, filepath,
+            cost: EntryCost = None, on_link: Callable[[Path], None] = None,
+            shareable: Callable[[Path, Path], bool] = None) -> Path:
+        """把完成的文件存入存储并记录映射；内容已存在时输出文件替换为指向已有对象的链接，随后调用 on_link
+        （已有对象的标签来自其他条目，由调用方改写；shareable 的含义同 restore）。
+        合并数和节省的磁盘空间只统计 on_link 之后仍与对象共享 inode 的文件
+        """
+        filepath = Path(filepath)
+        sha256 = file_sha256(filepath)
+        ext = filepath.suffix.lstrip('.') or audio_format
+        object_path = self.object_path(sha256, ext)
+        merged = None
+        with self._lock:
+            existing = self._conn.execute("SELECT * FROM objects WHERE sha256=?", (sha256,)).fetchone()
+            if existing is not None and object_path.exists():
+                method = None if object_path.samefile(filepath) else self._merge(object_path, filepath, shareable)
+                if method is not None:
+                    merged = existing
+                    self.link_methods[method] = self.link_methods.get(method, 0) + 1
+            else:
+                object_path.parent.mkdir(exist_ok=True)
+                link_file(filepath, object_path, self.link_mode)
+                with self._conn:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO objects (sha256, ext, size, download_bytes, cpu_seconds, created_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (sha256, ext, filepath.stat().st_size, cost.download_bytes if cost else 0,
+                         cost.cpu_seconds if cost else 0.0, time.time()))
+                self.stats['stored'] += 1
+            if key is not None:
+                with self._conn:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO sources (bvid, page, audio_format, audio_quality, sha256, recorded_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (*key, audio_format, str(audio_quality), sha256, time.time()))
+        if merged is None:
+            return filepath
+        if on_link is not None:
+            on_link(filepath)
+        # on_link 改写文件时可能断开链接，只统计之后仍与对象共享 inode 的合并
+        try:
+            shared = filepath.samefile(object_path)
+        except OSError:
+            shared = False
+        if shared:
+            with self._lock:
+                self.stats['deduplicated'] += 1
+                self.stats['disk_bytes_saved'] += merged['size']
+        return filepath
+
+    def _merge(self, object_path: Path, filepath: Path, shareable: Callable[[Path, Path], bool] = None) -> Optional[str]:
+        """把内容相同的输出文件替换为指向对象的链接，返回链接方式；不值得替换时返回 None
+
+        标签不同时硬链接会在改写标签时断开，复制出来再改写回去也不省空间，只尝试 reflink
+        """
+        if shareable is None or shareable(object_path, filepath):
+            return link_file(object_path, filepath, self.link_mode)
+        if self.link_mode not in ('auto', 'reflink'):
+            return None
+        try:
+            return link_file(object_path, filepath, 'reflink')
+        except OSError:
+            return None
+
+    def totals(self) -> Dict:
+        with self._lock:
+            objects = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM objects").fetchone()
+            sources = self._conn.execute("SELECT COUNT(*) FROM sources").fetchone()[0]
+        return {'objects': objects[0], 'bytes': objects[1], 'sources': sources}
+
+    def summary_lines(self) -> List[str]:
+        """本次运行节省的下载量、CPU 时间和磁盘空间"""
+        stats = self.stats
+        if not (stats['restored'] or stats['deduplicated'] or stats['stored']):
+            return []
+        lines = [f"♻️ 内容存储: 新增 {stats['stored']} 个对象，"
+                 f"复用 {stats['restored']} 个条目，合并 {stats['deduplicated']} 个相同内容"]
+        if stats['restored']:
+            lines.append(f"  节省下载 {stats['download_bytes_saved'] / (1024 * 1024):.1f} MB，"
+                         f"节省 CPU {stats['cpu_seconds_saved']:.1f} s")
+        if stats['deduplicated']:
+            lines.append(f"  合并节省磁盘 {stats['disk_bytes_saved'] / (1024 * 1024):.1f} MB")
+        if self.link_methods:
+            lines.append("  链接方式: " + "，".join(f"{method} {count}" for method, count in self.link_methods.items()))
+        return lines
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='内容去重存储统计')
+    parser.add_argument('store', nargs='?', default='./downloads/.content_store', help='存储目录')
+    args = parser.parse_args()
+
+    if not (Path(args.store) / 'index.sqlite').exists():
+        print(f"❌ 存储不存在: {args.store}")
+        sys.exit(1)
+
+    store = ContentStore(args.store)
+    totals = store.totals()
+    store.close()
+    print(f"📦 对象: {totals['objects']} 个，{totals['bytes'] / (1024 * 1024):.1f} MB")
+    print(f"🔗 条目映射: {totals['sources']} 个")
+
+if __name__ == "__main__":
+    main()
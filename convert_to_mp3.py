@@ -2,90 +2,157 @@
 # -*- coding: utf-8 -*-
 """
 M4A到MP3转换器
-将audio_output目录中的m4a文件转换为mp3格式
+将指定目录（默认audio_output）中的m4a文件并行转换为mp3格式
+文件列表和是否最新取自目录索引（library_catalog），转换结果同步写回索引
 """
 
 import os
 import sys
-import subprocess
+import concurrent.futures
 from pathlib import Path
 
+from transcoder import transcode_audio
+from toolchain import find_tool
+from library_catalog import open_catalog, print_files
+
 def check_ffmpeg():
-    """检查FFmpeg是否可用"""
-    try:
-        result = subprocess.run(['ffmpeg', '-version'], 
-                              capture_output=True, text=True, check=True)
+    """检查FFmpeg是否可用（探测结果缓存，FFmpeg 未变化时不启动子进程）"""
+    if find_tool('ffmpeg'):
         print("✓ FFmpeg 可用")
         return True
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        print("❌ 未找到 FFmpeg")
-        print("请安装 FFmpeg:")
-        print("  macOS: brew install ffmpeg")
-        print("  Ubuntu: sudo apt install ffmpeg")
+    print("❌ 未找到 FFmpeg")
+    print("请安装 FFmpeg:")
+    print("  macOS: brew install ffmpeg")
+    print("  Ubuntu: sudo apt install ffmpeg")
+    return False
+
+def convert_m4a_to_mp3(input_file, output_file, quality="192k", delete_source=False):
+    """将m4a文件转换为mp3（源编码已是mp3时直接流复制，不重编码）
+
+    输出先写入临时文件再原子重命名，中途被终止不会留下不完整的mp3；
+    delete_source 为 True 时只在重命名成功后删除原文件
+    """
+    return transcode_audio(input_file, output_file, 'mp3', quality, delete_source=delete_source)
+
+def is_up_to_date(input_file, output_file):
+    """输出文件存在且不早于源文件时无需转换"""
+    output_file = Path(output_file)
+    if not output_file.exists():
         return False
+    return output_file.stat().st_mtime >= Path(input_file).stat().st_mtime
+
+def list_sources(audio_dir, pattern, catalog=None):
+    """返回 [(源文件, 源文件 mtime, 对应 mp3 的 mtime 或 None)]，有索引时不访问文件系统"""
+    if catalog is None:
+        sources = sorted(f for f in audio_dir.glob(pattern) if f.suffix.lower() != '.mp3')
+        return [(f, None, None) for f in sources]
+    mp3_mtimes = {row['name']: row['mtime'] for row in catalog.files('mp3', directory='')}
+    return [(audio_dir / row['name'], row['mtime'], mp3_mtimes.get(f"{Path(row['name']).stem}.mp3"))
+            for row in catalog.files(pattern=pattern, directory='') if row['ext'] != 'mp3']
+
+def cleanup_temp_files(audio_dir):
+    """清理上次被中断的运行留下的临时文件"""
+    for temp_file in audio_dir.glob(".*.transcoding.mp3"):
+        temp_file.unlink(missing_ok=True)
 
-def convert_m4a_to_mp3(input_file, output_file, quality="192k"):
-    """将m4a文件转换为mp3"""
-    cmd = [
-        'ffmpeg',
-        '-i', str(input_file),
-        '-c:a', 'libmp3lame',
-        '-b:a', quality,
-        '-y',  # 覆盖输出文件
-        str(output_file)
-    ]
+def convert_directory(audio_dir, pattern="*.m4a", quality="192k", jobs=None, keep_source=False, force=False,
+                      catalog=None):
+    """并行转换目录中匹配的文件，返回 (成功, 跳过, 失败) 数"""
+    # 中断留下的临时文件会改变目录 mtime，只有索引扫描重新列出了目录时才需要清理
+    if catalog is None or catalog.scan_stats is None or catalog.scan_stats['listed']:
+        cleanup_temp_files(audio_dir)
     
-    try:
-        subprocess.run(cmd, check=True, capture_output=True)
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"转换失败: {e}")
-        return False
+    source_files = list_sources(audio_dir, pattern, catalog)
+    if not source_files:
+        print(f"❌ 未找到匹配 {pattern} 的文件")
+        return 0, 0, 0
+    
+    tasks = []
+    skipped = 0
+    for source_file, source_mtime, mp3_mtime in source_files:
+        mp3_file = source_file.with_suffix('.mp3')
+        if catalog is not None:
+            up_to_date = mp3_mtime is not None and mp3_mtime >= source_mtime
+        else:
+            up_to_date = is_up_to_date(source_file, mp3_file)
+        if not force and up_to_date:
+            skipped += 1
+            continue
+        tasks.append((source_file, mp3_file))
+    
+    jobs = jobs or os.cpu_count() or 1
+    print(f"📁 找到 {len(source_files)} 个文件，{skipped} 个已是最新，待转换 {len(tasks)} 个")
+    if tasks:
+        print(f"🔧 使用 {min(jobs, len(tasks))} 个并行转换")
+    
+    success_count = 0
+    failed = []
+    # 每个任务都是独立的 FFmpeg 子进程，线程池即可让所有核心同时工作
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+        future_to_file = {
+            executor.submit(convert_m4a_to_mp3, source_file, mp3_file, quality, not keep_source): source_file
+            for source_file, mp3_file in tasks
+        }
+        for done, future in enumerate(concurrent.futures.as_completed(future_to_file), 1):
+            if future.result():
+                success_count += 1
+                if catalog is not None:
+                    source_file = future_to_file[future]
+                    # mp3 沿用源文件的BV号、合集和标题
+                    catalog.record(source_file.with_suffix('.mp3'), codec='mp3', **catalog.metadata(source_file))
+                    if not keep_source:
+                        catalog.remove(source_file)
+            else:
+                failed.append(future_to_file[future].name)
+            print(f"\r转换进度: [{done}/{len(tasks)}] 成功 {success_count} 失败 {len(failed)} 跳过 {skipped}",
+                  end='', flush=True)
+    if tasks:
+        print()
+    
+    for name in failed:
+        print(f"  ❌ 转换失败: {name}")
+    return success_count, skipped, len(failed)
 
 def main():
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='M4A到MP3转换器')
+    parser.add_argument('-d', '--input-dir', default='./audio_output', help='输入目录')
+    parser.add_argument('-p', '--pattern', default='*.m4a', help='文件匹配模式')
+    parser.add_argument('-q', '--quality', default='192k', help='MP3码率')
+    parser.add_argument('-j', '--jobs', type=int, help='并行转换数（默认CPU核数）')
+    parser.add_argument('--keep-source', action='store_true', help='保留原文件')
+    parser.add_argument('--force', action='store_true', help='即使mp3已是最新也重新转换')
+    args = parser.parse_args()
+    
     print("=== M4A到MP3转换器 ===")
-    print("将audio_output目录中的m4a文件转换为mp3格式\n")
+    print(f"将{args.input_dir}目录中的{args.pattern}文件转换为mp3格式\n")
     
     if not check_ffmpeg():
         return
     
     # 设置目录
-    audio_dir = Path("./audio_output")
+    audio_dir = Path(args.input_dir)
     if not audio_dir.exists():
         print(f"❌ 目录不存在: {audio_dir}")
         return
     
-    # 查找m4a文件
-    m4a_files = list(audio_dir.glob("*.m4a"))
-    if not m4a_files:
-        print("❌ 未找到m4a文件")
-        return
-    
-    print(f"📁 找到 {len(m4a_files)} 个m4a文件")
-    
-    success_count = 0
-    for i, m4a_file in enumerate(m4a_files, 1):
-        # 生成mp3文件名
-        mp3_file = m4a_file.with_suffix('.mp3')
-        
-        print(f"[{i}/{len(m4a_files)}] 转换: {m4a_file.name} -> {mp3_file.name}")
-        
-        if convert_m4a_to_mp3(m4a_file, mp3_file):
-            print(f"  ✓ 转换成功")
-            # 删除原始m4a文件
-            try:
-                m4a_file.unlink()
-                print(f"  ✓ 已删除原文件")
-            except Exception as e:
-                print(f"  ⚠️ 删除原文件失败: {e}")
-            success_count += 1
-        else:
-            print(f"  ❌ 转换失败")
+    catalog = open_catalog(audio_dir)
+    success_count, skipped, failed = convert_directory(
+        audio_dir, args.pattern, args.quality, args.jobs, args.keep_source, args.force, catalog
+    )
     
     print(f"\n🎉 转换完成！")
-    print(f"📊 成功转换: {success_count}/{len(m4a_files)} 个文件")
+    print(f"📊 成功转换: {success_count}/{success_count + failed} 个文件，跳过 {skipped} 个")
     
     # 列出最终的mp3文件
+    if catalog is not None:
+        mp3_rows = catalog.files('mp3', directory='')
+        if mp3_rows:
+            print(f"\n📁 MP3文件列表 ({len(mp3_rows)} 个):")
+            print_files(mp3_rows)
+        catalog.close()
+        return
     mp3_files = list(audio_dir.glob("*.mp3"))
     if mp3_files:
         print(f"\n📁 MP3文件列表 ({len(mp3_files)} 个):")
@@ -94,4 +161,4 @@ def main():
             print(f"  {i:2d}. {file.name} ({file_size:.1f} MB)")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,584 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+下载守护进程
+常驻运行 AdvancedBilibiliExtractor，通过本地 HTTP/JSON 接口接收任务（供 bili_audio_downloader 等前端调用）：
+提交URL、列出任务、流式获取进度、取消任务。任务保存在 SQLite 队列中，重启后自动恢复；
+下载线程、YoutubeDL 实例和 HTTP 连接在任务之间保持复用
+
+接口:
+  POST   /jobs                {"url": "...", "priority": 1}  提交任务
+  GET    /jobs[?status=...]   列出任务
+  GET    /jobs/<id>           任务详情
+  GET    /jobs/<id>/events    进度事件流（NDJSON，任务结束后关闭）
+  DELETE /jobs/<id>           取消任务（也可 POST /jobs/<id>/cancel）
+  GET    /health              运行状态
+  GET    /metrics             Prometheus 指标
+"""
+
+import json
+import time
+import sqlite3
+import threading
+from collections import deque
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from advanced_extractor import AdvancedBilibiliExtractor
+from batch_scheduler import FairShareScheduler
+from download_archive import entry_key
+from entry_record import project_entries
+
+JOB_STATUSES = ('queued', 'running', 'completed', 'failed', 'cancelled')
+FINAL_STATUSES = ('completed', 'failed', 'cancelled')
+
+class JobCancelled(Exception):
+    """任务已取消（在进度回调中抛出以中止正在进行的下载）"""
+
+class JobStore:
+    """持久化任务队列（线程安全）"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            url TEXT NOT NULL,
+            priority REAL NOT NULL DEFAULT 1,
+            status TEXT NOT NULL,
+            title TEXT,
+            total INTEGER NOT NULL DEFAULT 0,
+            completed INTEGER NOT NULL DEFAULT 0,
+            failed INTEGER NOT NULL DEFAULT 0,
+            skipped INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            created_at REAL NOT NULL,
+            started_at REAL,
+            finished_at REAL
+        )
+    """
+
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._conn:
+            self._conn.execute(self.SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def recover(self) -> int:
+        """上次退出时仍在运行的任务重新排队，返回数量"""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status='queued', started_at=NULL WHERE status='running'")
+            return cursor.rowcount
+
+    def submit(self, url: str, priority: float = 1.0) -> Dict:
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO jobs (url, priority, status, created_at) VALUES (?, ?, 'queued', ?)",
+                (url, priority, time.time()))
+            job_id = cursor.lastrowid
+        return self.get(job_id)
+
+    def claim_next(self) -> Optional[Dict]:
+        """取出优先级最高、最早提交的排队任务并标记为运行中"""
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT id FROM jobs WHERE status='queued' ORDER BY priority DESC, id LIMIT 1").fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE jobs SET status='running', started_at=? WHERE id=?",
+                               (time.time(), row['id']))
+        return self.get(row['id'])
+
+    def update(self, job_id: int, **fields):
+        if not fields:
+            return
+        assignments = ', '.join(f"{name}=?" for name in fields)
+        with self._lock, self._conn:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE id=?", (*fields.values(), job_id))
+
+    def finish(self, job_id: int, status: str, **fields) -> str:
+        """记录任务结束并返回最终状态；已取消的任务保持 cancelled，不被完成或失败覆盖"""
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT status FROM jobs WHERE id=?", (job_id,)).fetchone()
+            if row is not None and row['status'] == 'cancelled':
+                status = 'cancelled'
+            fields = dict(fields, status=status, finished_at=time.time())
+            assignments = ', '.join(f"{name}=?" for name in fields)
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE id=?", (*fields.values(), job_id))
+        return status
+
+    def get(self, job_id: int) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id=?", (job_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def list(self, status: str = None, limit: int = 200) -> List[Dict]:
+        query = "SELECT * FROM jobs"
+        params = []
+        if status:
+            query += " WHERE status=?"
+            params.append(status)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(query, params).fetchall()]
+
+class EventLog:
+    """最近的任务事件（带序号），供进度流按序读取"""
+
+    def __init__(self, maxlen: int = 2000):
+        self._events = deque(maxlen=maxlen)
+        self._condition = threading.Condition()
+        self._seq = 0
+
+    def publish(self, job_id: int, event: str, **data):
+        with self._condition:
+            self._seq += 1
+            self._events.append({'seq': self._seq, 'job_id': job_id, 'event': event, 'time': time.time(), **data})
+            self._condition.notify_all()
+
+    def read(self, after: int, job_id: int = None, timeout: float = 15) -> Tuple[int, List[Dict]]:
+        """返回 (最新序号, 序号大于 after 的事件)，没有新事件时最多等待 timeout 秒"""
+        with self._condition:
+            self._condition.wait_for(lambda: self._seq > after, timeout=timeout)
+            return self._seq, [event for event in self._events
+                               if event['seq'] > after and (job_id is None or event['job_id'] == job_id)]
+
+    @property
+    def last_seq(self) -> int:
+        return self._seq
+
+class JobState:
+    """运行中任务的内存状态"""
+
+    def __init__(self, job: Dict, total: int):
+        self.job = job
+        self.total = total
+        self.remaining = total
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = False
+        self.done = threading.Event()
+        self.last_progress = 0.0
+        if total == 0:
+            self.done.set()
+
+class DownloadDaemon:
+    """任务调度：任务线程负责枚举合集，常驻下载线程按公平份额从所有运行中任务取条目"""
+
+    def __init__(self, extractor: AdvancedBilibiliExtractor, store: JobStore, job_workers: int = 2):
+        self.extractor = extractor
+        self.store = store
+        self.job_workers = job_workers
+        self.download_workers = extractor.config['max_concurrent_downloads']
+        self.events = EventLog()
+        self.scheduler = FairShareScheduler()
+        self.started_at = time.time()
+        self._states: Dict[int, JobState] = {}
+        self._states_lock = threading.Lock()
+        self._work = threading.Condition()
+        self._jobs_available = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._local = threading.local()
+
+    # ---- 生命周期 ----
+
+    def start(self):
+        recovered = self.store.recover()
+        if recovered:
+            print(f"🔄 恢复 {recovered} 个未完成的任务")
+        self._jobs_available.set()
+        for n in range(self.job_workers):
+            self._spawn(self._run_jobs, f'job-runner-{n}')
+        for n in range(self.download_workers):
+            self._spawn(self._run_entries, f'download-{n}')
+        return self
+
+    def _spawn(self, target, name):
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def stop(self):
+        """停止调度；运行中的任务保持 running 状态，下次启动时重新排队"""
+        self._stop.set()
+        self._jobs_available.set()
+        with self._work:
+            self._work.notify_all()
+        with self._states_lock:
+            for state in self._states.values():
+                state.done.set()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self.extractor.ydl_pool.close()
+
+    # ---- 提交和取消 ----
+
+    def submit(self, url: str, priority: float = 1.0) -> Dict:
+        job = self.store.submit(url, priority)
+        self.events.publish(job['id'], 'queued', url=url)
+        self._jobs_available.set()
+        return job
+
+    def cancel(self, job_id: int) -> Optional[Dict]:
+        job = self.store.get(job_id)
+        if job is None or job['status'] in FINAL_STATUSES:
+            return job
+        with self._states_lock:
+            state = self._states.get(job_id)
+            if state is None:
+                # 尚未开始，或任务线程还在获取合集信息：登记 JobState 前会重新读取状态（同在 _states_lock 下）
+                self.store.update(job_id, status='cancelled', finished_at=time.time())
+        if state is not None:
+            state.cancelled = True
+            with self._work:
+                dropped = self.scheduler.remove_queue(job_id)
+            self._finish_entries(state, dropped)
+        self.events.publish(job_id, 'cancelling')
+        return self.store.get(job_id)
+
+    # ---- 任务线程 ----
+
+    def _run_jobs(self):
+        while not self._stop.is_set():
+            job = self.store.claim_next()
+            if job is None:
+                self._jobs_available.clear()
+                self._jobs_available.wait(timeout=1)
+                continue
+            try:
+                self.run_job(job)
+            except Exception as e:
+                status = self.store.finish(job['id'], 'failed', error=str(e))
+                self.events.publish(job['id'], status, error=str(e))
+
+    def run_job(self, job: Dict):
+        job_id = job['id']
+        self.events.publish(job_id, 'started', url=job['url'])
+        with self.extractor.metrics.stage('metadata'):
+            url = self.extractor.resolve_urls([job['url']])[0]
+            info = self.extractor.get_collection_info(url)
+        if not info:
+            status = self.store.finish(job_id, 'failed', error='无法获取视频信息')
+            self.events.publish(job_id, status, error='无法获取视频信息')
+            return
+
+        entries = project_entries(info) if 'entries' in info else [info]
+        items = []
+        skipped = 0
+        for i, entry in enumerate(entries, 1):
+            key = entry_key(entry)
+            if self.extractor.is_archived(key):
+                skipped += 1
+                continue
+            if 'entries' not in info:
+                entry = dict(entry, webpage_url=entry.get('webpage_url') or url)
+            items.append((i, len(entries), entry, key))
+
+        if skipped:
+            self.extractor.metrics.inc('skipped', skipped)
+        title = info.get('title') or job['url']
+        self.store.update(job_id, title=title, total=len(entries), skipped=skipped, completed=0, failed=0)
+        self.events.publish(job_id, 'enumerated', title=title, total=len(entries), skipped=skipped)
+
+        state = JobState(job, len(items))
+        with self._states_lock:
+            # 获取合集信息期间被取消的任务不再排队下载
+            current = self.store.get(job_id)
+            if current is None or current['status'] == 'cancelled':
+                state = None
+            else:
+                self._states[job_id] = state
+        if state is None:
+            self.events.publish(job_id, 'cancelled', completed=0, failed=0, skipped=skipped)
+            return
+        with self._work:
+            self.scheduler.add_queue(job_id, items, job['priority'])
+            self._work.notify_all()
+
+        state.done.wait()
+        with self._states_lock:
+            self._states.pop(job_id, None)
+        if self._stop.is_set():
+            return
+
+        if state.cancelled:
+            status = 'cancelled'
+        elif state.failed:
+            status = 'failed' if state.completed == 0 and items else 'completed'
+        else:
+            status = 'completed'
+        error = f"{state.failed} 个条目失败" if state.failed else None
+        status = self.store.finish(job_id, status, completed=state.completed, failed=state.failed, error=error)
+        self.events.publish(job_id, status, completed=state.completed, failed=state.failed, skipped=skipped)
+
+    # ---- 下载线程 ----
+
+    def _run_entries(self):
+        while not self._stop.is_set():
+            with self._work:
+                item = self.scheduler.next()
+                if item is None:
+                    self._work.wait(timeout=1)
+                    continue
+            job_id, (i, total, entry, key) = item
+            with self._states_lock:
+                state = self._states.get(job_id)
+            if state is None:
+                continue
+            self.download_entry(state, i, total, entry, key)
+
+    def download_entry(self, state: JobState, i: int, total: int, entry: Dict, key):
+        job_id = state.job['id']
+        title = entry.get('title', f'Video_{i}')
+        video_url = entry.get('webpage_url') or entry.get('url')
+
+        def progress_hook(d):
+            if state.cancelled:
+                raise JobCancelled()
+            self.extractor.progress_hook(d)
+            now = time.monotonic()
+            if d['status'] == 'downloading' and now - state.last_progress >= 1:
+                state.last_progress = now
+                self.events.publish(job_id, 'progress', index=i, title=title,
+                                    downloaded_bytes=d.get('downloaded_bytes'),
+                                    total_bytes=d.get('total_bytes') or d.get('total_bytes_estimate'))
+
+        self.events.publish(job_id, 'entry_started', index=i, total=total, title=title)
+        success = False
+        if not state.cancelled:
+            success = self.extractor.download_single_video(
+                video_url, f"[任务 {job_id}] [{i}/{total}] {title}", key, entry.get('id'), progress_hook, entry)
+        self.extractor.metrics.inc('completed' if success else 'failed')
+        self.events.publish(job_id, 'entry_finished', index=i, title=title, success=success)
+
+        with self._states_lock:
+            if success:
+                state.completed += 1
+            elif not state.cancelled:
+                state.failed += 1
+        self.store.update(job_id, completed=state.completed, failed=state.failed)
+        self._finish_entries(state, 1)
+
+    def _finish_entries(self, state: JobState, count: int):
+        with self._states_lock:
+            state.remaining -= count
+            if state.remaining <= 0:
+                state.done.set()
+
+    # ---- 状态 ----
+
+    def health(self) -> Dict:
+        with self._states_lock:
+            running = list(self._states)
+        return {
+            'status': 'ok',
+            'uptime_seconds': round(time.time() - self.started_at, 1),
+            'download_workers': self.download_workers,
+            'warm_ydl_instances': self.extractor.ydl_pool.size,
+            'running_jobs': running,
+            'pending_entries': self.scheduler.pending(),
+            'format_policy': {'policy': self.extractor.format_policy.policy, **self.extractor.format_policy.stats},
+        }
+
+class DaemonRequestHandler(BaseHTTPRequestHandler):
+    server_version = 'BiliAudioDaemon/1.0'
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def daemon(self) -> DownloadDaemon:
+        return self.server.daemon
+
+    def send_json(self, data, status: int = 200):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_json(self) -> Dict:
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return {}
+        return json.loads(self.rfile.read(length).decode('utf-8'))
+
+    def route(self):
+        """返回 (路径片段, 查询参数)"""
+        parsed = urlparse(self.path)
+        return [part for part in parsed.path.split('/') if part], parse_qs(parsed.query)
+
+    def job_id(self, value: str) -> Optional[int]:
+        try:
+            return int(value)
+        except ValueError:
+            self.send_json({'error': '无效的任务ID'}, 400)
+            return None
+
+    def do_GET(self):
+        parts, query = self.route()
+        if parts == ['health']:
+            self.send_json(self.daemon.health())
+        elif parts == ['metrics']:
+            body = self.daemon.extractor.metrics.prometheus_text().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif parts == ['jobs']:
+            status = query.get('status', [None])[0]
+            self.send_json({'jobs': self.daemon.store.list(status)})
+        elif len(parts) == 2 and parts[0] == 'jobs':
+            job_id = self.job_id(parts[1])
+            if job_id is None:
+                return
+            job = self.daemon.store.get(job_id)
+            if job is None:
+                self.send_json({'error': '任务不存在'}, 404)
+            else:
+                self.send_json(job)
+        elif len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'events':
+            job_id = self.job_id(parts[1])
+            if job_id is not None:
+                self.stream_events(job_id)
+        else:
+            self.send_json({'error': '未知接口'}, 404)
+
+    def do_POST(self):
+        parts, _ = self.route()
+        if parts == ['jobs']:
+            try:
+                payload = self.read_json()
+            except ValueError:
+                self.send_json({'error': '请求体不是有效的JSON'}, 400)
+                return
+            url = (payload.get('url') or '').strip()
+            if not url:
+                self.send_json({'error': '缺少 url'}, 400)
+                return
+            try:
+                priority = float(payload.get('priority', 1))
+            except (TypeError, ValueError):
+                priority = 0
+            if priority <= 0:
+                self.send_json({'error': 'priority 必须大于 0'}, 400)
+                return
+            self.send_json(self.daemon.submit(url, priority), 201)
+        elif len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'cancel':
+            self.cancel(parts[1])
+        else:
+            self.send_json({'error': '未知接口'}, 404)
+
+    def do_DELETE(self):
+        parts, _ = self.route()
+        if len(parts) == 2 and parts[0] == 'jobs':
+            self.cancel(parts[1])
+        else:
+            self.send_json({'error': '未知接口'}, 404)
+
+    def cancel(self, value: str):
+        job_id = self.job_id(value)
+        if job_id is None:
+            return
+        job = self.daemon.cancel(job_id)
+        if job is None:
+            self.send_json({'error': '任务不存在'}, 404)
+        else:
+            self.send_json(job)
+
+    def stream_events(self, job_id: int):
+        """以 NDJSON 逐行推送任务事件，任务结束后关闭连接"""
+        job = self.daemon.store.get(job_id)
+        if job is None:
+            self.send_json({'error': '任务不存在'}, 404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson; charset=utf-8')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+
+        events = self.daemon.events
+        # 先发送当前状态，再推送之后的事件
+        after = events.last_seq
+        lines = [{'event': 'snapshot', 'job': job}]
+        try:
+            while True:
+                for line in lines:
+                    self.wfile.write((json.dumps(line, ensure_ascii=False) + '\n').encode('utf-8'))
+                self.wfile.flush()
+                job = self.daemon.store.get(job_id)
+                if job['status'] in FINAL_STATUSES or self.daemon._stop.is_set():
+                    if not any(line.get('event') in FINAL_STATUSES for line in lines):
+                        self.wfile.write((json.dumps({'event': job['status'], 'job': job},
+                                                     ensure_ascii=False) + '\n').encode('utf-8'))
+                    return
+                seq, lines = events.read(after, job_id)
+                if seq == after:
+                    # 心跳，便于客户端检测连接状态
+                    lines = [{'event': 'heartbeat', 'time': time.time()}]
+                after = seq
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+class DaemonServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, daemon: DownloadDaemon):
+        super().__init__(address, DaemonRequestHandler)
+        self.daemon = daemon
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='B站音频下载守护进程')
+    parser.add_argument('-c', '--config', default='config.json', help='配置文件路径')
+    parser.add_argument('--host', help='监听地址 (默认 127.0.0.1)')
+    parser.add_argument('--port', type=int, help='监听端口 (默认 8765)')
+    parser.add_argument('--db', help='任务队列数据库路径 (默认在输出目录中)')
+    args = parser.parse_args()
+
+    extractor = AdvancedBilibiliExtractor(args.config)
+    daemon_config = extractor.config.get('daemon', {})
+    # 守护进程不在控制台输出状态行，指标通过 /metrics 获取
+    extractor.config.setdefault('metrics', {})['console_status'] = False
+    host = args.host or daemon_config.get('host', '127.0.0.1')
+    port = args.port or daemon_config.get('port', 8765)
+    db_path = Path(args.db or daemon_config.get('db_path', '.daemon_jobs.sqlite'))
+    if not db_path.is_absolute():
+        db_path = extractor.output_dir / db_path
+
+    store = JobStore(db_path)
+    daemon = DownloadDaemon(extractor, store, job_workers=daemon_config.get('job_workers', 2)).start()
+    reporter = extractor.start_metrics_reporter()
+    server = DaemonServer((host, port), daemon)
+
+    print(f"🚀 守护进程已启动: http://{host}:{port}")
+    print(f"📁 输出目录: {extractor.output_dir.absolute()}")
+    print(f"🗂️ 任务队列: {db_path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n⏹️ 正在停止...")
+    finally:
+        server.server_close()
+        daemon.stop()
+        if reporter is not None:
+            reporter.stop()
+        store.close()
+
+if __name__ == "__main__":
+    main()
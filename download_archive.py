@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+下载归档
+使用本地 SQLite 记录已完成的下载（BV号 + 分P + 音频格式/质量），
+重新运行合集时可在任何网络请求之前跳过已完成的条目
+"""
+
+import re
+import sys
+import time
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+BV_PATTERN = re.compile(r'(BV[0-9A-Za-z]{10})(?:_p(\d+))?')
+PAGE_PATTERN = re.compile(r'[?&]p=(\d+)')
+
+def entry_key(entry: Dict) -> Optional[Tuple[str, int]]:
+    """从 yt-dlp 条目中解析 (BV号, 分P)"""
+    for field in ('id', 'webpage_url', 'url'):
+        value = entry.get(field) or ''
+        match = BV_PATTERN.search(value)
+        if not match:
+            continue
+        page = match.group(2)
+        if page is None:
+            page_match = PAGE_PATTERN.search(entry.get('webpage_url') or entry.get('url') or '')
+            page = page_match.group(1) if page_match else 1
+        return match.group(1), int(page)
+    return None
+
+class DownloadArchive:
+    """已完成下载的持久化记录（线程安全）"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS downloads (
+            bvid TEXT NOT NULL,
+            page INTEGER NOT NULL,
+            audio_format TEXT NOT NULL,
+            audio_quality TEXT NOT NULL,
+            title TEXT,
+            filepath TEXT,
+            filesize INTEGER,
+            completed_at REAL NOT NULL,
+            PRIMARY KEY (bvid, page, audio_format, audio_quality)
+        )
+    """
+
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._conn:
+            self._conn.execute(self.SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def contains(self, bvid: str, page: int, audio_format: str, audio_quality: str) -> bool:
+        """条目是否已完成且输出文件仍然存在"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT filepath FROM downloads WHERE bvid=? AND page=? AND audio_format=? AND audio_quality=?",
+                (bvid, page, audio_format, str(audio_quality))
+            ).fetchone()
+        if row is None:
+            return False
+        return not row['filepath'] or Path(row['filepath']).exists()
+
+    def record(self, bvid: str, page: int, audio_format: str, audio_quality: str,
+               title: str = None, filepath: str = None):
+        """记录一个已完成的下载"""
+        filesize = None
+        if filepath and Path(filepath).exists():
+            filesize = Path(filepath).stat().st_size
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO downloads VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (bvid, page, audio_format, str(audio_quality), title,
+                 str(filepath) if filepath else None, filesize, time.time())
+            )
+
+    def entries(self, bvid: str = None) -> List[sqlite3.Row]:
+        """列出归档记录"""
+        query = "SELECT * FROM downloads"
+        params = ()
+        if bvid:
+            query += " WHERE bvid=?"
+            params = (bvid,)
+        with self._lock:
+            return self._conn.execute(query + " ORDER BY bvid, page", params).fetchall()
+
+    def prune(self, missing_only: bool = False, bvid: str = None, older_than_days: float = None) -> int:
+        """删除归档记录，返回删除条数"""
+        removed = 0
+        cutoff = time.time() - older_than_days * 86400 if older_than_days is not None else None
+        for row in self.entries(bvid):
+            if missing_only and row['filepath'] and Path(row['filepath']).exists():
+                continue
+            if cutoff is not None and row['completed_at'] >= cutoff:
+                continue
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "DELETE FROM downloads WHERE bvid=? AND page=? AND audio_format=? AND audio_quality=?",
+                    (row['bvid'], row['page'], row['audio_format'], row['audio_quality'])
+                )
+            removed += 1
+        return removed
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='下载归档管理工具')
+    parser.add_argument('-a', '--archive', default='./downloads/.download_archive.sqlite', help='归档文件路径')
+    subparsers = parser.add_subparsers(dest='command')
+
+    list_parser = subparsers.add_parser('list', help='列出归档记录')
+    list_parser.add_argument('--bvid', help='只显示指定BV号')
+
+    subparsers.add_parser('stats', help='显示归档统计')
+
+    prune_parser = subparsers.add_parser('prune', help='清理归档记录')
+    prune_parser.add_argument('--missing', action='store_true', help='只清理输出文件已不存在的记录')
+    prune_parser.add_argument('--bvid', help='只清理指定BV号')
+    prune_parser.add_argument('--older-than', type=float, metavar='DAYS', help='只清理早于指定天数的记录')
+
+    args = parser.parse_args()
+    if not args.command:
+        parser.print_help()
+        return
+
+    if not Path(args.archive).exists():
+        print(f"❌ 归档文件不存在: {args.archive}")
+        sys.exit(1)
+
+    archive = DownloadArchive(args.archive)
+
+    if args.command == 'list':
+        rows = archive.entries(args.bvid)
+        print(f"📋 归档记录 ({len(rows)} 条):")
+        for row in rows:
+            exists = '✓' if row['filepath'] and Path(row['filepath']).exists() else '✗'
+            print(f"  {exists} {row['bvid']} p{row['page']:<3d} {row['audio_format']}@{row['audio_quality']}  {row['title'] or ''}")
+    elif args.command == 'stats':
+        rows = archive.entries()
+        missing = sum(1 for row in rows if row['filepath'] and not Path(row['filepath']).exists())
+        total_size = sum(row['filesize'] or 0 for row in rows) / (1024 * 1024)
+        print(f"📊 共 {len(rows)} 条记录，{len({row['bvid'] for row in rows})} 个视频")
+        print(f"💾 总大小: {total_size:.1f} MB")
+        print(f"⚠️ 输出文件缺失: {missing} 条")
+    elif args.command == 'prune':
+        if not (args.missing or args.bvid or args.older_than is not None):
+            print("❌ 请至少指定 --missing、--bvid 或 --older-than 之一")
+            sys.exit(1)
+        removed = archive.prune(args.missing, args.bvid, args.older_than)
+        print(f"🧹 已清理 {removed} 条记录")
+
+    archive.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+下载脚本的命令行参数定义
+不导入 yt-dlp 和提取器模块：advanced_extractor.py / bilibili_audio_extractor.py 解析参数时使用，
+bili.py download --help 也直接由这里生成帮助，不需要导入提取器
+"""
+
+import argparse
+
+from format_policy import POLICIES
+
+def advanced_parser(prog: str = None) -> argparse.ArgumentParser:
+    """高级版（advanced_extractor.py）的参数"""
+    parser = argparse.ArgumentParser(prog=prog, description='高级B站音频提取器')
+    parser.add_argument('url', nargs='?', help='B站视频URL')
+    parser.add_argument('--batch', metavar='FILE', help='批量模式：从文件读取URL列表（每行 "URL [优先级]"，- 表示标准输入）')
+    parser.add_argument('-c', '--config', default='config.json', help='配置文件路径')
+    parser.add_argument('-o', '--output', help='输出目录')
+    parser.add_argument('-q', '--quality', help='音频质量 (如: 192, 320)')
+    parser.add_argument('-f', '--format', help='音频格式 (如: mp3, m4a)')
+    parser.add_argument('--concurrent', type=int, help='并发下载数')
+    parser.add_argument('--pipeline', action='store_true', help='下载与转码分离的流水线模式')
+    parser.add_argument('--refresh', action='store_true', help='忽略缓存的合集信息，重新枚举')
+    parser.add_argument('--adaptive', action='store_true', help='使用 asyncio 引擎自适应调整并发数')
+    parser.add_argument('--transcode-mode', choices=['auto', 'always'], help='auto: 能流复制则不转码; always: 始终重编码')
+    parser.add_argument('--stream', action='store_true', help='边枚举合集边下载（适合上千条目的合集）')
+    parser.add_argument('--max-bandwidth', help='所有下载共享的总带宽上限 (如: 500K, 5M)')
+    parser.add_argument('--max-api-rps', type=float, help='B站 API 每秒请求数上限')
+    parser.add_argument('--segments', type=int, help='单个音频流分段并行下载的连接数')
+    parser.add_argument('--pipe', action='store_true', help='边下载边编码，不写入中间文件')
+    parser.add_argument('--format-policy', choices=POLICIES, help='音频流选择策略（默认 smallest-sufficient）')
+    parser.add_argument('--metrics-jsonl', help='定期把指标快照追加到 JSON lines 文件')
+    parser.add_argument('--prometheus-textfile', help='定期写出 Prometheus 文本格式指标文件')
+    parser.add_argument('--metrics-port', type=int, help='在本地端口提供 /metrics 接口')
+    return parser
+
+def full_parser(prog: str = None) -> argparse.ArgumentParser:
+    """完整版（bilibili_audio_extractor.py）的参数"""
+    parser = argparse.ArgumentParser(prog=prog, description='B站视频音频提取器')
+    parser.add_argument('url', nargs='?', help='B站视频URL')
+    parser.add_argument('-f', '--format', default='mp3', help='音频格式 (如: mp3, m4a；m4a 可免转码)')
+    parser.add_argument('-q', '--quality', default='192', help='音频质量 (如: 192, 320)')
+    parser.add_argument('--store', metavar='DIR', help='内容去重存储目录（多个合集中重复的曲目只下载一次）')
+    parser.add_argument('--format-policy', choices=POLICIES, default='smallest-sufficient',
+                        help='音频流选择策略：不低于目标码率的最小流 / 最高码率 / 只要无损')
+    return parser
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+合集条目的紧凑表示
+yt-dlp 的条目字典带有格式列表、缩略图、HTTP 头等大量字段，上千条目的合集在整个下载过程中
+常驻几百 MB 内存；枚举之后立即把每个条目投影为只含下载所需字段的 __slots__ 对象，原始字典随即释放
+"""
+
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from download_archive import BV_PATTERN, entry_key
+
+# yt-dlp 字段名 -> 槽位（get() / dict(record) 按 yt-dlp 的字段名读取，供 entry_key、prepare_filename 等使用）；
+# index 不映射为 playlist_index：单独下载条目时解析结果中没有该字段，从内容存储复用时的文件名需与之一致
+FIELD_SLOTS = {
+    'id': 'id',
+    'title': 'title',
+    'webpage_url': 'url',
+    'url': 'url',
+    'duration': 'duration',
+    'playlist_title': 'playlist_title',
+}
+
+class EntryRecord:
+    """合集中的一个条目：id、分P、标题、页面地址、时长、在合集中的序号和合集标题"""
+
+    __slots__ = ('id', 'page', 'title', 'url', 'duration', 'index', 'playlist_title')
+
+    def __init__(self, id: str = None, page: int = None, title: str = None, url: str = None,
+                 duration: float = None, index: int = None, playlist_title: str = None):
+        self.id = id
+        self.page = page
+        self.title = title
+        self.url = url
+        self.duration = duration
+        self.index = index
+        self.playlist_title = playlist_title
+
+    @classmethod
+    def from_info(cls, info: Dict, index: int = None, playlist_title: str = None) -> 'EntryRecord':
+        key = entry_key(info)
+        return cls(
+            id=info.get('id'),
+            page=key[1] if key else None,
+            title=info.get('title'),
+            url=info.get('webpage_url') or info.get('url'),
+            duration=info.get('duration'),
+            index=index or info.get('playlist_index'),
+            # 同一合集的所有条目共享同一个字符串对象
+            playlist_title=playlist_title or info.get('playlist_title')
+        )
+
+    @property
+    def key(self) -> Optional[Tuple[str, int]]:
+        """(BV号, 分P)，与 entry_key() 对原始条目的结果相同"""
+        match = BV_PATTERN.search(self.id or '') or BV_PATTERN.search(self.url or '')
+        return (match.group(1), self.page) if match else None
+
+    # ---- 按 yt-dlp 字段名读取（兼容原来接收条目字典的代码）----
+
+    def get(self, name: str, default=None):
+        slot = FIELD_SLOTS.get(name)
+        value = getattr(self, slot) if slot else None
+        return default if value is None else value
+
+    def keys(self) -> List[str]:
+        return [name for name, slot in FIELD_SLOTS.items() if getattr(self, slot) is not None]
+
+    def __getitem__(self, name: str):
+        value = self.get(name)
+        if value is None:
+            raise KeyError(name)
+        return value
+
+    def to_dict(self) -> Dict:
+        return {name: self[name] for name in self.keys()}
+
+    def __repr__(self) -> str:
+        return f"EntryRecord({self.index}, {self.id!r}, {self.title!r})"
+
+def iter_records(entries, playlist_title: str = None) -> Iterator[EntryRecord]:
+    """逐个投影条目，序号从 1 开始（None 条目跳过且不占序号）"""
+    index = 0
+    for entry in entries:
+        if entry is not None:
+            index += 1
+            yield EntryRecord.from_info(entry, index, playlist_title)
+
+def project_entries(info: Dict) -> List[EntryRecord]:
+    """把合集的条目投影为紧凑记录，info 中的原始条目列表替换为记录列表（原始字典随即释放）"""
+    records = list(iter_records(info.pop('entries', None) or (), info.get('title')))
+    info['entries'] = records
+    return records
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+音频格式选择策略
+'bestaudio/best' 总是选码率最高的音频流（Hi-Res FLAC、杜比全景声），即使最终只编码为 128/192 kbps 的 MP3；
+这里作为可调用的 yt-dlp 格式选择器，按目标格式和码率选出不降低输出质量的最小音频流，并统计本次运行少下载的字节数：
+  smallest-sufficient  码率不低于目标码率的最小音频流（目标为无损格式时选最小的无损流），都达不到时选最好的
+  best                 与 bestaudio/best 相同
+  lossless-only        只接受无损音频流（FLAC/ALAC 等），没有时该条目失败
+"""
+
+import threading
+from typing import Dict, List, Optional
+
+from transcoder import LOSSLESS_FORMATS
+
+POLICIES = ('smallest-sufficient', 'best', 'lossless-only')
+
+# 无损编码（yt-dlp 的 acodec 前缀）
+LOSSLESS_CODECS = ('flac', 'alac', 'pcm', 'wav')
+
+# LAME VBR 质量 V0-V9 的平均码率（kbps），audio_quality 不大于 10 时按 VBR 质量解释（与 yt-dlp 一致）
+VBR_KBPS = (245, 225, 190, 175, 165, 130, 115, 100, 85, 65, 65)
+
+def target_bitrate(audio_format: str, audio_quality) -> Optional[float]:
+    """目标码率（kbps），无损目标格式返回 None"""
+    if audio_format in LOSSLESS_FORMATS:
+        return None
+    try:
+        quality = float(str(audio_quality).rstrip('kK'))
+    except ValueError:
+        return None
+    return VBR_KBPS[int(round(quality))] if quality <= 10 else quality
+
+def is_lossless(fmt: Dict) -> bool:
+    return (fmt.get('acodec') or '').lower().startswith(LOSSLESS_CODECS)
+
+def format_bitrate(fmt: Dict) -> Optional[float]:
+    """音频码率（kbps），未知时返回 None"""
+    return fmt.get('abr') or fmt.get('tbr')
+
+def format_size(fmt: Dict) -> Optional[int]:
+    """文件大小（yt-dlp 会按码率和时长补上 filesize_approx），未知时返回 None"""
+    return fmt.get('filesize') or fmt.get('filesize_approx')
+
+def audio_candidates(formats: List[Dict]) -> List[Dict]:
+    """纯音频流；没有时退回所有带音频的格式（相当于 bestaudio/best 中的 best）。保持 yt-dlp 的排序（由差到好）"""
+    with_audio = [f for f in formats if f.get('acodec') != 'none']
+    audio_only = [f for f in with_audio if f.get('vcodec') == 'none']
+    return audio_only or with_audio
+
+class FormatPolicy:
+    """可调用的 yt-dlp 格式选择器（作为 params['format'] 使用），线程安全地累计选择结果"""
+
+    def __init__(self, policy: str = 'smallest-sufficient', audio_format: str = 'mp3', audio_quality='192',
+                 min_ratio: float = 0.9):
+        if policy not in POLICIES:
+            raise ValueError(f"未知的格式选择策略: {policy}（可选: {', '.join(POLICIES)}）")
+        self.policy = policy
+        self.audio_format = audio_format
+        # 无损目标格式为 None
+        self.target_kbps = target_bitrate(audio_format, audio_quality)
+        # 源码率至少为目标码率的多少倍才算“足够”；解析结果中的码率是实测值，围绕档位的标称码率上下浮动
+        self.min_ratio = min_ratio
+        self._lock = threading.Lock()
+        self.stats = {'selected': 0, 'downsized': 0, 'selected_bytes': 0, 'best_bytes': 0, 'unknown_size': 0}
+
+    @classmethod
+    def from_config(cls, config: Dict, audio_format: str, audio_quality) -> 'FormatPolicy':
+        return cls(config.get('policy', 'smallest-sufficient'), audio_format, audio_quality,
+                   config.get('min_ratio', 0.9))
+
+    def select(self, formats: List[Dict]) -> Optional[Dict]:
+        """按策略选出一个格式，没有可接受的格式时返回 None"""
+        candidates = audio_candidates(formats)
+        if not candidates:
+            return None
+        best = candidates[-1]
+        if self.policy == 'best':
+            return best
+
+        lossless = [f for f in candidates if is_lossless(f)]
+        if self.policy == 'lossless-only' or self.target_kbps is None:
+            if lossless:
+                # 无损流之间没有质量差别，取最小的
+                return min(lossless, key=lambda f: (format_size(f) or float('inf'), format_bitrate(f) or 0))
+            return None if self.policy == 'lossless-only' else best
+
+        required = self.target_kbps * self.min_ratio
+        sufficient = [f for f in candidates if (format_bitrate(f) or 0) >= required]
+        if not sufficient:
+            # 都达不到目标码率时最好的一个也不会降低输出质量
+            return best
+        return min(sufficient, key=lambda f: (format_bitrate(f), format_size(f) or float('inf')))
+
+    def __call__(self, ctx: Dict):
+        formats = ctx['formats']
+        chosen = self.select(formats)
+        if chosen is None:
+            return
+        self.record(chosen, audio_candidates(formats)[-1])
+        yield chosen
+
+    def record(self, chosen: Dict, best: Dict):
+        chosen_size, best_size = format_size(chosen), format_size(best)
+        with self._lock:
+            self.stats['selected'] += 1
+            if chosen is not best:
+                self.stats['downsized'] += 1
+            if chosen_size is None or best_size is None:
+                self.stats['unknown_size'] += 1
+                return
+            self.stats['selected_bytes'] += chosen_size
+            self.stats['best_bytes'] += best_size
+
+    def summary_lines(self) -> List[str]:
+        """本次运行选择的音频流和（与最高码率相比）少下载的字节数"""
+        stats = self.stats
+        if not stats['selected']:
+            return []
+        saved = stats['best_bytes'] - stats['selected_bytes']
+        lines = [f"📉 格式选择 ({self.policy}): {stats['selected']} 个条目，"
+                 f"{stats['downsized']} 个选择了比最高码率更小的音频流"]
+        if stats['best_bytes']:
+            lines.append(f"  下载约 {stats['selected_bytes'] / (1024 * 1024):.1f} MB，比最高码率少 "
+                         f"{saved / (1024 * 1024):.1f} MB（{saved / stats['best_bytes']:.0%}）")
+        if stats['unknown_size']:
+            lines.append(f"  {stats['unknown_size']} 个条目的音频流大小未知，未计入")
+        return lines
@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+音频库目录索引
+每个音频库（输出目录）一个 SQLite 文件，记录每个音频文件的路径、大小、mtime、BV号、合集、标题和编码。
+提取器和转换、重命名工具在写入文件时顺带更新索引，列出文件时直接查询索引，不再遍历目录和逐个 stat；
+增量扫描只重新列出并 stat mtime 变化过的目录（--full 时重新 stat 全部文件，发现原地修改）
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from download_archive import entry_key
+
+CATALOG_NAME = '.library_catalog.sqlite'
+
+AUDIO_EXTENSIONS = ('mp3', 'm4a', 'aac', 'opus', 'ogg', 'flac', 'wav')
+
+# 没有更准确的信息时按扩展名推断编码
+EXTENSION_CODECS = {
+    'mp3': 'mp3',
+    'm4a': 'aac',
+    'aac': 'aac',
+    'opus': 'opus',
+    'ogg': 'vorbis',
+    'flac': 'flac',
+    'wav': 'pcm_s16le',
+}
+
+# 目录 mtime 距现在不足该秒数时不记录（同一时间粒度内的后续修改可能无法察觉），下次扫描重新列出
+RACY_SECONDS = 2.0
+
+# 写入或更新一个文件，未提供（NULL）的元数据保留原值
+UPSERT_TRACK_SQL = """
+    INSERT INTO tracks (path, dir, name, ext, size, mtime, bvid, page, collection, title, codec, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(path) DO UPDATE SET
+        size=excluded.size, mtime=excluded.mtime,
+        bvid=COALESCE(excluded.bvid, bvid), page=COALESCE(excluded.page, page),
+        collection=COALESCE(excluded.collection, collection),
+        title=COALESCE(excluded.title, title), codec=COALESCE(excluded.codec, codec),
+        updated_at=excluded.updated_at
+"""
+
+def is_audio_name(name: str) -> bool:
+    return not name.startswith('.') and name.rpartition('.')[2].lower() in AUDIO_EXTENSIONS
+
+def sidecar_metadata(path: Path) -> Dict:
+    """从 yt-dlp 写出的 .info.json 读取 BV号、分P、合集和标题，没有时从文件名推断"""
+    metadata = {}
+    sidecar = path.with_suffix('.info.json')
+    try:
+        with open(sidecar, 'r', encoding='utf-8') as f:
+            info = json.load(f)
+    except (OSError, ValueError):
+        info = {}
+    key = entry_key(info) if info else None
+    if key is None:
+        key = entry_key({'id': path.stem})
+    if key is not None:
+        metadata['bvid'], metadata['page'] = key
+    metadata['collection'] = info.get('playlist_title') or info.get('playlist')
+    metadata['title'] = info.get('title') or path.stem
+    return metadata
+
+class LibraryCatalog:
+    """一个音频库的文件索引（线程安全），路径以库根目录为基准的相对路径存储"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS tracks (
+            path TEXT PRIMARY KEY,
+            dir TEXT NOT NULL,
+            name TEXT NOT NULL,
+            ext TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            mtime REAL NOT NULL,
+            bvid TEXT,
+            page INTEGER,
+            collection TEXT,
+            title TEXT,
+            codec TEXT,
+            updated_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS tracks_dir ON tracks (dir);
+        CREATE INDEX IF NOT EXISTS tracks_bvid ON tracks (bvid, page);
+        CREATE TABLE IF NOT EXISTS dirs (
+            path TEXT PRIMARY KEY,
+            mtime REAL
+        );
+    """
+
+    def __init__(self, root, db_path=None):
+        self.root = Path(root)
+        self.db_path = Path(db_path) if db_path else self.root / CATALOG_NAME
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._conn:
+            self._conn.executescript(self.SCHEMA)
+        # 最近一次 scan() 的统计
+        self.scan_stats: Optional[Dict[str, int]] = None
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def relative(self, path) -> Optional[str]:
+        """库内的相对路径（POSIX 格式），库外的文件返回 None"""
+        path = Path(path)
+        if not path.is_absolute():
+            path = Path.cwd() / path
+        try:
+            return path.relative_to(self.root.absolute()).as_posix()
+        except ValueError:
+            return None
+
+    def absolute(self, relative: str) -> Path:
+        return self.root / relative
+
+    # ---- 增量更新 ----
+
+    def record(self, path, bvid: str = None, page: int = None, collection: str = None, title: str = None,
+               codec: str = None, info: Dict = None) -> bool:
+        """写入或更新一个文件（stat 一次），未提供的元数据保留原值；info 为 yt-dlp 条目时从中取元数据"""
+        relative = self.relative(path)
+        if relative is None or not is_audio_name(Path(relative).name):
+            return False
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        if info:
+            key = entry_key(info)
+            if key is not None:
+                bvid, page = bvid or key[0], page or key[1]
+            collection = collection or info.get('playlist_title') or info.get('playlist')
+            title = title or info.get('title')
+        self._upsert(relative, stat.st_size, stat.st_mtime, bvid=bvid, page=page, collection=collection,
+                     title=title, codec=codec)
+        return True
+
+    @staticmethod
+    def _track_row(relative: str, size: int, mtime: float, **metadata) -> Tuple:
+        directory, _, name = relative.rpartition('/')
+        ext = name.rpartition('.')[2].lower()
+        codec = metadata.get('codec') or EXTENSION_CODECS.get(ext)
+        return (relative, directory, name, ext, size, mtime, metadata.get('bvid'), metadata.get('page'),
+                metadata.get('collection'), metadata.get('title'), codec, time.time())
+
+    def _upsert(self, relative: str, size: int, mtime: float, **metadata):
+        with self._lock, self._conn:
+            self._conn.execute(UPSERT_TRACK_SQL, self._track_row(relative, size, mtime, **metadata))
+
+    def remove(self, path):
+        relative = self.relative(path)
+        if relative is None:
+            return
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM tracks WHERE path=?", (relative,))
+
+    def rename(self, old_path, new_path):
+        """文件被重命名（大小、mtime 和元数据不变）"""
+        old_relative, new_relative = self.relative(old_path), self.relative(new_path)
+        if old_relative is None or new_relative is None:
+            return
+        directory, _, name = new_relative.rpartition('/')
+        with self._lock, self._conn:
+            if self._conn.execute("SELECT 1 FROM tracks WHERE path=?", (old_relative,)).fetchone() is None:
+                # 旧路径不在索引中（如撤销中断的重命名时的临时文件名），保留目标路径的记录
+                return
+            self._conn.execute("DELETE FROM tracks WHERE path=?", (new_relative,))
+            self._conn.execute(
+                "UPDATE tracks SET path=?, dir=?, name=?, ext=?, updated_at=? WHERE path=?",
+                (new_relative, directory, name, name.rpartition('.')[2].lower(), time.time(), old_relative)
+            )
+
+    # ---- 与文件系统对账 ----
+
+    def scan(self, full: bool = False) -> Dict[str, int]:
+        """增量扫描，返回统计 {dirs, listed, added, updated, removed}
+
+        目录 mtime 与上次记录一致时不列出其内容（文件增删、重命名都会改变所在目录的 mtime）；
+        列出的目录中重新 stat 每个文件：用 rename / os.replace 替换的文件名字不变，只能由此发现。
+        full=True 时所有目录都重新列出，以发现不改变目录 mtime 的原地修改
+        """
+        stats = {'dirs': 0, 'listed': 0, 'added': 0, 'updated': 0, 'removed': 0}
+        self.scan_stats = stats
+        with self._lock:
+            known_dirs = {row['path']: row['mtime'] for row in self._conn.execute("SELECT * FROM dirs")}
+        seen_dirs = set()
+        stack = ['']
+        while stack:
+            relative_dir = stack.pop()
+            directory = self.root / relative_dir
+            try:
+                dir_mtime = os.stat(directory).st_mtime
+            except OSError:
+                continue
+            seen_dirs.add(relative_dir)
+            stats['dirs'] += 1
+            if not full and known_dirs.get(relative_dir) == dir_mtime:
+                # 未变化：子目录仍需检查
+                stack.extend(path for path in known_dirs
+                             if path and path.rpartition('/')[0] == relative_dir)
+                continue
+            started = time.time()
+            stats['listed'] += 1
+            subdirs = self._reconcile_dir(relative_dir, stats)
+            stack.extend(subdirs)
+            recorded_mtime = dir_mtime if started - dir_mtime >= RACY_SECONDS else None
+            with self._lock, self._conn:
+                self._conn.execute("INSERT OR REPLACE INTO dirs VALUES (?, ?)", (relative_dir, recorded_mtime))
+                # 子目录列表以本次列出的结果为准
+                self._conn.executemany("INSERT OR IGNORE INTO dirs VALUES (?, NULL)", [(path,) for path in subdirs])
+
+        # 已删除的目录（其父目录的 mtime 必然变化，因此会被重新列出）
+        vanished = [path for path in known_dirs if path not in seen_dirs]
+        if vanished:
+            with self._lock, self._conn:
+                for path in vanished:
+                    stats['removed'] += self._conn.execute("DELETE FROM tracks WHERE dir=?", (path,)).rowcount
+                    self._conn.execute("DELETE FROM dirs WHERE path=?", (path,))
+        return stats
+
+    def _reconcile_dir(self, relative_dir: str, stats: Dict[str, int]) -> List[str]:
+        """列出一个目录并 stat 其中的音频文件，与索引对账，返回子目录（相对路径）"""
+        prefix = f"{relative_dir}/" if relative_dir else ''
+        files = {}
+        subdirs = []
+        with os.scandir(self.root / relative_dir) as it:
+            for entry in it:
+                if entry.name.startswith('.'):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(prefix + entry.name)
+                elif is_audio_name(entry.name):
+                    files[entry.name] = entry
+
+        with self._lock:
+            indexed = {row['name']: row for row in self._conn.execute(
+                "SELECT name, size, mtime FROM tracks WHERE dir=?", (relative_dir,))}
+
+        changes = []
+        for name, entry in files.items():
+            row = indexed.get(name)
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            if row is None:
+                changes.append(self._track_row(prefix + name, stat.st_size, stat.st_mtime,
+                                               **sidecar_metadata(Path(entry.path))))
+                stats['added'] += 1
+            elif row['size'] != stat.st_size or row['mtime'] != stat.st_mtime:
+                changes.append(self._track_row(prefix + name, stat.st_size, stat.st_mtime))
+                stats['updated'] += 1
+
+        # 整个目录的变更在一个事务中提交
+        missing = [prefix + name for name in indexed if name not in files]
+        if changes or missing:
+            with self._lock, self._conn:
+                self._conn.executemany(UPSERT_TRACK_SQL, changes)
+                self._conn.executemany("DELETE FROM tracks WHERE path=?", [(path,) for path in missing])
+            stats['removed'] += len(missing)
+        return subdirs
+
+    # ---- 查询 ----
+
+    def files(self, ext: str = None, pattern: str = None, bvid: str = None, collection: str = None,
+              directory: str = None) -> List[sqlite3.Row]:
+        """按条件查询文件，pattern 为文件名通配符（如 *.m4a），directory 为库内相对目录"""
+        conditions, params = [], []
+        if ext:
+            conditions.append("ext=?")
+            params.append(ext.lower().lstrip('.'))
+        if pattern:
+            conditions.append("name GLOB ?")
+            params.append(pattern)
+        if bvid:
+            conditions.append("bvid=?")
+            params.append(bvid)
+        if collection:
+            conditions.append("collection LIKE ?")
+            params.append(f"%{collection}%")
+        if directory is not None:
+            conditions.append("dir=?")
+            params.append(directory)
+        query = "SELECT * FROM tracks"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        with self._lock:
+            return self._conn.execute(query + " ORDER BY path", params).fetchall()
+
+    def get(self, path) -> Optional[sqlite3.Row]:
+        relative = self.relative(path)
+        if relative is None:
+            return None
+        with self._lock:
+            return self._conn.execute("SELECT * FROM tracks WHERE path=?", (relative,)).fetchone()
+
+    def metadata(self, path) -> Dict:
+        """文件的 BV号、分P、合集和标题（未收录时为空字典）"""
+        row = self.get(path)
+        if row is None:
+            return {}
+        return {name: row[name] for name in ('bvid', 'page', 'collection', 'title')}
+
+    def totals(self) -> List[sqlite3.Row]:
+        """按扩展名汇总的文件数和大小"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT ext, COUNT(*) AS files, SUM(size) AS size, COUNT(DISTINCT bvid) AS videos "
+                "FROM tracks GROUP BY ext ORDER BY files DESC"
+            ).fetchall()
+
+def open_catalog(directory, scan: bool = True, full: bool = False, create: bool = True) -> Optional[LibraryCatalog]:
+    """打开目录的索引（不存在时创建）并做一次增量扫描；无法创建（如只读目录）时返回 None
+
+    create 为 False 时只打开已有的索引，没有索引的目录返回 None（只读的命令不在目录中留下文件）
+    """
+    if not create and not (Path(directory) / CATALOG_NAME).is_file():
+        return None
+    try:
+        catalog = LibraryCatalog(directory)
+        if scan:
+            catalog.scan(full)
+        return catalog
+    except (OSError, sqlite3.Error) as e:
+        print(f"⚠️ 无法使用目录索引，改为直接遍历目录: {e}")
+        return None
+
+def print_files(rows, show_metadata: bool = False):
+    total_size = 0
+    for i, row in enumerate(rows, 1):
+        total_size += row['size']
+        line = f"  {i:3d}. {row['path']} ({row['size'] / (1024 * 1024):.1f} MB)"
+        if show_metadata:
+            line += f"  {row['bvid'] or '-'} {row['codec'] or '-'} {row['title'] or ''}"
+            if row['collection']:
+                line += f" [{row['collection']}]"
+        print(line)
+    print(f"🎵 共 {len(rows)} 个文件，{total_size / (1024 * 1024):.1f} MB")
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='音频库目录索引')
+    parser.add_argument('-d', '--directory', default='./downloads', help='音频库目录')
+    subparsers = parser.add_subparsers(dest='command')
+
+    scan_parser = subparsers.add_parser('scan', help='增量扫描，使索引与目录一致')
+    scan_parser.add_argument('--full', action='store_true', help='重新 stat 所有文件（发现原地修改）')
+
+    list_parser = subparsers.add_parser('list', help='查询文件')
+    list_parser.add_argument('-f', '--format', help='只列出指定格式')
+    list_parser.add_argument('-p', '--pattern', help='文件名通配符（如 "*周华健*"）')
+    list_parser.add_argument('--bvid', help='只列出指定BV号')
+    list_parser.add_argument('--collection', help='合集标题包含的文字')
+    list_parser.add_argument('-l', '--long', action='store_true', help='同时显示BV号、编码、标题和合集')
+    list_parser.add_argument('--no-scan', action='store_true', help='不扫描目录，直接查询索引')
+
+    subparsers.add_parser('stats', help='按格式统计')
+
+    args = parser.parse_args()
+    if not args.command:
+        parser.print_help()
+        return
+
+    if not Path(args.directory).is_dir():
+        print(f"❌ 目录不存在: {args.directory}")
+        sys.exit(1)
+
+    catalog = LibraryCatalog(args.directory)
+    if args.command == 'scan':
+        start = time.perf_counter()
+        stats = catalog.scan(args.full)
+        print(f"🔍 扫描 {stats['dirs']} 个目录（列出 {stats['listed']} 个），用时 {time.perf_counter() - start:.2f} s")
+        print(f"  新增 {stats['added']}，更新 {stats['updated']}，移除 {stats['removed']}")
+    elif args.command == 'list':
+        if not args.no_scan:
+            catalog.scan()
+        rows = catalog.files(args.format, args.pattern, args.bvid, args.collection)
+        if not rows:
+            print("❌ 没有匹配的文件")
+        else:
+            print(f"📁 {catalog.root.absolute()}")
+            print_files(rows, args.long)
+    elif args.command == 'stats':
+        catalog.scan()
+        rows = catalog.totals()
+        print(f"📊 {catalog.root.absolute()}")
+        for row in rows:
+            print(f"  {row['ext']:<5s} {row['files']:6d} 个文件，{row['videos']:6d} 个视频，"
+                  f"{(row['size'] or 0) / (1024 * 1024):.1f} MB")
+    catalog.close()
+
+if __name__ == "__main__":
+    main()
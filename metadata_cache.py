@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+元数据缓存
+按合集URL缓存条目列表、按BV号（含分P）缓存单个视频的解析结果，
+在TTL内复用，刷新时只重新解析新增或发生变化的条目
+"""
+
+import json
+import time
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+# 用于判断平铺条目是否变化的字段
+FINGERPRINT_FIELDS = ('title', 'duration', 'url')
+
+def entry_fingerprint(entry: Dict) -> str:
+    """平铺条目的指纹"""
+    return json.dumps([entry.get(field) for field in FINGERPRINT_FIELDS], ensure_ascii=False)
+
+class MetadataCache:
+    """合集与视频元数据的持久化缓存（线程安全）"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS collections (
+            url TEXT PRIMARY KEY,
+            info TEXT NOT NULL,
+            fetched_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS entries (
+            entry_id TEXT PRIMARY KEY,
+            fingerprint TEXT,
+            info TEXT,
+            fetched_at REAL NOT NULL
+        );
+    """
+
+    def __init__(self, db_path, ttl: float = 86400, stream_url_ttl: float = 1800):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.stream_url_ttl = stream_url_ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        with self._conn:
+            self._conn.executescript(self.SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def get_collection(self, url: str) -> Optional[Dict]:
+        """获取TTL内的平铺合集信息"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT info, fetched_at FROM collections WHERE url=?", (url,)
+            ).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            return None
+        return json.loads(row[0])
+
+    def put_collection(self, url: str, info: Dict) -> int:
+        """保存平铺合集信息，并使新增或变化条目的缓存失效，返回失效条数"""
+        entries = [entry for entry in info.get('entries') or [] if entry is not None]
+        stale = 0
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO collections VALUES (?, ?, ?)",
+                (url, json.dumps(info, ensure_ascii=False), time.time())
+            )
+            for entry in entries:
+                if not entry.get('id'):
+                    continue
+                fingerprint = entry_fingerprint(entry)
+                row = self._conn.execute(
+                    "SELECT fingerprint FROM entries WHERE entry_id=?", (entry['id'],)
+                ).fetchone()
+                if row is not None and row[0] == fingerprint:
+                    continue
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, NULL, ?)",
+                    (entry['id'], fingerprint, time.time())
+                )
+                stale += 1
+        return stale
+
+    def get_entry(self, entry_id: str, max_age: float = None) -> Optional[Dict]:
+        """获取已解析的视频信息（默认要求在媒体地址有效期内）"""
+        if not entry_id:
+            return None
+        max_age = self.stream_url_ttl if max_age is None else max_age
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT info, fetched_at FROM entries WHERE entry_id=?", (entry_id,)
+            ).fetchone()
+        if row is None or row[0] is None or time.time() - row[1] > max_age:
+            return None
+        return json.loads(row[0])
+
+    def put_entry(self, entry_id: str, info: Dict, fingerprint: str = None):
+        """保存已解析的视频信息（应先经过 YoutubeDL.sanitize_info）"""
+        if not entry_id:
+            return
+        with self._lock, self._conn:
+            if fingerprint is None:
+                row = self._conn.execute(
+                    "SELECT fingerprint FROM entries WHERE entry_id=?", (entry_id,)
+                ).fetchone()
+                fingerprint = row[0] if row else None
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                (entry_id, fingerprint, json.dumps(info, ensure_ascii=False), time.time())
+            )
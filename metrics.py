@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+下载指标
+线程安全的指标汇总器，由 yt-dlp 的进度回调、后处理回调和日志驱动，
+统计每个工作线程和总体的下载速率、队列深度、各阶段耗时（metadata/download/transcode/write）、
+重试和失败次数，可导出为 JSON lines、Prometheus 文本文件或本地 /metrics 接口
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+
+STAGES = ('metadata', 'download', 'transcode', 'write')
+
+# 这些后处理器只移动/写出文件，计入 write 阶段
+WRITE_POSTPROCESSORS = {'MoveFiles', 'MoveFilesAfterDownload'}
+
+class StageStats:
+    """单个阶段的耗时统计"""
+
+    __slots__ = ('count', 'total', 'max')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def to_dict(self) -> Dict:
+        return {
+            'count': self.count,
+            'sum_seconds': round(self.total, 3),
+            'avg_seconds': round(self.total / self.count, 3) if self.count else 0.0,
+            'max_seconds': round(self.max, 3),
+        }
+
+class MetricsCollector:
+    """线程安全的指标汇总器"""
+
+    def __init__(self, rate_window: float = 1.0):
+        # 速率至少按 rate_window 秒的窗口计算，多个读取方（状态行、/metrics）互不干扰
+        self.rate_window = rate_window
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.started_at = time.time()
+        self.worker_bytes: Dict[str, int] = {}
+        self.worker_rates: Dict[str, float] = {}
+        self.queue_depths: Dict[str, int] = {}
+        self.stages = {stage: StageStats() for stage in STAGES}
+        self.counters = {'completed': 0, 'failed': 0, 'retries': 0, 'skipped': 0}
+        self._active_workers = set()
+        self._rate_snapshot = (time.monotonic(), {})
+
+    # ---- 事件输入 ----
+
+    def begin_entry(self):
+        """当前线程开始处理一个条目"""
+        state = self._local
+        state.entry_start = time.monotonic()
+        state.download_start = None
+        state.last_bytes = 0
+        state.pp_start = {}
+
+    def observe_stage(self, stage: str, seconds: float):
+        with self._lock:
+            self.stages[stage].observe(seconds)
+
+    def stage(self, stage: str):
+        """计时上下文：with metrics.stage('transcode'): ..."""
+        return _StageTimer(self, stage)
+
+    def inc(self, counter: str, amount: int = 1):
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def set_queue_depth(self, name: str, depth: int):
+        with self._lock:
+            self.queue_depths[name] = depth
+
+    def add_bytes(self, nbytes: int, worker: str = None):
+        """记录下载字节数（分段下载等非 yt-dlp 路径也可直接调用）"""
+        if nbytes <= 0:
+            return
+        worker = worker or threading.current_thread().name
+        with self._lock:
+            self.worker_bytes[worker] = self.worker_bytes.get(worker, 0) + nbytes
+
+    def progress_hook(self, d):
+        """yt-dlp 进度回调"""
+        state = self._local
+        if not hasattr(state, 'entry_start'):
+            self.begin_entry()
+        now = time.monotonic()
+        worker = threading.current_thread().name
+
+        if d['status'] == 'downloading':
+            if state.download_start is None:
+                # 第一个进度事件之前的时间都花在解析元数据上
+                state.download_start = now
+                self.observe_stage('metadata', now - state.entry_start)
+                with self._lock:
+                    self._active_workers.add(worker)
+            downloaded = d.get('downloaded_bytes') or 0
+            self.add_bytes(downloaded - state.last_bytes, worker)
+            state.last_bytes = downloaded
+        elif d['status'] == 'finished':
+            downloaded = d.get('downloaded_bytes') or d.get('total_bytes') or 0
+            self.add_bytes(downloaded - state.last_bytes, worker)
+            state.last_bytes = 0
+            if state.download_start is not None:
+                self.observe_stage('download', now - state.download_start)
+                state.download_start = None
+            with self._lock:
+                self._active_workers.discard(worker)
+        elif d['status'] == 'error':
+            with self._lock:
+                self._active_workers.discard(worker)
+
+    def postprocessor_hook(self, d):
+        """yt-dlp 后处理回调"""
+        state = self._local
+        if not hasattr(state, 'pp_start'):
+            state.pp_start = {}
+        name = d.get('postprocessor')
+        if d['status'] == 'started':
+            state.pp_start[name] = time.monotonic()
+        elif d['status'] == 'finished' and name in state.pp_start:
+            stage = 'write' if name in WRITE_POSTPROCESSORS else 'transcode'
+            self.observe_stage(stage, time.monotonic() - state.pp_start.pop(name))
+
+    # ---- 导出 ----
+
+    def snapshot(self) -> Dict:
+        """当前指标快照（同时更新每个工作线程的速率）"""
+        now = time.monotonic()
+        with self._lock:
+            last_time, last_bytes = self._rate_snapshot
+            elapsed = now - last_time
+            if elapsed >= self.rate_window:
+                self.worker_rates = {
+                    worker: (total - last_bytes.get(worker, 0)) / elapsed
+                    for worker, total in self.worker_bytes.items()
+                }
+                self._rate_snapshot = (now, dict(self.worker_bytes))
+            total_bytes = sum(self.worker_bytes.values())
+            return {
+                'timestamp': time.time(),
+                'elapsed_seconds': round(time.time() - self.started_at, 3),
+                'total_bytes': total_bytes,
+                'total_bytes_per_second': round(sum(self.worker_rates.values()), 1),
+                'workers': {
+                    worker: {'bytes': total, 'bytes_per_second': round(self.worker_rates.get(worker, 0.0), 1)}
+                    for worker, total in self.worker_bytes.items()
+                },
+                'active_downloads': len(self._active_workers),
+                'queue_depth': dict(self.queue_depths),
+                'stages': {stage: stats.to_dict() for stage, stats in self.stages.items()},
+                'counters': dict(self.counters),
+            }
+
+    def prometheus_text(self, snapshot: Dict = None) -> str:
+        """Prometheus 文本格式"""
+        snapshot = snapshot or self.snapshot()
+        lines = [
+            '# TYPE bili_downloaded_bytes_total counter',
+        ]
+        for worker, stats in snapshot['workers'].items():
+            lines.append(f'bili_downloaded_bytes_total{{worker="{worker}"}} {stats["bytes"]}')
+        lines.append('# TYPE bili_download_bytes_per_second gauge')
+        for worker, stats in snapshot['workers'].items():
+            lines.append(f'bili_download_bytes_per_second{{worker="{worker}"}} {stats["bytes_per_second"]}')
+        lines.append(f'bili_download_bytes_per_second{{worker="total"}} {snapshot["total_bytes_per_second"]}')
+        lines.append('# TYPE bili_active_downloads gauge')
+        lines.append(f'bili_active_downloads {snapshot["active_downloads"]}')
+        lines.append('# TYPE bili_queue_depth gauge')
+        for name, depth in snapshot['queue_depth'].items():
+            lines.append(f'bili_queue_depth{{queue="{name}"}} {depth}')
+        lines.append('# TYPE bili_stage_seconds summary')
+        for stage, stats in snapshot['stages'].items():
+            lines.append(f'bili_stage_seconds_count{{stage="{stage}"}} {stats["count"]}')
+            lines.append(f'bili_stage_seconds_sum{{stage="{stage}"}} {stats["sum_seconds"]}')
+        lines.append('# TYPE bili_stage_seconds_max gauge')
+        for stage, stats in snapshot['stages'].items():
+            lines.append(f'bili_stage_seconds_max{{stage="{stage}"}} {stats["max_seconds"]}')
+        for counter, value in snapshot['counters'].items():
+            lines.append(f'# TYPE bili_{counter}_total counter')
+            lines.append(f'bili_{counter}_total {value}')
+        return '\n'.join(lines) + '\n'
+
+    def summary_lines(self):
+        """运行结束时的汇总"""
+        snapshot = self.snapshot()
+        elapsed = max(snapshot['elapsed_seconds'], 1e-6)
+        counters = snapshot['counters']
+        lines = [
+            f"📈 运行指标 (用时 {elapsed:.1f} s)",
+            f"  下载总量: {snapshot['total_bytes'] / (1024 * 1024):.1f} MB，"
+            f"平均 {snapshot['total_bytes'] / elapsed / (1024 * 1024):.2f} MB/s",
+            f"  完成 {counters['completed']}，失败 {counters['failed']}，"
+            f"重试 {counters['retries']}，跳过 {counters['skipped']}",
+        ]
+        for stage, stats in snapshot['stages'].items():
+            if stats['count']:
+                lines.append(f"  {stage:<9s} 平均 {stats['avg_seconds']:.2f} s，最长 {stats['max_seconds']:.2f} s "
+                             f"({stats['count']} 次)")
+        return lines
+
+class _StageTimer:
+    def __init__(self, collector: MetricsCollector, stage: str):
+        self.collector = collector
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.monotonic()
+        return self
+
+    def __exit__(self, *args):
+        self.collector.observe_stage(self.stage, time.monotonic() - self.start)
+
+class MetricsLogger:
+    """yt-dlp 日志适配器：照常输出，同时统计重试次数"""
+
+    def __init__(self, collector: MetricsCollector, quiet: bool = False):
+        self.collector = collector
+        self.quiet = quiet
+
+    def debug(self, msg):
+        if not self.quiet and not msg.startswith('[debug] '):
+            print(msg)
+
+    def info(self, msg):
+        self.debug(msg)
+
+    def warning(self, msg):
+        if 'Retrying' in msg:
+            self.collector.inc('retries')
+        print(msg, file=sys.stderr)
+
+    def error(self, msg):
+        print(msg, file=sys.stderr)
+
+class MetricsReporter:
+    """后台线程：定期输出状态行并写出 JSON lines / Prometheus 文本文件，可选提供 /metrics 接口"""
+
+    def __init__(self, collector: MetricsCollector, interval: float = 5.0, jsonl_path: str = None,
+                 prometheus_textfile: str = None, http_port: int = None, console: bool = True):
+        self.collector = collector
+        self.interval = interval
+        self.jsonl_path = Path(jsonl_path) if jsonl_path else None
+        self.prometheus_textfile = Path(prometheus_textfile) if prometheus_textfile else None
+        self.http_port = http_port
+        self.console = console
+        self._stop = threading.Event()
+        self._thread = None
+        self._httpd = None
+
+    def start(self):
+        if self.http_port:
+            self._start_http()
+        self._thread = threading.Thread(target=self._run, name='metrics-reporter', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.export()
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            snapshot = self.export()
+            if self.console:
+                self.print_status(snapshot)
+
+    def print_status(self, snapshot: Dict):
+        counters = snapshot['counters']
+        depth = sum(snapshot['queue_depth'].values())
+        print(f"📶 {snapshot['active_downloads']} 个下载中 | "
+              f"{snapshot['total_bytes_per_second'] / (1024 * 1024):.2f} MB/s | "
+              f"完成 {counters['completed']} | 失败 {counters['failed']} | 队列 {depth}", flush=True)
+
+    def export(self) -> Dict:
+        snapshot = self.collector.snapshot()
+        if self.jsonl_path:
+            with open(self.jsonl_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(snapshot, ensure_ascii=False) + '\n')
+        if self.prometheus_textfile:
+            temp_file = self.prometheus_textfile.with_name(self.prometheus_textfile.name + '.tmp')
+            temp_file.write_text(self.collector.prometheus_text(snapshot), encoding='utf-8')
+            os.replace(temp_file, self.prometheus_textfile)
+        return snapshot
+
+    def _start_http(self):
+        collector = self.collector
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != '/metrics':
+                    self.send_error(404)
+                    return
+                body = collector.prometheus_text().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', self.http_port), Handler)
+        self._httpd.daemon_threads = True
+        threading.Thread(target=self._httpd.serve_forever, name='metrics-http', daemon=True).start()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+边下载边编码
+普通流程先把完整的 m4a 写入磁盘，再由 FFmpeg 读回转码（或流复制）写出第二份文件；
+这里把下载到的字节直接写入 FFmpeg 的标准输入，磁盘上只写一次最终文件。
+下载或编码任一端出错时终止另一端、删除未完成的输出并向上抛出错误
+"""
+
+import os
+import subprocess
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from yt_dlp.networking import Request
+
+from transcoder import ACCEPTED_CODECS, build_copy_command, build_transcode_command, temp_output_path
+
+# yt-dlp 的 acodec 前缀 -> FFmpeg 编码名
+CODEC_PREFIXES = (
+    ('mp4a', 'aac'),
+    ('aac', 'aac'),
+    ('opus', 'opus'),
+    ('vorbis', 'vorbis'),
+    ('flac', 'flac'),
+    ('alac', 'alac'),
+    ('mp3', 'mp3'),
+)
+
+class PipeEncodeError(Exception):
+    """边下载边编码失败"""
+
+def source_codec(info: Dict) -> Optional[str]:
+    """由解析结果推断音频编码（FFmpeg 名称），无法判断时返回 None"""
+    acodec = (info.get('acodec') or '').lower()
+    for prefix, codec in CODEC_PREFIXES:
+        if acodec.startswith(prefix):
+            return codec
+    return None
+
+def is_pipeable(info: Dict) -> bool:
+    """单个 HTTP 音频流才能直接送入 FFmpeg（DASH 分片、音视频分离的格式走普通下载）"""
+    if info.get('_type', 'video') != 'video' or info.get('requested_formats'):
+        return False
+    return bool(info.get('url')) and info.get('protocol', 'https') in ('http', 'https')
+
+class PipeEncoder:
+    """把 HTTP 音频流通过管道交给 FFmpeg 编码"""
+
+    def __init__(self, audio_format: str = 'mp3', quality: str = '192', mode: str = 'auto',
+                 chunk_size: int = 256 * 1024):
+        self.audio_format = audio_format
+        self.quality = quality
+        # auto：源编码已被目标格式接受时流复制；always：始终重编码
+        self.mode = mode
+        self.chunk_size = chunk_size
+
+    def build_command(self, info: Dict, output, tags: Dict = None) -> List[str]:
+        codec = source_codec(info)
+        if self.mode == 'auto' and codec in ACCEPTED_CODECS.get(self.audio_format, set()):
+            return build_copy_command('pipe:0', output, self.audio_format, tags)
+        return build_transcode_command('pipe:0', output, self.audio_format, self.quality, tags)
+
+    def encode(self, ydl, info: Dict, output, tags: Dict = None) -> int:
+        """下载 info 中选定的音频流并编码到 output（同时写入 tags），返回下载的字节数
+
+        请求经由 ydl.urlopen 发出（沿用 Cookie、代理和限速），进度交给 ydl 的进度钩子；
+        输出先写入临时文件，FFmpeg 成功退出后才原子替换到 output
+        """
+        output = Path(output)
+        temp_file = temp_output_path(output)
+        headers = info.get('http_headers') or {}
+        response = ydl.urlopen(Request(info['url'], headers=headers))
+        total = int(response.headers.get('Content-Length') or 0) or None
+        process = subprocess.Popen(self.build_command(info, temp_file, tags), stdin=subprocess.PIPE,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        # 持续读取 stderr，避免 FFmpeg 输出过多时阻塞
+        stderr_chunks = []
+        stderr_reader = threading.Thread(target=lambda: stderr_chunks.append(process.stderr.read()), daemon=True)
+        stderr_reader.start()
+
+        def ffmpeg_error() -> str:
+            stderr_reader.join(5)
+            message = b''.join(stderr_chunks).decode('utf-8', 'replace').strip()
+            return message.splitlines()[-1] if message else f"退出码 {process.returncode}"
+
+        downloaded = 0
+        try:
+            with response:
+                while True:
+                    chunk = response.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    try:
+                        process.stdin.write(chunk)
+                    except BrokenPipeError:
+                        process.wait()
+                        raise PipeEncodeError(f"FFmpeg 提前退出: {ffmpeg_error()}") from None
+                    downloaded += len(chunk)
+                    self._report_progress(ydl, info, output, downloaded, total, 'downloading')
+            if total is not None and downloaded < total:
+                raise PipeEncodeError(f"音频流提前结束: expected {total} bytes, got {downloaded}")
+            try:
+                process.stdin.close()
+            except BrokenPipeError:
+                pass
+            if process.wait() != 0:
+                raise PipeEncodeError(f"FFmpeg 编码失败: {ffmpeg_error()}")
+            os.replace(temp_file, output)
+        except BaseException:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            temp_file.unlink(missing_ok=True)
+            self._report_progress(ydl, info, output, downloaded, total, 'error')
+            raise
+        finally:
+            if not process.stdin.closed:
+                try:
+                    process.stdin.close()
+                except BrokenPipeError:
+                    pass
+        self._report_progress(ydl, info, output, downloaded, downloaded, 'finished')
+        return downloaded
+
+    @staticmethod
+    def _report_progress(ydl, info: Dict, output: Path, downloaded: int, total: Optional[int], status: str):
+        status_dict = {
+            'status': status,
+            'filename': str(output),
+            'downloaded_bytes': downloaded,
+            'total_bytes': total,
+            'info_dict': info,
+        }
+        for hook in ydl._progress_hooks:
+            hook(status_dict)
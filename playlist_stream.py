@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式枚举合集条目
+使用 extract_info(process=False) 取得提取器原始结果，条目按页惰性产出：
+第一个条目到达后即可开始下载，不必等待整个合集解析完毕。
+分页列表通过公开的 PagedList.getslice 按页读取；yt-dlp 会缓存已拉取页的原始条目（只含地址和标题的跳转结果），
+完整的解析结果仍逐个产生、逐个释放
+"""
+
+from typing import Dict, Iterator, Optional
+
+import yt_dlp
+from yt_dlp.utils import PagedList
+
+# url 类型结果（跳转）的最大跟随次数
+MAX_REDIRECTS = 5
+
+# 每次从分页列表读取的条目数（B站合集接口每页 30~100 条）
+SLICE_SIZE = 50
+
+def iter_paged(entries: PagedList) -> Iterator[Dict]:
+    """按 SLICE_SIZE 条一段从分页列表读取，不足一段时结束"""
+    start = 0
+    while True:
+        chunk = entries.getslice(start, start + SLICE_SIZE)
+        yield from chunk
+        if len(chunk) < SLICE_SIZE:
+            return
+        start += SLICE_SIZE
+
+def iter_entries(entries) -> Iterator[Dict]:
+    """逐个产出条目；分页列表按段拉取，取到第一段即开始产出"""
+    if isinstance(entries, PagedList):
+        entries = iter_paged(entries)
+    for entry in entries:
+        if entry is not None:
+            yield entry
+
+class PlaylistStream:
+    """惰性合集枚举器
+
+    open() 之后 is_playlist 表示是否为合集；合集通过迭代取得条目，
+    单个视频时 info 即完整的提取结果
+    """
+
+    def __init__(self, url: str, opts: Optional[Dict] = None, ydl_class=yt_dlp.YoutubeDL):
+        self.url = url
+        self.opts = {'quiet': True, 'extract_flat': 'in_playlist', **(opts or {})}
+        self.ydl_class = ydl_class
+        self.ydl = None
+        self.info = None
+
+    def open(self) -> Optional[Dict]:
+        """解析到合集层级（不解析条目），返回原始结果"""
+        self.ydl = self.ydl_class(self.opts)
+        url, ie_key = self.url, None
+        for _ in range(MAX_REDIRECTS):
+            info = self.ydl.extract_info(url, ie_key=ie_key, download=False, process=False)
+            if not info or info.get('_type') not in ('url', 'url_transparent'):
+                break
+            url, ie_key = info['url'], info.get('ie_key')
+        self.info = info
+        return info
+
+    @property
+    def is_playlist(self) -> bool:
+        return bool(self.info) and self.info.get('_type') in ('playlist', 'multi_video')
+
+    @property
+    def title(self) -> str:
+        return (self.info or {}).get('title') or self.url
+
+    @property
+    def count(self) -> Optional[int]:
+        """提取器预先给出的条目数（未知时为 None）"""
+        info = self.info or {}
+        if info.get('playlist_count'):
+            return info['playlist_count']
+        entries = info.get('entries')
+        return len(entries) if isinstance(entries, list) else None
+
+    def __iter__(self) -> Iterator[Dict]:
+        if not self.is_playlist:
+            return iter(())
+        return iter_entries(self.info['entries'])
+
+    def close(self):
+        if self.ydl is not None:
+            self.ydl.close()
+            self.ydl = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+全局限速
+所有下载线程共享的令牌桶：按主机分类（B站 API / CDN）分别限制每秒请求数和每秒字节数，
+另可限制总带宽。请求在 YoutubeDL.urlopen 中排队，字节数在进度回调中扣除
+（回调阻塞时下载线程停止读取，TCP 窗口随之收缩）
+"""
+
+import time
+import fnmatch
+import threading
+from urllib.parse import urlparse
+from typing import Dict, List, Optional
+
+import yt_dlp
+
+class TokenBucket:
+    """线程安全的令牌桶（预约模式：先扣除，再按欠额等待）"""
+
+    def __init__(self, rate: float, burst: float = None):
+        self.rate = float(rate)
+        self.capacity = float(burst or rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float = 1) -> float:
+        """扣除 amount 个令牌，返回需要等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            return max(0.0, -self.tokens / self.rate)
+
+    def acquire(self, amount: float = 1):
+        wait = self.reserve(amount)
+        if wait > 0:
+            time.sleep(wait)
+
+class HostClass:
+    """一类主机的请求数和带宽预算"""
+
+    def __init__(self, name: str, match: List[str], requests_per_second: float = 0, bytes_per_second: float = 0,
+                 burst: float = None):
+        self.name = name
+        self.match = [pattern.lower() for pattern in match]
+        self.requests = TokenBucket(requests_per_second, burst) if requests_per_second else None
+        self.bytes = TokenBucket(bytes_per_second) if bytes_per_second else None
+
+    def matches(self, host: str) -> bool:
+        return any(fnmatch.fnmatch(host, pattern) for pattern in self.match)
+
+class RateLimiter:
+    """按主机分类的全局限速器"""
+
+    def __init__(self, hosts: Optional[Dict] = None, total_bytes_per_second: float = 0):
+        self.classes = [
+            HostClass(name, **options) for name, options in (hosts or {}).items()
+        ]
+        self.total_bytes = TokenBucket(total_bytes_per_second) if total_bytes_per_second else None
+        self._local = threading.local()
+        self._host_cache: Dict[str, Optional[HostClass]] = {}
+
+    @classmethod
+    def from_config(cls, config: Dict) -> 'RateLimiter':
+        return cls(config.get('hosts'), config.get('total_bytes_per_second', 0))
+
+    def classify(self, url: str) -> Optional[HostClass]:
+        host = (urlparse(url).hostname or '').lower()
+        if host not in self._host_cache:
+            self._host_cache[host] = next((c for c in self.classes if c.matches(host)), None)
+        return self._host_cache[host]
+
+    def before_request(self, url: str):
+        """发起请求前调用，超出请求预算时阻塞"""
+        host_class = self.classify(url)
+        if host_class is not None and host_class.requests is not None:
+            host_class.requests.acquire()
+
+    def consume_bytes(self, url: str, nbytes: int):
+        """记录已读取的字节数，超出带宽预算时阻塞"""
+        if nbytes <= 0:
+            return
+        host_class = self.classify(url)
+        waits = []
+        if host_class is not None and host_class.bytes is not None:
+            waits.append(host_class.bytes.reserve(nbytes))
+        if self.total_bytes is not None:
+            waits.append(self.total_bytes.reserve(nbytes))
+        wait = max(waits, default=0)
+        if wait > 0:
+            time.sleep(wait)
+
+    def progress_hook(self, d):
+        """yt-dlp 进度回调：按本次新增的字节数限速"""
+        if d.get('rate_limited'):
+            # 下载器已自行计入（如分段下载）
+            return
+        state = self._local
+        filename = d.get('filename')
+        if getattr(state, 'filename', None) != filename:
+            state.filename = filename
+            state.last_bytes = 0
+        downloaded = d.get('downloaded_bytes') or 0
+        url = (d.get('info_dict') or {}).get('url') or ''
+        self.consume_bytes(url, downloaded - state.last_bytes)
+        state.last_bytes = downloaded
+        if d['status'] != 'downloading':
+            state.filename = None
+
+class RateLimitMixin:
+    """为 YoutubeDL（或其子类）加上全局限速，限速器取自 params['rate_limiter']"""
+
+    def __init__(self, params=None, *args, **kwargs):
+        super().__init__(params, *args, **kwargs)
+        self.rate_limiter = self.params.get('rate_limiter')
+        if self.rate_limiter is not None:
+            self.add_progress_hook(self.rate_limiter.progress_hook)
+
+    def urlopen(self, req):
+        if self.rate_limiter is not None:
+            self.rate_limiter.before_request(req if isinstance(req, str) else req.url)
+        return super().urlopen(req)
+
+_limited_classes = {}
+
+def with_rate_limit(ydl_class=yt_dlp.YoutubeDL):
+    """返回带全局限速的 ydl_class 子类"""
+    if ydl_class not in _limited_classes:
+        _limited_classes[ydl_class] = type(f'RateLimited{ydl_class.__name__}', (RateLimitMixin, ydl_class), {})
+    return _limited_classes[ydl_class]
@@ -3,136 +3,297 @@
 """
 MP3文件重命名工具
 去掉文件名中与歌曲名无关的部分，只保留歌曲名称和扩展名
+
+规则表只编译一次，一次遍历生成完整的重命名计划（确定性地解决重名冲突），
+计划可先输出为文件供检查（dry-run），再批量执行并写入撤销日志；
+文件列表取自目录索引（library_catalog），重命名结果同步写回索引
 """
 
 import os
 import re
+import json
+import time
 from pathlib import Path
 
-def extract_song_name(filename):
-    """从文件名中提取歌曲名称"""
-    # 去掉扩展名
-    name_without_ext = filename.rsplit('.', 1)[0]
-    
+from library_catalog import open_catalog, print_files
+
+# 重命名规则表：按顺序匹配，取第一个命中规则的 group(1)
+# split_dash 为 True 时，歌曲名中还有-，取第一个-之前的部分
+DEFAULT_RULES = [
     # 最新格式：序号_【合集标题】 p序号 歌曲名-歌手-立体声伴奏
     # 例如：01_【合集11首】周华健-经典歌曲高品质立体声伴奏合集-精品伴奏馆 p01 爱相随-周华健-立体声伴奏
-    pattern_latest = r'^\d+_.*?\sp\d+\s+(.+?)(?:-.*?-.*?)?$'
-    match = re.search(pattern_latest, name_without_ext)
-    if match:
-        song_name = match.group(1).strip()
-        # 如果歌曲名中还有-，取第一个-之前的部分
-        if '-' in song_name:
-            song_name = song_name.split('-')[0].strip()
-        return song_name
-    
+    {'name': 'latest', 'pattern': r'^\d+_.*?\sp\d+\s+(.+?)(?:-.*?-.*?)?$', 'split_dash': True},
     # 王杰格式：序号_【Hi-Res无损音质】2025年王杰100首精选歌曲合集...p序号 序号.歌曲名
     # 例如：01_【Hi-Res无损音质】2025年王杰100首精选歌曲合集（只选播放量最高的）值得单曲循环的歌单！ p01 1.谁明浪子心
-    pattern_new = r'^\d+_.*?\sp\d+\s+\d+\.(.+)$'
-    match = re.search(pattern_new, name_without_ext)
-    if match:
-        song_name = match.group(1).strip()
-        return song_name
-    
+    {'name': 'numbered', 'pattern': r'^\d+_.*?\sp\d+\s+\d+\.(.+)$'},
     # 旧格式1：序号_长标题 p序号 歌曲名-电影名-年份
     # 例如：01_70后 80后 90后 欧美奥斯卡电影金曲精选合集（1940-2015）珍藏版 值得回味收藏！ p01 【开头王炸】My heart will go on-泰坦尼克号-1997
-    pattern1 = r'^\d+_.*?\sp\d+\s+(?:【.*?】)?(.+?)(?:-.*?-\d{4})?$'
-    match = re.search(pattern1, name_without_ext)
-    if match:
-        song_name = match.group(1).strip()
-        return song_name
-    
+    {'name': 'movie', 'pattern': r'^\d+_.*?\sp\d+\s+(?:【.*?】)?(.+?)(?:-.*?-\d{4})?$'},
     # 旧格式2：NA_开头的格式
     # 例如：NA_奥斯卡百年金曲《Say You, Say Me》，歌声飘过36年，永恒的经典
-    pattern2 = r'^NA_.*?《(.+?)》.*$'
-    match = re.search(pattern2, name_without_ext)
-    if match:
-        song_name = match.group(1).strip()
-        return song_name
-    
+    {'name': 'quoted', 'pattern': r'^NA_.*?《(.+?)》.*$'},
     # 如果都不匹配，尝试提取最后一个-之前的部分作为歌曲名
-    pattern3 = r'^.*?\s+(.+?)(?:-.*?-\d{4})?$'
-    match = re.search(pattern3, name_without_ext)
-    if match:
-        song_name = match.group(1).strip()
-        return song_name
-    
-    # 如果都不匹配，返回原文件名（去掉扩展名）
-    return name_without_ext
+    {'name': 'fallback', 'pattern': r'^.*?\s+(.+?)(?:-.*?-\d{4})?$'},
+]
+
+ILLEGAL_CHARS = re.compile(r'[<>:"/\\|?*]')
+WHITESPACE = re.compile(r'\s+')
+
+JOURNAL_NAME = '.rename_journal.jsonl'
+
+class RenameRules:
+    """编译后的重命名规则表"""
+
+    def __init__(self, rules=None):
+        self.rules = [
+            (rule['name'], re.compile(rule['pattern']), rule.get('split_dash', False))
+            for rule in (rules or DEFAULT_RULES)
+        ]
+
+    @classmethod
+    def from_file(cls, rules_file):
+        """从JSON文件加载规则表（格式同 DEFAULT_RULES）"""
+        with open(rules_file, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def extract(self, filename):
+        """从文件名中提取歌曲名称"""
+        # 去掉扩展名
+        name_without_ext = filename.rsplit('.', 1)[0]
+
+        for _, pattern, split_dash in self.rules:
+            match = pattern.search(name_without_ext)
+            if match:
+                song_name = match.group(1).strip()
+                if split_dash and '-' in song_name:
+                    song_name = song_name.split('-')[0].strip()
+                return song_name
+
+        # 如果都不匹配，返回原文件名（去掉扩展名）
+        return name_without_ext
+
+_default_rules = RenameRules()
+
+def extract_song_name(filename):
+    """从文件名中提取歌曲名称"""
+    return _default_rules.extract(filename)
 
 def clean_filename(filename):
     """清理文件名，去掉不合法字符"""
     # 替换不合法的文件名字符
-    illegal_chars = r'[<>:"/\\|?*]'
-    cleaned = re.sub(illegal_chars, '_', filename)
-    
+    cleaned = ILLEGAL_CHARS.sub('_', filename)
+
     # 去掉多余的空格和点
-    cleaned = re.sub(r'\s+', ' ', cleaned).strip()
+    cleaned = WHITESPACE.sub(' ', cleaned).strip()
     cleaned = cleaned.strip('.')
-    
+
     return cleaned
 
-def rename_mp3_files(directory="./downloads"):
+def load_journal(dir_path):
+    """读取撤销日志中的所有记录"""
+    journal_path = Path(dir_path) / JOURNAL_NAME
+    if not journal_path.exists():
+        return []
+    with open(journal_path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def build_rename_plan(names, rules=None, exclude=(), extension='.mp3'):
+    """一次遍历计算完整的重命名计划，返回 [(旧名, 新名)]
+
+    按文件名排序后依次分配目标名，重名时追加 " (2)"、" (3)"…，结果与目录遍历顺序无关；
+    exclude 中的文件（如上次重命名的结果）保持不变
+    """
+    rules = rules or _default_rules
+    names = sorted(names)
+    exclude = set(exclude)
+
+    # 先算出所有目标名，保持不变的文件占用自己的名字
+    targets = {}
+    occupied = set()
+    for name in names:
+        if name in exclude:
+            occupied.add(name)
+            continue
+        target = f"{clean_filename(rules.extract(name))}{extension}"
+        if target == name or target == extension:
+            occupied.add(name)
+            continue
+        targets[name] = target
+
+    plan = []
+    for name, target in targets.items():
+        stem = target[:-len(extension)]
+        candidate = target
+        suffix = 2
+        while candidate in occupied:
+            candidate = f"{stem} ({suffix}){extension}"
+            suffix += 1
+        occupied.add(candidate)
+        plan.append((name, candidate))
+    return plan
+
+def write_plan(plan, plan_file):
+    """把重命名计划写成可检查、可编辑的TSV文件"""
+    with open(plan_file, 'w', encoding='utf-8') as f:
+        f.write("# 旧文件名\t新文件名\n")
+        for old_name, new_name in plan:
+            f.write(f"{old_name}\t{new_name}\n")
+
+def read_plan(plan_file):
+    """读取TSV格式的重命名计划"""
+    plan = []
+    with open(plan_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if not line or line.startswith('#'):
+                continue
+            old_name, new_name = line.split('\t')
+            plan.append((old_name, new_name))
+    return plan
+
+def journal_record(batch, old_name, new_name, final=True):
+    """撤销日志中的一条记录；final 为 False 表示文件暂时位于 new_name（临时名，或改回了原名）"""
+    record = {'batch': batch, 'old': old_name, 'new': new_name}
+    if not final:
+        record['final'] = False
+    return json.dumps(record, ensure_ascii=False) + '\n'
+
+def apply_plan(dir_path, plan, catalog=None):
+    """批量执行重命名计划并写入撤销日志（有索引时同步更新），返回成功数
+
+    先把所有源文件改成临时名，再改成目标名，避免计划内部的名字互相占用。
+    临时名在第二阶段开始前写入日志，中途出错或中断时撤销也能找回文件；
+    改成目标名失败（或目标已被占用）的文件改回原名
+    """
+    dir_path = Path(dir_path)
+    sources = {old_name for old_name, _ in plan}
+    targets = [new_name for _, new_name in plan]
+    if len(set(targets)) != len(targets):
+        raise ValueError("计划中存在重复的目标文件名")
+    for new_name in targets:
+        if new_name not in sources and (dir_path / new_name).exists():
+            raise ValueError(f"目标文件已存在: {new_name}")
+
+    batch = f"{time.time():.6f}"
+    staged = []
+    success_count = 0
+    with open(dir_path / JOURNAL_NAME, 'a', encoding='utf-8') as journal:
+        for i, (old_name, new_name) in enumerate(plan):
+            temp_name = f".rename_{os.getpid()}_{i}.tmp"
+            try:
+                os.rename(dir_path / old_name, dir_path / temp_name)
+            except OSError as e:
+                print(f"     ❌ 重命名失败: {old_name} - {e}")
+                continue
+            journal.write(journal_record(batch, old_name, temp_name, final=False))
+            staged.append((old_name, new_name, temp_name))
+        journal.flush()
+        os.fsync(journal.fileno())
+
+        for old_name, new_name, temp_name in staged:
+            try:
+                # 源文件未能改成临时名、或其他文件改回了原名时，目标仍被占用，不能覆盖
+                if os.path.lexists(dir_path / new_name):
+                    raise FileExistsError(f"目标文件已存在: {new_name}")
+                os.rename(dir_path / temp_name, dir_path / new_name)
+            except OSError as e:
+                print(f"     ❌ 重命名失败: {old_name} - {e}")
+                if os.path.lexists(dir_path / old_name):
+                    print(f"     ⚠️ 原文件名已被占用，文件保留为: {temp_name}")
+                    continue
+                try:
+                    os.rename(dir_path / temp_name, dir_path / old_name)
+                except OSError as e:
+                    print(f"     ⚠️ 无法改回原文件名，文件保留为: {temp_name} - {e}")
+                    continue
+                journal.write(journal_record(batch, old_name, old_name, final=False))
+                continue
+            if catalog is not None:
+                catalog.rename(dir_path / old_name, dir_path / new_name)
+            journal.write(journal_record(batch, old_name, new_name))
+            success_count += 1
+    return success_count
+
+def undo_last_batch(dir_path, catalog=None):
+    """撤销最近一次批量重命名，返回恢复的文件数"""
+    dir_path = Path(dir_path)
+    records = load_journal(dir_path)
+    if not records:
+        return 0
+    batch = records[-1]['batch']
+    # 每个文件以该批次中最后一条记录为准（可能仍在临时名下）
+    locations = {}
+    for record in records:
+        if record['batch'] == batch:
+            locations[record['old']] = record['new']
+    undo_plan = [(new_name, old_name) for old_name, new_name in locations.items() if new_name != old_name]
+    remaining = [record for record in records if record['batch'] != batch]
+
+    # 撤销本身不记入日志：恢复后从日志中移除该批次
+    journal_path = dir_path / JOURNAL_NAME
+    restored = apply_plan(dir_path, undo_plan, catalog)
+    with open(journal_path, 'w', encoding='utf-8') as f:
+        for record in remaining:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+    return restored
+
+def list_mp3_names(dir_path, catalog=None):
+    """列出所有MP3文件名：有索引时直接查询，否则一次目录遍历"""
+    if catalog is not None:
+        return [row['name'] for row in catalog.files('mp3', directory='')]
+    with os.scandir(dir_path) as it:
+        return [entry.name for entry in it if entry.name.lower().endswith('.mp3') and entry.is_file()]
+
+def rename_mp3_files(directory="./downloads", rules=None, dry_run=False, plan_file=None):
     """重命名指定目录中的MP3文件"""
     print("=== MP3文件重命名工具 ===")
     print("去掉文件名中与歌曲名无关的部分，只保留歌曲名称\n")
-    
+
     # 检查目录是否存在
     dir_path = Path(directory)
     if not dir_path.exists():
         print(f"❌ 目录不存在: {directory}")
         return
-    
+
     # 查找MP3文件
-    mp3_files = list(dir_path.glob("*.mp3"))
-    if not mp3_files:
+    catalog = open_catalog(dir_path)
+    mp3_names = list_mp3_names(dir_path, catalog)
+    if not mp3_names:
         print(f"❌ 在 {directory} 目录中未找到MP3文件")
         return
-    
-    print(f"📁 找到 {len(mp3_files)} 个MP3文件")
-    print("\n开始重命名...\n")
-    
-    success_count = 0
-    for i, mp3_file in enumerate(mp3_files, 1):
-        old_name = mp3_file.name
-        
-        # 提取歌曲名称
-        song_name = extract_song_name(old_name)
-        
-        # 清理文件名
-        clean_song_name = clean_filename(song_name)
-        
-        # 生成新文件名
-        new_name = f"{clean_song_name}.mp3"
-        new_path = mp3_file.parent / new_name
-        
-        print(f"[{i:2d}/{len(mp3_files)}] {old_name}")
+
+    print(f"📁 找到 {len(mp3_names)} 个MP3文件")
+
+    # 上次重命名的结果保持不变，重复运行结果稳定
+    already_renamed = {record['new'] for record in load_journal(dir_path) if record.get('final', True)}
+    plan = build_rename_plan(mp3_names, rules, exclude=already_renamed)
+    unchanged = len(mp3_names) - len(plan)
+
+    for i, (old_name, new_name) in enumerate(plan, 1):
+        print(f"[{i:2d}/{len(plan)}] {old_name}")
         print(f"     -> {new_name}")
-        
-        # 检查新文件名是否已存在
-        if new_path.exists() and new_path != mp3_file:
-            print(f"     ⚠️ 目标文件已存在，跳过")
-            continue
-        
-        # 如果新旧文件名相同，跳过
-        if old_name == new_name:
-            print(f"     ✓ 文件名已是最佳格式，无需修改")
-            success_count += 1
-            continue
-        
-        try:
-            # 重命名文件
-            mp3_file.rename(new_path)
-            print(f"     ✓ 重命名成功")
-            success_count += 1
-        except Exception as e:
-            print(f"     ❌ 重命名失败: {e}")
-        
-        print()
-    
+    print(f"\n📋 计划重命名 {len(plan)} 个文件，{unchanged} 个无需修改")
+
+    if dry_run:
+        plan_file = plan_file or str(dir_path / 'rename_plan.tsv')
+        write_plan(plan, plan_file)
+        print(f"📝 重命名计划已保存: {plan_file}")
+        print(f"   检查后执行: python rename_mp3.py {directory} --apply {plan_file}")
+        return
+
+    success_count = apply_plan(dir_path, plan, catalog)
+
     print(f"🎉 重命名完成！")
-    print(f"📊 成功处理: {success_count}/{len(mp3_files)} 个文件")
-    
+    print(f"📊 成功处理: {success_count + unchanged}/{len(mp3_names)} 个文件")
+    print(f"↩️ 可撤销: python rename_mp3.py {directory} --undo")
+
     # 显示重命名后的文件列表
+    if catalog is not None:
+        rows = catalog.files('mp3', directory='')
+        print(f"\n📁 重命名后的MP3文件列表 ({len(rows)} 个):")
+        print_files(rows)
+        catalog.close()
+        return
     updated_files = list(dir_path.glob("*.mp3"))
     if updated_files:
         print(f"\n📁 重命名后的MP3文件列表 ({len(updated_files)} 个):")
@@ -142,15 +303,34 @@ def rename_mp3_files(directory="./downloads"):
 
 def main():
     """主函数"""
-    import sys
-    
-    # 检查命令行参数
-    if len(sys.argv) > 1:
-        directory = sys.argv[1]
-    else:
-        directory = "./downloads"
-    
-    rename_mp3_files(directory)
+    import argparse
+
+    parser = argparse.ArgumentParser(description='MP3文件重命名工具')
+    parser.add_argument('directory', nargs='?', default='./downloads', help='MP3文件目录')
+    parser.add_argument('--rules', help='自定义规则表（JSON）')
+    parser.add_argument('--dry-run', action='store_true', help='只生成重命名计划，不执行')
+    parser.add_argument('-o', '--plan-file', help='dry-run 时计划文件的保存路径')
+    parser.add_argument('--apply', metavar='PLAN', help='执行已检查过的重命名计划文件')
+    parser.add_argument('--undo', action='store_true', help='撤销最近一次重命名')
+    args = parser.parse_args()
+
+    if args.undo:
+        restored = undo_last_batch(args.directory, open_catalog(args.directory, scan=False))
+        print(f"↩️ 已恢复 {restored} 个文件")
+        return
+
+    if args.apply:
+        plan = read_plan(args.apply)
+        try:
+            success_count = apply_plan(args.directory, plan, open_catalog(args.directory, scan=False))
+        except ValueError as e:
+            print(f"❌ 计划无法执行: {e}")
+            return
+        print(f"🎉 已按计划重命名 {success_count}/{len(plan)} 个文件")
+        return
+
+    rules = RenameRules.from_file(args.rules) if args.rules else None
+    rename_mp3_files(args.directory, rules, args.dry_run, args.plan_file)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
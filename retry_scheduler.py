@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按错误类型重试的调度队列
+下载失败时先把错误分类（限流 / 网络 / 地区或权限 / 不存在），按类型的退避策略（带随机抖动）
+计算下次可以重试的时间，把条目放回队列末尾，工作线程立即去处理下一个条目，不在原地等待；
+持续限流时熔断器打开，所有工作线程暂停领取新条目，冷却后先放行一个探测请求
+"""
+
+import re
+import time
+import heapq
+import random
+import threading
+from typing import Dict, Optional, Tuple
+
+ERROR_CLASSES = ('throttled', 'network', 'forbidden', 'not_found', 'other')
+
+# 按顺序匹配，第一个命中的类型生效。只匹配 yt-dlp 的 HTTP 错误（"HTTP Error 412: Precondition Failed"）、
+# yt-dlp B站提取器的报错和B站接口返回的 code / message，不匹配泛泛的单词
+ERROR_PATTERNS = (
+    ('throttled', re.compile(
+        r'HTTP Error (?:412|429)\b|'
+        r'Unable to download video info: (?:412|352)\b|'
+        r'(?:blocked|rejected) by server \((?:412|352)\)|'
+        r'Request failed \((?:-412|-352|-509|-799)\)|'
+        r'exceeded the rate limit|请求过于频繁')),
+    ('not_found', re.compile(
+        r'HTTP Error (?:404|410)\b|'
+        r'Unable to download video info: (?:404|62002|62004)\b|'
+        r'This video may be deleted|Playlist is no longer available|视频不见了|啥都木有')),
+    ('forbidden', re.compile(
+        r'HTTP Error (?:401|403|451)\b|'
+        r'not available from your location|This video is restricted|'
+        r'only available for registered users|for premium members only|become a premium member|'
+        r'supporter-only video|You need to (?:log ?in|purchase)|'
+        r'Unable to download video info: (?:403|10403)\b|大会员专享|仅限[^，。,.]*地区')),
+    ('network', re.compile(
+        r'HTTP Error 5\d\d\b|'
+        r'timed out|Connection (?:refused|reset|aborted|broken)|reset by peer|IncompleteRead|'
+        r'\d+ bytes read, \d+ more expected|Downloaded \d+ bytes, expected \d+ bytes|'
+        r'Did not get any data blocks|Remote end closed connection|'
+        r'Temporary failure in name resolution|Name or service not known|\[SSL(?:: \w+)?\]|SSLError')),
+)
+
+def classify_error(error) -> str:
+    """返回错误类型（ERROR_CLASSES 之一）"""
+    message = str(error)
+    for error_class, pattern in ERROR_PATTERNS:
+        if pattern.search(message):
+            return error_class
+    return 'other'
+
+class RetryPolicy:
+    """一种错误类型的重试次数和指数退避（full jitter）"""
+
+    def __init__(self, max_retries: int = 0, base_delay: float = 1.0, max_delay: float = 60.0,
+                 multiplier: float = 2.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+
+    def delay(self, attempt: int, rng: random.Random) -> float:
+        """第 attempt 次重试前的等待时间：在 [0, min(上限, 基数 × 倍数^(attempt-1))] 内随机"""
+        ceiling = min(self.max_delay, self.base_delay * self.multiplier ** max(attempt - 1, 0))
+        return rng.uniform(0, ceiling)
+
+DEFAULT_POLICIES = {
+    'throttled': RetryPolicy(max_retries=6, base_delay=10, max_delay=300),
+    'network': RetryPolicy(max_retries=4, base_delay=2, max_delay=60),
+    'forbidden': RetryPolicy(max_retries=0),
+    'not_found': RetryPolicy(max_retries=0),
+    'other': RetryPolicy(max_retries=1, base_delay=5, max_delay=30),
+}
+
+class CircuitBreaker:
+    """限流熔断器（线程安全）
+
+    window 秒内累计 threshold 次限流即打开，cooldown 秒内拒绝所有新请求；
+    冷却结束后半开，只放行一个探测请求：成功则关闭，再次限流则冷却时间加倍（不超过 max_cooldown）
+    """
+
+    def __init__(self, threshold: int = 5, window: float = 30, cooldown: float = 60, max_cooldown: float = 600):
+        self.threshold = threshold
+        self.window = window
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.cooldown = cooldown
+        self.state = 'closed'
+        self.opened_until = 0.0
+        self.trips = 0
+        self._events = []
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def wait_time(self, now: float = None) -> float:
+        """距离可以发出请求还需等待的秒数，0 表示可以立即开始（半开时占用探测名额）"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if self.state == 'closed':
+                return 0.0
+            if self.state == 'open':
+                if now < self.opened_until:
+                    return self.opened_until - now
+                self.state = 'half_open'
+                self._probe_in_flight = False
+            if self._probe_in_flight:
+                # 等待探测结果
+                return 1.0
+            self._probe_in_flight = True
+            return 0.0
+
+    def record_success(self):
+        with self._lock:
+            if self.state == 'half_open':
+                self.state = 'closed'
+                self.cooldown = self.base_cooldown
+                self._events.clear()
+
+    def record_throttle(self, now: float = None) -> bool:
+        """记录一次限流，返回熔断器是否因此打开"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if self.state == 'half_open':
+                self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+                return self._open(now)
+            if self.state == 'open':
+                return False
+            self._events = [t for t in self._events if now - t <= self.window]
+            self._events.append(now)
+            if len(self._events) >= self.threshold:
+                return self._open(now)
+            return False
+
+    def record_failure(self):
+        """非限流的失败：半开时释放探测名额"""
+        with self._lock:
+            if self.state == 'half_open':
+                self._probe_in_flight = False
+
+    def _open(self, now: float) -> bool:
+        self.state = 'open'
+        self.opened_until = now + self.cooldown
+        self.trips += 1
+        self._events.clear()
+        return True
+
+class RetryScheduler:
+    """带重试时间的条目队列（线程安全）
+
+    next() 取出已到重试时间的条目（熔断时阻塞），处理结果用 succeed() / fail() 报告；
+    所有条目都完成或放弃后 next() 返回 None
+    """
+
+    def __init__(self, policies: Dict[str, RetryPolicy] = None, breaker: CircuitBreaker = None,
+                 seed: int = None):
+        self.policies = dict(DEFAULT_POLICIES, **(policies or {}))
+        self.breaker = breaker
+        self.rng = random.Random(seed)
+        self._heap = []
+        self._sequence = 0
+        self._in_flight = 0
+        self._attempts: Dict[object, int] = {}
+        self._condition = threading.Condition()
+        self._closed = False
+        self.stats = {'retries': 0, 'gave_up': 0, 'breaker_trips': 0,
+                      **{f'errors_{error_class}': 0 for error_class in ERROR_CLASSES}}
+
+    @classmethod
+    def from_config(cls, config: Dict, seed: int = None) -> 'RetryScheduler':
+        """从配置构建，例如:
+        {"throttled": {"max_retries": 6, "base_delay": 10, "max_delay": 300},
+         "circuit_breaker": {"threshold": 5, "window": 30, "cooldown": 60}}
+        """
+        policies = {}
+        for error_class in ERROR_CLASSES:
+            if error_class in config:
+                default = DEFAULT_POLICIES[error_class]
+                options = config[error_class]
+                policies[error_class] = RetryPolicy(
+                    max_retries=options.get('max_retries', default.max_retries),
+                    base_delay=options.get('base_delay', default.base_delay),
+                    max_delay=options.get('max_delay', default.max_delay),
+                    multiplier=options.get('multiplier', default.multiplier)
+                )
+        breaker_config = config.get('circuit_breaker', {})
+        breaker = None
+        if breaker_config.get('enabled', True):
+            breaker = CircuitBreaker(
+                threshold=breaker_config.get('threshold', 5),
+                window=breaker_config.get('window', 30),
+                cooldown=breaker_config.get('cooldown', 60),
+                max_cooldown=breaker_config.get('max_cooldown', 600)
+            )
+        return cls(policies, breaker, seed)
+
+    def add(self, item, delay: float = 0):
+        with self._condition:
+            self._push(item, time.monotonic() + delay)
+            self._condition.notify()
+
+    def _push(self, item, ready_at: float):
+        self._sequence += 1
+        heapq.heappush(self._heap, (ready_at, self._sequence, item))
+
+    def next(self) -> Optional[object]:
+        """阻塞直到有条目到达重试时间且熔断器允许，全部结束时返回 None"""
+        with self._condition:
+            while True:
+                if self._closed or (not self._heap and self._in_flight == 0):
+                    self._condition.notify_all()
+                    return None
+                now = time.monotonic()
+                if not self._heap or self._heap[0][0] > now:
+                    timeout = self._heap[0][0] - now if self._heap else None
+                    self._condition.wait(timeout)
+                    continue
+                wait = self.breaker.wait_time(now) if self.breaker is not None else 0
+                if wait > 0:
+                    self._condition.wait(wait)
+                    continue
+                _, _, item = heapq.heappop(self._heap)
+                self._in_flight += 1
+                return item
+
+    def succeed(self, item):
+        if self.breaker is not None:
+            self.breaker.record_success()
+        with self._condition:
+            self._in_flight -= 1
+            self._attempts.pop(item, None)
+            self._condition.notify_all()
+
+    def fail(self, item, error) -> Tuple[str, Optional[float]]:
+        """报告失败，返回 (错误类型, 重试前等待秒数)；不再重试时等待秒数为 None"""
+        error_class = classify_error(error)
+        tripped = False
+        if self.breaker is not None:
+            if error_class == 'throttled':
+                tripped = self.breaker.record_throttle()
+            else:
+                self.breaker.record_failure()
+        with self._condition:
+            self._in_flight -= 1
+            self.stats[f'errors_{error_class}'] += 1
+            if tripped:
+                self.stats['breaker_trips'] += 1
+            attempt = self._attempts.get(item, 0) + 1
+            policy = self.policies[error_class]
+            if attempt > policy.max_retries:
+                self._attempts.pop(item, None)
+                self.stats['gave_up'] += 1
+                self._condition.notify_all()
+                return error_class, None
+            self._attempts[item] = attempt
+            delay = policy.delay(attempt, self.rng)
+            # 放回队列末尾：到达重试时间前不会被取出
+            self._push(item, time.monotonic() + delay)
+            self.stats['retries'] += 1
+            self._condition.notify_all()
+            return error_class, delay
+
+    def attempts(self, item) -> int:
+        with self._condition:
+            return self._attempts.get(item, 0)
+
+    def pending(self) -> int:
+        with self._condition:
+            return len(self._heap)
+
+    def deferred(self) -> int:
+        """尚未到重试时间的条目数"""
+        now = time.monotonic()
+        with self._condition:
+            return sum(1 for ready_at, _, _ in self._heap if ready_at > now)
+
+    def breaker_remaining(self) -> float:
+        """熔断剩余秒数（未熔断时为 0）"""
+        if self.breaker is None or self.breaker.state != 'open':
+            return 0.0
+        return max(self.breaker.opened_until - time.monotonic(), 0.0)
+
+    def close(self):
+        """停止调度，next() 立即返回 None"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
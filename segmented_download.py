@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分段下载
+B站CDN对单个连接限速，长音频（演唱会录音、两小时混音）单连接下载很慢。
+将单个音频流按 HTTP Range 切成若干段，多个连接并行写入预分配的文件，
+每段独立重试（从该段已写入的位置续传），最后校验总长度。
+分段请求经由 YoutubeDL.urlopen 发出，与 yt-dlp 的普通下载共用 Cookie、代理和 source_address 设置。
+已写入的区间记录在 .part.ranges 中，中断后再次下载只请求缺失的区间；
+yt-dlp 普通下载留下的 .part（从头连续写入）同样从已下载的字节处续传
+"""
+
+import os
+import re
+import json
+import time
+import threading
+import concurrent.futures
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import yt_dlp
+from yt_dlp.networking import Request
+from yt_dlp.networking.exceptions import RequestError
+
+from rate_limiter import RateLimitMixin
+
+CONTENT_RANGE_PATTERN = re.compile(r'bytes\s+(\d+)-(\d+)/(\d+|\*)')
+
+class SegmentedDownloadError(Exception):
+    """分段下载失败"""
+
+class RangeNotSupported(SegmentedDownloadError):
+    """服务器不支持 Range 请求或未返回总长度，应回退为普通下载"""
+
+def plan_segments(length: int, segments: int, min_segment_size: int,
+                  missing: List[Tuple[int, int]] = None) -> List[Tuple[int, int]]:
+    """把缺失的区间（半开区间，默认整个 [0, length)）切成约 segments 段，每段不小于 min_segment_size，
+    返回闭区间列表
+    """
+    missing = [(0, length)] if missing is None else missing
+    total = sum(end - start for start, end in missing)
+    count = max(1, min(segments, total // max(min_segment_size, 1)))
+    size = max(-(-total // count), 1)
+    return [(start, min(start + size, end) - 1) for begin, end in missing for start in range(begin, end, size)]
+
+def merge_ranges(ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """合并重叠或相接的半开区间"""
+    merged = []
+    for start, end in sorted(r for r in ranges if r[1] > r[0]):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+def missing_ranges(length: int, done: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """[0, length) 中不在 done 里的半开区间"""
+    missing = []
+    position = 0
+    for start, end in merge_ranges(done):
+        if start > position:
+            missing.append((position, start))
+        position = max(position, end)
+    if position < length:
+        missing.append((position, length))
+    return missing
+
+def preallocate(path: Path, length: int):
+    """创建指定长度的文件，支持时直接分配磁盘空间"""
+    with open(path, 'wb') as f:
+        if hasattr(os, 'posix_fallocate') and length:
+            try:
+                os.posix_fallocate(f.fileno(), 0, length)
+                return
+            except OSError:
+                pass
+        f.truncate(length)
+
+class SegmentedDownloader:
+    """多连接 Range 下载器（连接池在多次下载间复用）
+
+    请求由 urlopen 发出（通常是 YoutubeDL.urlopen，沿用其 Cookie、代理和 source_address）；
+    未提供时内部创建一个 YoutubeDL 实例。urlopen 已自行计入限速器的请求数时 limit_requests 为 False
+    """
+
+    def __init__(self, segments: int = 4, min_segment_size: int = 4 * 1024 * 1024, chunk_retries: int = 3,
+                 timeout: float = 30, chunk_size: int = 256 * 1024, proxy: str = None, rate_limiter=None,
+                 urlopen: Callable = None, limit_requests: bool = True):
+        self.segments = segments
+        self.min_segment_size = min_segment_size
+        self.chunk_retries = chunk_retries
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        # 可选的全局限速器（rate_limiter.RateLimiter），每个分段请求和数据块都计入
+        self.rate_limiter = rate_limiter
+        self.limit_requests = limit_requests
+        self._ydl = None
+        if urlopen is None:
+            self._ydl = yt_dlp.YoutubeDL({'quiet': True, 'no_warnings': True, 'proxy': proxy,
+                                          'socket_timeout': timeout})
+            urlopen = self._ydl.urlopen
+        self.urlopen = urlopen
+
+    def open_range(self, url: str, headers: Dict, start: int, end: int):
+        """请求 [start, end] 区间，返回 yt-dlp 的响应对象"""
+        # 与 yt-dlp 的 HTTP 下载器一致：不接受压缩，字节偏移才与文件对应
+        request_headers = {'Accept-Encoding': 'identity', **headers, 'Range': f'bytes={start}-{end}'}
+        if self.rate_limiter is not None and self.limit_requests:
+            self.rate_limiter.before_request(url)
+        return self.urlopen(Request(url, headers=request_headers, extensions={'timeout': self.timeout}))
+
+    def probe_length(self, url: str, headers: Dict = None) -> int:
+        """用 bytes=0-0 请求确认服务器支持 Range 并取得总长度"""
+        try:
+            with self.open_range(url, headers or {}, 0, 0) as response:
+                status = response.status
+                match = CONTENT_RANGE_PATTERN.match(response.get_header('Content-Range', ''))
+        except RequestError as e:
+            raise SegmentedDownloadError(f"探测失败: {e}") from e
+        if status != 206 or not match or match.group(3) == '*':
+            raise RangeNotSupported("服务器不支持 Range 请求")
+        return int(match.group(3))
+
+    def load_progress(self, temp_path: Path, length: int, resume: bool = True) -> List[Tuple[int, int]]:
+        """准备 .part 文件，返回其中已写入的区间（半开区间）
+
+        .part.ranges 记录的总长度一致时沿用其中的区间；没有记录而 .part 短于总长度时，
+        视为 yt-dlp 普通下载从头连续写入的部分；其他情况重新预分配
+        """
+        ranges_path = temp_path.with_name(temp_path.name + '.ranges')
+        size = temp_path.stat().st_size if temp_path.exists() else None
+        done = []
+        if resume and size is not None:
+            try:
+                with open(ranges_path, 'r', encoding='utf-8') as f:
+                    progress = json.load(f)
+                if progress.get('length') == length and size == length:
+                    done = merge_ranges([(start, end) for start, end in progress.get('done', [])])
+            except (OSError, ValueError):
+                if 0 < size < length:
+                    done = [(0, size)]
+                    with open(temp_path, 'r+b') as f:
+                        f.truncate(length)
+        if not done:
+            preallocate(temp_path, length)
+        return done
+
+    def save_progress(self, temp_path: Path, length: int, done: List[Tuple[int, int]]):
+        """原子写入 .part.ranges"""
+        ranges_path = temp_path.with_name(temp_path.name + '.ranges')
+        temp_ranges = ranges_path.with_name(ranges_path.name + '.tmp')
+        with open(temp_ranges, 'w', encoding='utf-8') as f:
+            json.dump({'length': length, 'done': merge_ranges(done)}, f)
+        os.replace(temp_ranges, ranges_path)
+
+    def release_progress(self, temp_path: Path):
+        """回退为 yt-dlp 普通下载前调用：.part 截断到从头连续写入的部分并删除区间记录，
+        避免 yt-dlp 把预分配到完整长度的 .part 当作已下载完成
+        """
+        ranges_path = temp_path.with_name(temp_path.name + '.ranges')
+        try:
+            with open(ranges_path, 'r', encoding='utf-8') as f:
+                done = merge_ranges([(start, end) for start, end in json.load(f).get('done', [])])
+        except (OSError, ValueError):
+            return
+        prefix = done[0][1] if done and done[0][0] == 0 else 0
+        try:
+            with open(temp_path, 'r+b') as f:
+                f.truncate(prefix)
+        except OSError:
+            pass
+        ranges_path.unlink(missing_ok=True)
+
+    def fetch_segment(self, url: str, headers: Dict, path: Path, start: int, end: int,
+                      counter: List[int], lock: threading.Lock, abort: threading.Event,
+                      progress: Dict[int, int] = None) -> int:
+        """下载 [start, end] 写入文件对应位置，失败时从已写入处重试；abort 置位时提前退出
+
+        progress[start] 记录已刷新到文件的位置（每个数据块写入后更新），供记录续传区间
+        """
+        position = start
+        attempts = 0
+        with open(path, 'r+b') as f:
+            while position <= end:
+                try:
+                    with self.open_range(url, headers, position, end) as response:
+                        if response.status != 206:
+                            raise SegmentedDownloadError(f"分段请求返回 HTTP {response.status}")
+                        f.seek(position)
+                        for chunk in iter(lambda: response.read(self.chunk_size), b''):
+                            chunk = chunk[:end + 1 - position]
+                            f.write(chunk)
+                            f.flush()
+                            position += len(chunk)
+                            with lock:
+                                counter[0] += len(chunk)
+                                if progress is not None:
+                                    progress[start] = position
+                            if self.rate_limiter is not None:
+                                self.rate_limiter.consume_bytes(url, len(chunk))
+                            if position > end or abort.is_set():
+                                break
+                    if abort.is_set():
+                        raise SegmentedDownloadError("已取消")
+                    if position <= end:
+                        raise SegmentedDownloadError(f"分段 {start}-{end} 提前结束于 {position}")
+                except (RequestError, SegmentedDownloadError) as e:
+                    if abort.is_set():
+                        raise
+                    attempts += 1
+                    if attempts > self.chunk_retries:
+                        raise SegmentedDownloadError(f"分段 {start}-{end} 重试 {self.chunk_retries} 次后失败: {e}") from e
+                    time.sleep(min(2 ** (attempts - 1), 8) * 0.5)
+        return position - start
+
+    def download(self, url: str, output, headers: Dict = None, length: int = None,
+                 progress_callback: Optional[Callable[[int, int], None]] = None, resume: bool = True) -> int:
+        """下载到 output，返回字节数
+
+        先写入同目录的 .part 临时文件，校验长度后再移动到最终位置；失败或中断时保留 .part 和已写入的区间，
+        resume 为 True 时下次只下载缺失的区间。progress_callback(downloaded, total) 只在调用线程中触发
+        """
+        output = Path(output)
+        headers = headers or {}
+        if length is None:
+            length = self.probe_length(url, headers)
+        temp_path = output.with_name(output.name + '.part')
+        previous = self.load_progress(temp_path, length, resume)
+
+        ranges = plan_segments(length, self.segments, self.min_segment_size, missing_ranges(length, previous))
+        counter = [sum(end - start for start, end in previous)]
+        progress = {start: start for start, _ in ranges}
+        lock = threading.Lock()
+        abort = threading.Event()
+
+        def written_ranges():
+            with lock:
+                return previous + [(start, position) for start, position in progress.items()]
+
+        try:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=min(len(ranges), self.segments) or 1) as executor:
+                futures = [
+                    executor.submit(self.fetch_segment, url, headers, temp_path, start, end, counter, lock, abort,
+                                    progress)
+                    for start, end in ranges
+                ]
+                pending = set(futures)
+                while pending:
+                    done, pending = concurrent.futures.wait(
+                        pending, timeout=0.5, return_when=concurrent.futures.FIRST_EXCEPTION)
+                    if progress_callback is not None:
+                        progress_callback(counter[0], length)
+                    self.save_progress(temp_path, length, written_ranges())
+                    for future in done:
+                        if future.exception() is not None:
+                            # 其他分段尽快停止，不再占用连接
+                            abort.set()
+                            raise future.exception()
+        except BaseException:
+            # 保留 .part 和已写入的区间，下次续传
+            try:
+                self.save_progress(temp_path, length, written_ranges())
+            except OSError:
+                pass
+            raise
+
+        # 校验总长度
+        if missing_ranges(length, written_ranges()) or temp_path.stat().st_size != length:
+            temp_path.unlink(missing_ok=True)
+            temp_path.with_name(temp_path.name + '.ranges').unlink(missing_ok=True)
+            raise SegmentedDownloadError(f"长度校验失败: 期望 {length}，实际写入 {counter[0]}")
+        os.replace(temp_path, output)
+        temp_path.with_name(temp_path.name + '.ranges').unlink(missing_ok=True)
+        return length
+
+    def close(self):
+        if self._ydl is not None:
+            self._ydl.close()
+
+class SegmentedYoutubeDL(yt_dlp.YoutubeDL):
+    """对单文件 HTTP 音频流改用分段下载的 YoutubeDL
+
+    参数取自 params['segmented_download']，其余流程（后处理、钩子、归档）不变；
+    流过小、协议不适用或服务器不支持 Range 时回退为 yt-dlp 的普通下载
+    """
+
+    def __init__(self, params=None, *args, **kwargs):
+        super().__init__(params, *args, **kwargs)
+        options = self.params.get('segmented_download') or {}
+        self.segmented = SegmentedDownloader(
+            segments=options.get('segments', 4),
+            min_segment_size=options.get('min_segment_size', 4 * 1024 * 1024),
+            chunk_retries=options.get('chunk_retries', 3),
+            timeout=self.params.get('socket_timeout') or 30,
+            rate_limiter=self.params.get('rate_limiter'),
+            # 分段请求与普通下载一样经过 yt-dlp 的请求处理（Cookie、代理、source_address）
+            urlopen=self.urlopen,
+            # 带限速的子类在 urlopen 中已计入请求数
+            limit_requests=not isinstance(self, RateLimitMixin)
+        )
+
+    def is_segmentable(self, name: str, info: Dict) -> bool:
+        if name == '-' or info.get('requested_formats'):
+            return False
+        if info.get('protocol', 'https') not in ('http', 'https'):
+            return False
+        size = info.get('filesize') or info.get('filesize_approx')
+        # 大小未知时先探测，由探测结果决定
+        return size is None or size >= self.segmented.min_segment_size * 2
+
+    def dl(self, name, info, subtitle=False, test=False):
+        if test or subtitle or not self.is_segmentable(name, info):
+            if not (test or subtitle):
+                self.segmented.release_progress(Path(name + '.part'))
+            return super().dl(name, info, subtitle, test)
+
+        headers = info.get('http_headers') or {}
+        try:
+            length = self.segmented.probe_length(info['url'], headers)
+        except SegmentedDownloadError as e:
+            self.write_debug(f'分段下载不可用，回退为普通下载: {e}')
+            self.segmented.release_progress(Path(name + '.part'))
+            return super().dl(name, info, subtitle, test)
+        if length < self.segmented.min_segment_size * 2:
+            self.segmented.release_progress(Path(name + '.part'))
+            return super().dl(name, info, subtitle, test)
+
+        if os.path.exists(name) and os.path.getsize(name) == length:
+            self._report_progress(name, info, length, length, 'finished')
+            return True, False
+
+        self.to_screen(f'[segmented] {name}: {length} bytes, '
+                       f'{len(plan_segments(length, self.segmented.segments, self.segmented.min_segment_size))} 段')
+        start = time.monotonic()
+
+        def progress_callback(downloaded, total):
+            self._report_progress(name, info, downloaded, total, 'downloading', time.monotonic() - start)
+
+        try:
+            self.segmented.download(info['url'], name, headers, length, progress_callback,
+                                    resume=self.params.get('continuedl', True))
+        except SegmentedDownloadError as e:
+            self.report_error(f'分段下载失败: {e}')
+            return False, False
+        self._report_progress(name, info, length, length, 'finished', time.monotonic() - start)
+        return True, True
+
+    def _report_progress(self, name, info, downloaded, total, status, elapsed=None):
+        status_dict = {
+            'status': status,
+            'filename': name,
+            'downloaded_bytes': downloaded,
+            'total_bytes': total,
+            'info_dict': info,
+            # 字节数已在分段线程中计入限速器
+            'rate_limited': True,
+        }
+        if elapsed is not None:
+            status_dict['elapsed'] = elapsed
+            status_dict['speed'] = downloaded / elapsed if elapsed > 0 else None
+        for hook in self._progress_hooks:
+            hook(status_dict)
+
+    def close(self):
+        self.segmented.close()
+        super().close()
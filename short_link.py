@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+b23.tv 短链接解析
+使用带连接池的 requests.Session（有超时）逐跳读取重定向地址，不请求B站主站页面；
+解析结果规范化后写入本地 SQLite 缓存，同一个短链接只解析一次。
+一批短链接并发解析；URL 中已包含 BV 号时无需任何网络请求
+"""
+
+import re
+import sys
+import time
+import sqlite3
+import threading
+import concurrent.futures
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+from urllib.parse import parse_qs, urljoin, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from download_archive import BV_PATTERN
+
+SHORT_LINK_PATTERN = re.compile(r'^(?:https?://)?(?:www\.)?(?:b23\.tv|bili2233\.cn)/([0-9A-Za-z]+)')
+MAX_REDIRECTS = 5
+
+class ShortLinkError(Exception):
+    """短链接无法解析"""
+
+def is_short_link(url: str) -> bool:
+    return SHORT_LINK_PATTERN.match(url.strip()) is not None
+
+def canonical_url(url: str) -> str:
+    """视频地址去掉分享参数，只保留 BV 号和分P"""
+    parsed = urlparse(url)
+    match = BV_PATTERN.search(parsed.path)
+    if not parsed.netloc.endswith('bilibili.com') or not match:
+        return url
+    page = parse_qs(parsed.query).get('p', [None])[0]
+    canonical = f'https://www.bilibili.com/video/{match.group(1)}'
+    if page and page != '1':
+        canonical += f'?p={page}'
+    return canonical
+
+class ShortLinkCache:
+    """短链接 → 规范地址的持久化缓存（线程安全）"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS short_links (
+            code TEXT PRIMARY KEY,
+            url TEXT NOT NULL,
+            resolved_at REAL NOT NULL
+        )
+    """
+
+    def __init__(self, db_path, ttl: float = 30 * 86400):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        with self._conn:
+            self._conn.execute(self.SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def get(self, code: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT url, resolved_at FROM short_links WHERE code=?", (code,)).fetchone()
+        if row is None or (self.ttl and time.time() - row[1] > self.ttl):
+            return None
+        return row[0]
+
+    def put(self, code: str, url: str):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO short_links (code, url, resolved_at) VALUES (?, ?, ?)",
+                               (code, url, time.time()))
+
+class ShortLinkResolver:
+    """带缓存和连接池的短链接解析器"""
+
+    def __init__(self, cache_path=None, ttl: float = 30 * 86400, timeout: float = 10, max_workers: int = 8,
+                 proxy: str = None, user_agent: str = None, rate_limiter=None):
+        self.cache = ShortLinkCache(cache_path, ttl) if cache_path else None
+        self.timeout = timeout
+        self.max_workers = max_workers
+        # 可选的全局限速器（rate_limiter.RateLimiter），b23.tv 属于 api 主机类
+        self.rate_limiter = rate_limiter
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=max(max_workers, 1))
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if proxy:
+            self.session.proxies = {'http': proxy, 'https': proxy}
+        if user_agent:
+            self.session.headers['User-Agent'] = user_agent
+        self.stats = {'cached': 0, 'resolved': 0, 'failed': 0}
+
+    def close(self):
+        self.session.close()
+        if self.cache is not None:
+            self.cache.close()
+
+    def cached(self, url: str) -> Optional[str]:
+        match = SHORT_LINK_PATTERN.match(url.strip())
+        if match is None or self.cache is None:
+            return None
+        return self.cache.get(match.group(1))
+
+    def follow(self, url: str) -> str:
+        """逐跳读取 Location，离开短链接域名后停止"""
+        if not urlparse(url).scheme:
+            url = 'https://' + url
+        for _ in range(MAX_REDIRECTS):
+            if self.rate_limiter is not None:
+                self.rate_limiter.before_request(url)
+            try:
+                response = self.session.head(url, allow_redirects=False, timeout=self.timeout)
+                if response.status_code == 405:
+                    response = self.session.get(url, allow_redirects=False, timeout=self.timeout, stream=True)
+                    response.close()
+            except requests.RequestException as e:
+                raise ShortLinkError(f"{url}: {e}") from e
+            location = response.headers.get('Location')
+            if not response.is_redirect or not location:
+                raise ShortLinkError(f"{url}: HTTP {response.status_code}，没有重定向地址")
+            url = urljoin(url, location)
+            if not is_short_link(url):
+                return url
+        raise ShortLinkError(f"{url}: 重定向次数过多")
+
+    def resolve(self, url: str) -> str:
+        """返回规范地址；不是短链接时原样返回，解析失败时抛出 ShortLinkError"""
+        url = url.strip()
+        match = SHORT_LINK_PATTERN.match(url)
+        if match is None:
+            return url
+        # b23.tv/BVxxxxxxxxxx 形式本身就带有 BV 号
+        bv_match = BV_PATTERN.fullmatch(match.group(1))
+        if bv_match:
+            return f'https://www.bilibili.com/video/{bv_match.group(1)}'
+        cached = self.cached(url)
+        if cached is not None:
+            self.stats['cached'] += 1
+            return cached
+        try:
+            resolved = canonical_url(self.follow(url))
+        except ShortLinkError:
+            self.stats['failed'] += 1
+            raise
+        self.stats['resolved'] += 1
+        if self.cache is not None:
+            self.cache.put(match.group(1), resolved)
+        return resolved
+
+    def resolve_many(self, urls: Iterable[str]) -> Dict[str, str]:
+        """并发解析一批链接，返回 {原链接: 规范地址}；解析失败的保留原链接"""
+        urls = list(dict.fromkeys(url.strip() for url in urls))
+        results = {url: url for url in urls}
+        pending = []
+        for url in urls:
+            if not is_short_link(url):
+                continue
+            cached = self.cached(url)
+            if cached is not None:
+                self.stats['cached'] += 1
+                results[url] = cached
+            else:
+                pending.append(url)
+        if not pending:
+            return results
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(self.max_workers, len(pending))) as executor:
+            futures = {executor.submit(self.resolve, url): url for url in pending}
+            for future in concurrent.futures.as_completed(futures):
+                url = futures[future]
+                try:
+                    results[url] = future.result()
+                except ShortLinkError as e:
+                    print(f"⚠️ 短链接解析失败: {e}")
+        return results
+
+    def video_id(self, url: str) -> Optional[str]:
+        """取得 BV 号：URL 中已有时直接返回，短链接先查缓存，未缓存时才解析"""
+        match = BV_PATTERN.search(url)
+        if match:
+            return match.group(1)
+        if not is_short_link(url):
+            return None
+        try:
+            resolved = self.resolve(url)
+        except ShortLinkError as e:
+            print(f"⚠️ 短链接解析失败: {e}")
+            return None
+        match = BV_PATTERN.search(resolved)
+        return match.group(1) if match else None
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='解析 b23.tv 短链接')
+    parser.add_argument('urls', nargs='*', help='短链接（省略时从标准输入逐行读取）')
+    parser.add_argument('--cache', default='./downloads/.short_links.sqlite', help='缓存数据库路径')
+    parser.add_argument('--timeout', type=float, default=10, help='单个请求的超时（秒）')
+    parser.add_argument('--workers', type=int, default=8, help='并发解析数')
+    args = parser.parse_args()
+
+    urls = args.urls or [line.strip() for line in sys.stdin if line.strip()]
+    resolver = ShortLinkResolver(args.cache, timeout=args.timeout, max_workers=args.workers)
+    try:
+        for url, resolved in resolver.resolve_many(urls).items():
+            print(f"{url}\t{resolved}")
+    finally:
+        resolver.close()
+
+if __name__ == "__main__":
+    main()
@@ -6,26 +6,26 @@
 """
 
 import os
-import sys
 import re
 import subprocess
 from pathlib import Path
 
+from toolchain import find_tool
+from library_catalog import open_catalog
+
 class SimpleBilibiliExtractor:
-    def __init__(self, output_dir="./audio_output"):
+    def __init__(self, output_dir="./audio_output", audio_format="mp3", audio_quality="192"):
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
+        self.audio_format = audio_format
+        self.audio_quality = audio_quality
     
     def check_yt_dlp(self):
-        """检查yt-dlp是否可用"""
-        try:
-            result = subprocess.run(['yt-dlp', '--version'], 
-                                  capture_output=True, text=True)
-            if result.returncode == 0:
-                print(f"✓ yt-dlp 版本: {result.stdout.strip()}")
-                return True
-        except FileNotFoundError:
-            pass
+        """检查yt-dlp是否可用（探测结果缓存，yt-dlp 未变化时不启动子进程）"""
+        tool = find_tool('yt-dlp')
+        if tool:
+            print(f"✓ yt-dlp 版本: {tool['version']}")
+            return True
         
         print("❌ 未找到 yt-dlp")
         print("安装方法:")
@@ -41,13 +41,13 @@ class SimpleBilibiliExtractor:
         print(f"\n开始提取音频: {url}")
         
         # 构建yt-dlp命令
+        # 不强制指定编码器：源编码已满足目标格式时（如 m4a/AAC）yt-dlp 直接流复制
         cmd = [
             'yt-dlp',
             '--extract-audio',
-            '--audio-format', 'mp3',
-            '--audio-quality', '192K',
+            '--audio-format', self.audio_format,
+            '--audio-quality', f'{self.audio_quality}K',
             '--output', str(self.output_dir / '%(playlist_index)02d_%(title)s.%(ext)s'),
-            '--postprocessor-args', 'ffmpeg:-c:a libmp3lame -b:a 192k',
             '--ignore-errors',
             '--no-warnings',
             url
@@ -63,8 +63,13 @@ class SimpleBilibiliExtractor:
             return False
     
     def list_output_files(self):
-        """列出输出的音频文件"""
-        audio_files = list(self.output_dir.glob('*.mp3'))
+        """列出输出的音频文件（yt-dlp 在子进程中运行，由目录索引的增量扫描收录新文件）"""
+        catalog = open_catalog(self.output_dir)
+        if catalog is not None:
+            audio_files = [catalog.absolute(row['path']) for row in catalog.files(self.audio_format, directory='')]
+            catalog.close()
+        else:
+            audio_files = list(self.output_dir.glob(f'*.{self.audio_format}'))
         if audio_files:
             print(f"\n📁 输出目录: {self.output_dir.absolute()}")
             print(f"📄 共生成 {len(audio_files)} 个音频文件:")
@@ -74,12 +79,20 @@ class SimpleBilibiliExtractor:
             print("\n❌ 未找到生成的音频文件")
 
 def main():
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='简化版B站音频提取器')
+    parser.add_argument('url', nargs='?', help='B站视频URL')
+    parser.add_argument('-f', '--format', default='mp3', help='音频格式 (如: mp3, m4a；m4a 可免转码)')
+    parser.add_argument('-q', '--quality', default='192', help='音频质量 (如: 192, 320)')
+    args = parser.parse_args()
+    
     print("=== 简化版B站音频提取器 ===")
     print("快速提取B站视频音频为MP3格式\n")
     
     # 获取URL
-    if len(sys.argv) > 1:
-        url = sys.argv[1]
+    if args.url:
+        url = args.url
     else:
         url = input("请输入B站视频URL: ").strip()
     
@@ -93,7 +106,7 @@ def main():
         return
     
     # 创建提取器并开始工作
-    extractor = SimpleBilibiliExtractor()
+    extractor = SimpleBilibiliExtractor(audio_format=args.format, audio_quality=args.quality)
     
     if extractor.extract_audio_simple(url):
         extractor.list_output_files()
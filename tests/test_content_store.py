@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+内容存储与标签改写：复用的文件改写标签后仍与存储对象共享硬链接（标签一致时），
+标签不同的合集得到自己的标签且不改动存储中的对象
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from audio_tags import entry_tags, has_tags, read_id3, retag, write_tags
+from content_store import ContentStore
+
+AUDIO = os.urandom(64 * 1024)
+
+def make_entry(album: str, track: int) -> dict:
+    return {'id': 'BV1xx411c7mD', 'playlist_title': album, 'playlist_index': track, 'uploader': '精品伴奏馆'}
+
+def read_tags(path) -> dict:
+    with open(path, 'rb') as f:
+        return {frame_id: frame[11:].decode('latin-1') for frame_id, frame in read_id3(f)[3]}
+
+class ContentStoreRetagTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = Path(tempfile.mkdtemp(prefix='test_content_store_'))
+        self.store = ContentStore(self.work_dir / 'store', link_mode='hardlink')
+        self.addCleanup(shutil.rmtree, self.work_dir, True)
+        self.addCleanup(self.store.close)
+
+    def download(self, directory: str, entry: dict) -> Path:
+        """模拟一次下载：写出带本条目标签的 mp3"""
+        path = self.work_dir / directory / 'song.mp3'
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(AUDIO)
+        write_tags(path, entry_tags(path, entry))
+        return path
+
+    def shareable(self, entry: dict):
+        return lambda object_path, target: has_tags(object_path, entry_tags(target, entry))
+
+    def object_path(self) -> Path:
+        return next((self.work_dir / 'store' / 'objects').glob('*/*.mp3'))
+
+    def test_restore_with_same_tags_keeps_inode_shared(self):
+        entry = make_entry('Album', 1)
+        self.store.add(('BV1xx411c7mD', 1), 'mp3', '192', self.download('first', entry))
+
+        target = self.work_dir / 'again' / 'song.mp3'
+        self.store.restore(('BV1xx411c7mD', 1), 'mp3', '192', target, shareable=self.shareable(entry))
+        self.assertEqual(retag(target, entry), 'unchanged')
+        self.assertTrue(target.samefile(self.object_path()))
+
+    def test_restore_into_other_collection_does_not_touch_object(self):
+        self.store.add(('BV1xx411c7mD', 1), 'mp3', '192', self.download('first', make_entry('Album', 1)))
+
+        other = make_entry('Other', 7)
+        target = self.work_dir / 'other' / 'song.mp3'
+        self.store.restore(('BV1xx411c7mD', 1), 'mp3', '192', target, shareable=self.shareable(other))
+        retag(target, other)
+        self.assertFalse(target.samefile(self.object_path()))
+        self.assertEqual(read_tags(target)[b'TALB'], 'Other')
+        self.assertEqual(read_tags(self.object_path())[b'TALB'], 'Album')
+
+    def test_add_duplicate_with_same_tags_links_to_object(self):
+        entry = make_entry('Album', 1)
+        self.store.add(('BV1xx411c7mD', 1), 'mp3', '192', self.download('first', entry))
+        second = self.download('second', entry)
+        self.store.add(('BV1xx411c7mD', 2), 'mp3', '192', second, on_link=lambda path: retag(path, entry),
+                       shareable=self.shareable(entry))
+        self.assertTrue(second.samefile(self.object_path()))
+        self.assertEqual(self.store.stats['deduplicated'], 1)
+
+    def test_add_duplicate_with_other_tags_keeps_own_file(self):
+        self.store.add(('BV1xx411c7mD', 1), 'mp3', '192', self.download('first', make_entry('Album', 1)))
+        other = make_entry('Other', 7)
+        second = self.download('second', other)
+        self.store.add(('BV1xx411c7mD', 2), 'mp3', '192', second, on_link=lambda path: retag(path, other),
+                       shareable=self.shareable(other))
+        self.assertFalse(second.samefile(self.object_path()))
+        self.assertEqual(read_tags(second)[b'TALB'], 'Other')
+        self.assertEqual(self.store.stats['deduplicated'], 0)
+
+    def test_disk_savings_not_counted_when_retag_breaks_link(self):
+        self.store.add(('BV1xx411c7mD', 1), 'mp3', '192', self.download('first', make_entry('Album', 1)))
+        other = make_entry('Other', 7)
+        second = self.download('second', other)
+        # 不传 shareable：先硬链接到对象，改写标签时链接断开
+        self.store.add(('BV1xx411c7mD', 2), 'mp3', '192', second, on_link=lambda path: retag(path, other))
+        self.assertFalse(second.samefile(self.object_path()))
+        self.assertEqual(self.store.stats['deduplicated'], 0)
+        self.assertEqual(self.store.stats['disk_bytes_saved'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
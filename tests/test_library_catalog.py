@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+音频库目录索引的增量扫描：重新列出的目录中，被替换的同名文件重新记录大小和 mtime
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from library_catalog import open_catalog
+
+class IncrementalScanTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = Path(tempfile.mkdtemp(prefix='test_library_catalog_'))
+        self.addCleanup(shutil.rmtree, self.work_dir, True)
+
+    def test_replaced_file_is_restatted(self):
+        source = self.work_dir / 'a.m4a'
+        source.write_bytes(b'x' * 10)
+        os.utime(source, (1e9, 1e9))
+        # 目录 mtime 早于扫描时刻（否则不记录，下次总会重新列出）
+        past = time.time() - 100
+        os.utime(self.work_dir, (past, past))
+        open_catalog(self.work_dir).close()
+
+        temp = self.work_dir / '.a.m4a.tmp'
+        temp.write_bytes(b'y' * 20)
+        os.replace(temp, source)
+
+        catalog = open_catalog(self.work_dir, scan=False)
+        self.addCleanup(catalog.close)
+        stats = catalog.scan()
+        self.assertEqual((stats['listed'], stats['updated']), (1, 1))
+        row = catalog.files('m4a')[0]
+        self.assertEqual(row['size'], 20)
+        self.assertEqual(row['mtime'], source.stat().st_mtime)
+
+if __name__ == '__main__':
+    unittest.main()
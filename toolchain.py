@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+外部工具探测缓存
+FFmpeg / ffprobe / yt-dlp 的路径和版本只在首次使用或可执行文件变化后探测一次
+（启动一个 yt-dlp 子进程本身就要零点几秒），结果按 路径 + mtime + 大小 缓存在磁盘上，
+之后每次启动只需一次 PATH 查找和 stat
+"""
+
+import os
+import sys
+import json
+import shutil
+import subprocess
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+# 各工具输出版本号的参数
+VERSION_ARGS = {
+    'ffmpeg': ['-version'],
+    'ffprobe': ['-version'],
+    'yt-dlp': ['--version'],
+}
+
+_lock = threading.Lock()
+
+def cache_path() -> Path:
+    """缓存文件路径（可用环境变量 BILI_TOOLCHAIN_CACHE 指定）"""
+    override = os.environ.get('BILI_TOOLCHAIN_CACHE')
+    if override:
+        return Path(override)
+    cache_home = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+    return Path(cache_home) / 'bili_audio' / 'toolchain.json'
+
+def load_cache() -> Dict:
+    try:
+        with open(cache_path(), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_cache(cache: Dict):
+    """原子写入，多个进程同时写入时以最后一个为准"""
+    path = cache_path()
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        with open(temp, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, ensure_ascii=False, indent=2)
+        os.replace(temp, path)
+    except OSError:
+        pass
+
+def run_version(path: str, name: str) -> Optional[str]:
+    """运行版本命令，返回输出的第一行；无法运行时返回 None"""
+    try:
+        result = subprocess.run([path, *VERSION_ARGS.get(name, ['--version'])],
+                                capture_output=True, text=True, timeout=30)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    if result.returncode != 0:
+        return None
+    lines = result.stdout.strip().splitlines()
+    return lines[0] if lines else ''
+
+def find_tool(name: str, refresh: bool = False) -> Optional[Dict]:
+    """返回 {'path', 'version', 'mtime', 'size'}，工具不存在或无法运行时返回 None
+
+    可执行文件的路径、mtime 和大小都与缓存一致时直接使用缓存的版本号，不启动子进程；
+    不可用的结果不缓存（安装后下一次运行即可识别）
+    """
+    path = shutil.which(name)
+    if path is None:
+        return None
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    with _lock:
+        cache = load_cache()
+        cached = cache.get(name)
+        if (not refresh and cached and cached.get('path') == path
+                and cached.get('mtime') == stat.st_mtime and cached.get('size') == stat.st_size):
+            return cached
+
+        version = run_version(path, name)
+        if version is None:
+            return None
+        info = {'path': path, 'version': version, 'mtime': stat.st_mtime, 'size': stat.st_size}
+        cache = load_cache()
+        cache[name] = info
+        save_cache(cache)
+        return info
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='外部工具探测缓存')
+    parser.add_argument('tools', nargs='*', default=list(VERSION_ARGS), help='要探测的工具')
+    parser.add_argument('--refresh', action='store_true', help='忽略缓存重新探测')
+    args = parser.parse_args()
+
+    print(f"🗂️ 缓存文件: {cache_path()}")
+    missing = False
+    for name in args.tools:
+        info = find_tool(name, refresh=args.refresh)
+        if info is None:
+            missing = True
+            print(f"❌ {name}: 未找到")
+        else:
+            print(f"✓ {name}: {info['version']} ({info['path']})")
+    sys.exit(1 if missing else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+FFmpeg 音频转码
+供流水线模式和转换工具共用，输出先写入临时文件再原子替换。
+源音频编码已被目标格式接受时直接流复制（remux），不再解码重编码
+"""
+
+import os
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# 目标格式 -> FFmpeg 编码器
+AUDIO_ENCODERS = {
+    'mp3': 'libmp3lame',
+    'm4a': 'aac',
+    'aac': 'aac',
+    'opus': 'libopus',
+    'ogg': 'libvorbis',
+    'flac': 'flac',
+    'wav': 'pcm_s16le',
+}
+
+# 无损格式不需要码率参数
+LOSSLESS_FORMATS = {'flac', 'wav'}
+
+# 目标格式可直接接受（无需重编码）的源编码
+ACCEPTED_CODECS = {
+    'mp3': {'mp3'},
+    'm4a': {'aac', 'alac'},
+    'aac': {'aac'},
+    'opus': {'opus'},
+    'ogg': {'vorbis', 'opus'},
+    'flac': {'flac'},
+    'wav': {'pcm_s16le'},
+}
+
+# 转码模式：auto 仅在需要时转码，always 始终重编码
+TRANSCODE_MODES = ('auto', 'always')
+
+def temp_output_path(output_file) -> Path:
+    """同目录下的临时输出路径（保留扩展名以便 FFmpeg 识别容器）"""
+    output_file = Path(output_file)
+    return output_file.with_name(f".{output_file.stem}.transcoding{output_file.suffix}")
+
+def metadata_args(tags: Optional[Dict[str, str]], audio_format: str = "mp3") -> List[str]:
+    """把标签（title/artist/album/track）转为 FFmpeg 的 -metadata 参数，随编码一起写入输出文件"""
+    args = []
+    for name, value in (tags or {}).items():
+        args += ['-metadata', f'{name}={value}']
+    # ID3v2.3 的兼容性比 FFmpeg 默认的 v2.4 更好（Windows 资源管理器等只认 v2.3）
+    if args and audio_format == 'mp3':
+        args += ['-id3v2_version', '3']
+    return args
+
+def build_transcode_command(input_file, output_file, audio_format="mp3", quality="192", tags=None):
+    """构建转码命令"""
+    encoder = AUDIO_ENCODERS.get(audio_format)
+    if encoder is None:
+        raise ValueError(f"不支持的音频格式: {audio_format}")
+
+    cmd = ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-i', str(input_file), '-vn', '-c:a', encoder]
+    if audio_format not in LOSSLESS_FORMATS:
+        bitrate = str(quality)
+        if not bitrate.endswith('k'):
+            bitrate += 'k'
+        cmd += ['-b:a', bitrate]
+    cmd += metadata_args(tags, audio_format)
+    cmd += ['-y', str(output_file)]
+    return cmd
+
+def build_copy_command(input_file, output_file, audio_format="m4a", tags=None):
+    """构建流复制（remux）命令"""
+    cmd = ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-i', str(input_file), '-vn', '-c:a', 'copy']
+    if audio_format == 'aac':
+        cmd += ['-f', 'adts']
+    cmd += metadata_args(tags, audio_format)
+    cmd += ['-y', str(output_file)]
+    return cmd
+
+def probe_audio_codec(input_file) -> Optional[str]:
+    """使用 ffprobe 获取第一条音频流的编码名称"""
+    cmd = [
+        'ffprobe', '-v', 'error',
+        '-select_streams', 'a:0',
+        '-show_entries', 'stream=codec_name',
+        '-of', 'default=noprint_wrappers=1:nokey=1',
+        str(input_file)
+    ]
+    try:
+        result = subprocess.run(cmd, check=True, capture_output=True, text=True)
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return None
+    return result.stdout.strip().splitlines()[0] if result.stdout.strip() else None
+
+def can_stream_copy(input_file, audio_format: str) -> bool:
+    """源音频编码是否已满足目标格式"""
+    codec = probe_audio_codec(input_file)
+    return codec is not None and codec in ACCEPTED_CODECS.get(audio_format, set())
+
+def transcode_audio(input_file, output_file, audio_format="mp3", quality="192", delete_source=True,
+                    mode="auto", tags=None) -> bool:
+    """转换音频文件（auto 模式下能流复制则流复制），成功后原子替换到目标路径；tags 随编码写入"""
+    input_file = Path(input_file)
+    output_file = Path(output_file)
+    temp_file = temp_output_path(output_file)
+
+    if mode == 'auto' and can_stream_copy(input_file, audio_format):
+        cmd = build_copy_command(input_file, temp_file, audio_format, tags)
+    else:
+        cmd = build_transcode_command(input_file, temp_file, audio_format, quality, tags)
+    try:
+        subprocess.run(cmd, check=True, capture_output=True)
+        os.replace(temp_file, output_file)
+    except (subprocess.CalledProcessError, FileNotFoundError, OSError) as e:
+        print(f"转码失败: {input_file.name} - {e}")
+        temp_file.unlink(missing_ok=True)
+        return False
+
+    if delete_source and input_file.resolve() != output_file.resolve():
+        try:
+            input_file.unlink()
+        except OSError as e:
+            print(f"⚠️ 删除原文件失败: {e}")
+    return True
@@ -0,0 +1,603 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多进程 / 多节点分片下载
+协调进程枚举合集，把条目写入共享的 SQLite 队列（放在各节点都能访问的共享卷上）；
+任意数量的工作进程按租约领取条目，下载到共同的输出目录。工作进程定期心跳续租，
+进程崩溃或节点失联后租约到期，条目自动回到队列由其他工作进程接手；
+同一条目的租约多次到期（每次都导致进程退出）时标记为失败，避免反复拖垮工作进程
+
+命令:
+  enqueue URL            枚举合集并加入队列（已在队列或归档中的条目跳过）
+  worker                 领取并下载条目，队列中没有待处理和租出的条目时退出（--wait 持续等待）
+  status                 队列和工作进程状态
+  requeue                失败的条目重新排队
+  run URL --workers N    在本机加入队列并启动 N 个工作进程（便于单机测试）
+
+各节点使用租约到期时间的绝对时刻判断过期，节点之间的时钟需要大致同步（NTP）
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import signal
+import socket
+import sqlite3
+import threading
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import yt_dlp
+
+from entry_record import EntryRecord, project_entries
+from retry_scheduler import RetryScheduler, classify_error
+
+TASK_STATUSES = ('queued', 'leased', 'done', 'failed')
+
+def default_worker_name() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+class WorkQueue:
+    """基于 SQLite 的租约队列（进程安全、线程安全）
+
+    每个进程各自打开连接；领取、续租和提交都在 BEGIN IMMEDIATE 事务中完成，
+    提交结果时校验租约令牌，租约已被收回的旧工作进程无法覆盖新租约的状态。
+    共享卷（NFS/SMB）不支持 WAL，这里使用默认的回滚日志
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            url TEXT NOT NULL UNIQUE,
+            position INTEGER NOT NULL DEFAULT 0,
+            total INTEGER NOT NULL DEFAULT 0,
+            title TEXT,
+            entry TEXT,
+            status TEXT NOT NULL DEFAULT 'queued',
+            worker TEXT,
+            token TEXT,
+            lease_expires REAL,
+            not_before REAL NOT NULL DEFAULT 0,
+            leases INTEGER NOT NULL DEFAULT 0,
+            failures INTEGER NOT NULL DEFAULT 0,
+            error_class TEXT,
+            error TEXT,
+            filepath TEXT,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, lease_expires);
+        CREATE TABLE IF NOT EXISTS workers (
+            name TEXT PRIMARY KEY,
+            host TEXT,
+            pid INTEGER,
+            status TEXT NOT NULL,
+            started_at REAL NOT NULL,
+            last_seen REAL NOT NULL,
+            completed INTEGER NOT NULL DEFAULT 0,
+            failed INTEGER NOT NULL DEFAULT 0
+        );
+    """
+
+    def __init__(self, db_path, lease_seconds: float = 60, max_leases: int = 5):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.lease_seconds = lease_seconds
+        self.max_leases = max_leases
+        self._lock = threading.Lock()
+        # isolation_level=None：事务由 _transaction() 显式开始，其他进程持有写锁时最多等待 timeout 秒
+        self._conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.executescript(self.SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _transaction(self):
+        return _Transaction(self._conn, self._lock)
+
+    # ---- 协调进程 ----
+
+    def enqueue(self, items: List[Dict]) -> int:
+        """加入条目 {url, position, total, title, entry}，已在队列中的URL跳过，返回新增数量"""
+        now = time.time()
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                """INSERT OR IGNORE INTO tasks (url, position, total, title, entry, created_at, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                [(item['url'], item.get('position', 0), item.get('total', 0), item.get('title'),
+                  json.dumps(item.get('entry'), ensure_ascii=False, default=str), now, now) for item in items]
+            )
+            return conn.total_changes - before
+
+    def requeue_failed(self) -> int:
+        with self._transaction() as conn:
+            return conn.execute(
+                """UPDATE tasks SET status='queued', failures=0, leases=0, not_before=0, error_class=NULL,
+                                    error=NULL, updated_at=? WHERE status='failed'""", (time.time(),)).rowcount
+
+    # ---- 工作进程 ----
+
+    def register_worker(self, name: str):
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                """INSERT INTO workers (name, host, pid, status, started_at, last_seen)
+                   VALUES (?, ?, ?, 'running', ?, ?)
+                   ON CONFLICT(name) DO UPDATE SET status='running', pid=excluded.pid,
+                                                   last_seen=excluded.last_seen""",
+                (name, socket.gethostname(), os.getpid(), now, now))
+
+    def lease(self, worker: str) -> Optional[Dict]:
+        """领取一个条目：排队中且已到重试时间的，或租约已过期的；没有可领取的条目时返回 None"""
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                """SELECT * FROM tasks
+                   WHERE (status='queued' AND not_before<=?) OR (status='leased' AND lease_expires<? AND leases<?)
+                   ORDER BY not_before, id LIMIT 1""", (now, now, self.max_leases)).fetchone()
+            if row is None:
+                return None
+            token = uuid.uuid4().hex
+            conn.execute(
+                """UPDATE tasks SET status='leased', worker=?, token=?, lease_expires=?, leases=leases+1, updated_at=?
+                   WHERE id=?""", (worker, token, now + self.lease_seconds, now, row['id']))
+        task = dict(row, status='leased', worker=worker, token=token, leases=row['leases'] + 1,
+                    reclaimed=row['status'] == 'leased')
+        task['entry'] = json.loads(row['entry']) if row['entry'] else None
+        return task
+
+    def heartbeat(self, worker: str) -> int:
+        """延长该工作进程持有的所有租约，返回持有的条目数"""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute("UPDATE workers SET last_seen=? WHERE name=?", (now, worker))
+            return conn.execute(
+                "UPDATE tasks SET lease_expires=? WHERE worker=? AND status='leased' AND lease_expires>=?",
+                (now + self.lease_seconds, worker, now)).rowcount
+
+    def expire_poisoned(self) -> int:
+        """租约到期次数达到上限的条目标记为失败，返回数量"""
+        now = time.time()
+        with self._transaction() as conn:
+            return conn.execute(
+                """UPDATE tasks SET status='failed', error_class='lease', token=NULL,
+                                    error='租约 ' || leases || ' 次到期（工作进程退出或失联）', updated_at=?
+                   WHERE status='leased' AND lease_expires<? AND leases>=?""",
+                (now, now, self.max_leases)).rowcount
+
+    def complete(self, task: Dict, filepath: str = None) -> bool:
+        """提交成功结果；租约已被收回时返回 False"""
+        now = time.time()
+        with self._transaction() as conn:
+            updated = conn.execute(
+                """UPDATE tasks SET status='done', filepath=?, token=NULL, lease_expires=NULL, error=NULL,
+                                    updated_at=? WHERE id=? AND token=?""",
+                (filepath, now, task['id'], task['token'])).rowcount
+            if updated:
+                conn.execute("UPDATE workers SET completed=completed+1, last_seen=? WHERE name=?",
+                             (now, task['worker']))
+            return updated == 1
+
+    def fail(self, task: Dict, error_class: str, error: str, retry_delay: float = None) -> bool:
+        """提交失败结果：retry_delay 不为 None 时在该秒数后重新排队，否则标记为失败；租约已被收回时返回 False"""
+        now = time.time()
+        if retry_delay is None:
+            status, not_before = 'failed', 0
+        else:
+            status, not_before = 'queued', now + retry_delay
+        with self._transaction() as conn:
+            updated = conn.execute(
+                """UPDATE tasks SET status=?, not_before=?, failures=failures+1, error_class=?, error=?, token=NULL,
+                                    worker=NULL, lease_expires=NULL, updated_at=? WHERE id=? AND token=?""",
+                (status, not_before, error_class, error, now, task['id'], task['token'])).rowcount
+            if updated and status == 'failed':
+                conn.execute("UPDATE workers SET failed=failed+1, last_seen=? WHERE name=?", (now, task['worker']))
+            return updated == 1
+
+    def release(self, worker: str) -> int:
+        """正常退出时交还仍持有的租约（不计入到期次数），返回数量"""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute("UPDATE workers SET status='stopped', last_seen=? WHERE name=?", (now, worker))
+            return conn.execute(
+                """UPDATE tasks SET status='queued', worker=NULL, token=NULL, lease_expires=NULL,
+                                    leases=MAX(leases-1, 0), updated_at=? WHERE worker=? AND status='leased'""",
+                (now, worker)).rowcount
+
+    # ---- 查询 ----
+
+    def is_drained(self) -> bool:
+        """没有排队和租出的条目"""
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM tasks WHERE status IN ('queued', 'leased') LIMIT 1").fetchone()
+        return row is None
+
+    def counts(self) -> Dict[str, int]:
+        """各状态的条目数，另含 deferred（等待重试）和 expired（租约已过期）"""
+        now = time.time()
+        with self._lock:
+            counts = {status: 0 for status in TASK_STATUSES}
+            for row in self._conn.execute("SELECT status, COUNT(*) AS n FROM tasks GROUP BY status"):
+                counts[row['status']] = row['n']
+            row = self._conn.execute(
+                """SELECT SUM(status='queued' AND not_before>?) AS deferred,
+                          SUM(status='leased' AND lease_expires<?) AS expired FROM tasks""", (now, now)).fetchone()
+        counts['deferred'] = row['deferred'] or 0
+        counts['expired'] = row['expired'] or 0
+        return counts
+
+    def workers(self) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                """SELECT w.*, (SELECT COUNT(*) FROM tasks t WHERE t.worker=w.name AND t.status='leased') AS leased
+                   FROM workers w ORDER BY started_at""").fetchall()
+        return [dict(row) for row in rows]
+
+    def failed(self, limit: int = 50) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, position, total, title, error_class, error FROM tasks WHERE status='failed' "
+                "ORDER BY id LIMIT ?", (limit,)).fetchall()
+        return [dict(row) for row in rows]
+
+class _Transaction:
+    """BEGIN IMMEDIATE 事务：开始时即取得写锁，其他进程的领取操作排队等待"""
+
+    def __init__(self, conn: sqlite3.Connection, lock: threading.Lock):
+        self._conn = conn
+        self._lock = lock
+
+    def __enter__(self) -> sqlite3.Connection:
+        self._lock.acquire()
+        try:
+            self._conn.execute("BEGIN IMMEDIATE")
+        except BaseException:
+            self._lock.release()
+            raise
+        return self._conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self._conn.execute("COMMIT" if exc_type is None else "ROLLBACK")
+        finally:
+            self._lock.release()
+        return False
+
+def enqueue_collection(extractor, queue: WorkQueue, url: str, refresh: bool = False) -> Optional[Dict[str, int]]:
+    """枚举合集并把未完成的条目加入队列，返回 {total, skipped, added}；无法获取信息时返回 None"""
+    url = extractor.resolve_urls([url])[0]
+    print(f"🔍 正在分析播放列表: {url}")
+    with extractor.metrics.stage('metadata'):
+        info = extractor.get_collection_info(url, refresh)
+    if not info:
+        return None
+
+    if 'entries' in info:
+        entries = project_entries(info)
+    else:
+        # 单个视频：同样只保留下载需要的字段
+        entries = [EntryRecord.from_info(info, 1)]
+        entries[0].url = info.get('webpage_url') or url
+    items = []
+    skipped = 0
+    for entry in entries:
+        if extractor.is_archived(entry.key):
+            skipped += 1
+            continue
+        items.append({'url': entry.url or url, 'position': entry.index, 'total': len(entries),
+                      'title': entry.get('title', f'Video_{entry.index}'), 'entry': entry.to_dict()})
+    added = queue.enqueue(items)
+    return {'total': len(entries), 'skipped': skipped, 'added': added}
+
+class QueueWorker:
+    """从共享队列领取条目，下载到共同的输出目录
+
+    每个下载线程一次持有一个租约，心跳线程每隔 heartbeat_interval 秒为本进程的全部租约续期；
+    失败按错误类型（沿用 retry 配置的策略和熔断器）决定退避后重新排队还是标记失败，
+    重新排队的条目可能由其他工作进程领取
+    """
+
+    def __init__(self, extractor, queue: WorkQueue, name: str = None, threads: int = None,
+                 heartbeat_interval: float = None, poll_interval: float = 2.0, wait: bool = False):
+        self.extractor = extractor
+        self.queue = queue
+        self.name = name or default_worker_name()
+        self.threads = threads or extractor.config['max_concurrent_downloads']
+        self.heartbeat_interval = heartbeat_interval or max(queue.lease_seconds / 3, 1)
+        self.poll_interval = poll_interval
+        self.wait = wait
+        # 只使用其中的重试策略和熔断器，条目的排队由共享队列负责
+        self.retry = RetryScheduler.from_config(extractor.config.get('retry', {}))
+        self.stats = {'completed': 0, 'failed': 0, 'retries': 0, 'reclaimed': 0, 'lost': 0}
+        self._stats_lock = threading.Lock()
+        self._stop = threading.Event()
+
+        opts = extractor.ydl_opts.copy()
+        opts['ignoreerrors'] = False
+        opts['retries'] = 0
+        self.pool = extractor.create_ydl_pool(opts)
+
+    def count(self, name: str):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def stop(self):
+        """当前条目完成后停止领取"""
+        self._stop.set()
+
+    def run(self) -> Dict[str, int]:
+        self.queue.register_worker(self.name)
+        print(f"👷 工作进程 {self.name}: {self.threads} 个下载线程，租约 {self.queue.lease_seconds:.0f} 秒，"
+              f"每 {self.heartbeat_interval:.0f} 秒续租")
+        heartbeat = threading.Thread(target=self._heartbeat_loop, name='heartbeat', daemon=True)
+        heartbeat.start()
+        threads = [threading.Thread(target=self._work_loop, name=f'download-{n}', daemon=True)
+                   for n in range(self.threads)]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(timeout=1)
+        except KeyboardInterrupt:
+            print("\n⏹️ 正在停止，交还未完成的条目...")
+        finally:
+            self._stop.set()
+            released = self.queue.release(self.name)
+            if released:
+                print(f"↩️ 交还 {released} 个条目")
+            self.pool.close()
+        return self.stats
+
+    def _heartbeat_loop(self):
+        while not self._stop.wait(self.heartbeat_interval):
+            try:
+                self.queue.heartbeat(self.name)
+                poisoned = self.queue.expire_poisoned()
+                if poisoned:
+                    print(f"☠️ {poisoned} 个条目的租约多次到期，标记为失败")
+            except sqlite3.Error as e:
+                # 共享卷暂时不可用：租约可能过期，由提交时的令牌校验兜底
+                print(f"⚠️ 续租失败: {e}")
+
+    def _work_loop(self):
+        breaker = self.retry.breaker
+        while not self._stop.is_set():
+            wait = breaker.wait_time() if breaker is not None else 0
+            if wait > 0:
+                self._stop.wait(wait)
+                continue
+            task = self.queue.lease(self.name)
+            if task is None:
+                if breaker is not None:
+                    # 没有领取到条目，释放可能占用的探测名额
+                    breaker.record_failure()
+                if not self.wait and self.queue.is_drained():
+                    return
+                self._stop.wait(self.poll_interval)
+                continue
+            if task['reclaimed']:
+                self.count('reclaimed')
+                print(f"🔄 接手租约已过期的条目: {task['title']}")
+            self.process(task)
+
+    def process(self, task: Dict):
+        entry = EntryRecord.from_info(task['entry'] or {}, task['position'])
+        label = f"[{task['position']}/{task['total']}] {task['title']}"
+        key = entry.key
+        if self.extractor.is_archived(key):
+            self.queue.complete(task)
+            print(f"⏭️ 已在归档中，跳过: {label}")
+            return
+
+        retry_note = f" (第 {task['failures'] + 1} 次尝试)" if task['failures'] else ""
+        print(f"🎵 正在处理: {label}{retry_note}")
+        try:
+            filepath = self.extractor.fetch_entry(task['url'], self.pool, key, entry.get('id'), entry=entry)
+            if filepath is None:
+                raise yt_dlp.utils.DownloadError("没有生成音频文件")
+        except Exception as e:
+            self.handle_failure(task, label, e)
+            return
+
+        if self.retry.breaker is not None:
+            self.retry.breaker.record_success()
+        # 文件已写入共同的输出目录，即使租约已被收回也记入归档
+        self.extractor.record_archive(key, label, filepath, entry)
+        if not self.queue.complete(task, filepath):
+            self.count('lost')
+            print(f"⚠️ 租约已被收回（心跳中断过），结果仍已保存: {label}")
+            return
+        self.count('completed')
+        self.extractor.metrics.inc('completed')
+        print(f"✅ {label} 完成")
+
+    def handle_failure(self, task: Dict, label: str, error: Exception):
+        error_class = classify_error(error)
+        breaker = self.retry.breaker
+        if breaker is not None:
+            if error_class == 'throttled':
+                if breaker.record_throttle():
+                    print(f"⛔ 持续限流，本进程暂停领取新条目 {breaker.cooldown:.0f} 秒")
+            else:
+                breaker.record_failure()
+
+        attempt = task['failures'] + 1
+        policy = self.retry.policies[error_class]
+        delay = policy.delay(attempt, self.retry.rng) if attempt <= policy.max_retries else None
+        self.queue.fail(task, error_class, str(error), delay)
+        if delay is None:
+            self.count('failed')
+            self.extractor.metrics.inc('failed')
+            print(f"❌ {label} 失败 ({error_class}): {error}")
+        else:
+            self.count('retries')
+            self.extractor.metrics.inc('retries')
+            print(f"🔁 {label} {error_class}，{delay:.1f} 秒后重新排队")
+
+def queue_path(extractor, path: str = None) -> Path:
+    """队列数据库路径：命令行参数 > 配置 work_queue.path，相对路径位于输出目录中"""
+    db_path = Path(path or extractor.config.get('work_queue', {}).get('path', '.work_queue.sqlite'))
+    if not db_path.is_absolute():
+        db_path = extractor.output_dir / db_path
+    return db_path
+
+def open_queue(extractor, path: str = None) -> WorkQueue:
+    queue_config = extractor.config.get('work_queue', {})
+    return WorkQueue(queue_path(extractor, path), lease_seconds=queue_config.get('lease_seconds', 60),
+                     max_leases=queue_config.get('max_leases', 5))
+
+def print_status(queue: WorkQueue):
+    counts = queue.counts()
+    total = sum(counts[status] for status in TASK_STATUSES)
+    print(f"📋 队列: {queue.db_path}")
+    print(f"  共 {total} 个条目：完成 {counts['done']}，租出 {counts['leased']}（已过期 {counts['expired']}），"
+          f"排队 {counts['queued']}（等待重试 {counts['deferred']}），失败 {counts['failed']}")
+    now = time.time()
+    for worker in queue.workers():
+        print(f"  👷 {worker['name']:<28s} {worker['status']:<8s} 持有 {worker['leased']}，"
+              f"完成 {worker['completed']}，失败 {worker['failed']}，{now - worker['last_seen']:.0f} 秒前心跳")
+    for task in queue.failed(limit=10):
+        print(f"  ❌ [{task['position']}/{task['total']}] {task['title']} ({task['error_class']}): {task['error']}")
+
+def run_local(args, extractor, queue: WorkQueue) -> bool:
+    """加入队列后在本机启动多个工作进程，等待全部退出"""
+    counts = enqueue_collection(extractor, queue, args.url, args.refresh)
+    if counts is None:
+        print("❌ 无法获取视频信息")
+        return False
+    print(f"📥 共 {counts['total']} 个条目，新加入 {counts['added']} 个，归档中已完成 {counts['skipped']} 个")
+
+    log_dir = queue.db_path.parent / '.work_queue_logs'
+    log_dir.mkdir(exist_ok=True)
+    processes = []
+    for n in range(args.workers):
+        name = f"{socket.gethostname()}-local{n}"
+        command = [sys.executable, str(Path(__file__).resolve()), '-c', args.config, '--queue', str(queue.db_path),
+                   'worker', '--name', name]
+        if args.output:
+            command += ['-o', args.output]
+        if args.concurrent:
+            command += ['--concurrent', str(args.concurrent)]
+        log = open(log_dir / f'{name}.log', 'w', encoding='utf-8')
+        processes.append((subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT), log))
+    print(f"🚀 已启动 {args.workers} 个工作进程，日志: {log_dir}")
+
+    try:
+        while any(process.poll() is None for process, _ in processes):
+            time.sleep(5)
+            counts = queue.counts()
+            print(f"📊 完成 {counts['done']}，租出 {counts['leased']}，排队 {counts['queued']}，失败 {counts['failed']}")
+    except KeyboardInterrupt:
+        print("\n⏹️ 正在停止工作进程...")
+        for process, _ in processes:
+            process.terminate()
+        for process, _ in processes:
+            process.wait()
+    finally:
+        for _, log in processes:
+            log.close()
+    print()
+    print_status(queue)
+    counts = queue.counts()
+    return counts['done'] > 0 and counts['queued'] + counts['leased'] == 0
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='多进程 / 多节点分片下载（共享租约队列）')
+    parser.add_argument('-c', '--config', default='config.json', help='配置文件路径')
+    parser.add_argument('-o', '--output', help='输出目录（各工作进程共同使用）')
+    parser.add_argument('--queue', help='队列数据库路径（默认在输出目录中，多节点时放在共享卷上）')
+    subparsers = parser.add_subparsers(dest='command')
+
+    enqueue_parser = subparsers.add_parser('enqueue', help='枚举合集并加入队列')
+    enqueue_parser.add_argument('url', help='B站合集或视频URL')
+    enqueue_parser.add_argument('--refresh', action='store_true', help='忽略缓存的合集信息，重新枚举')
+
+    worker_parser = subparsers.add_parser('worker', help='领取并下载条目')
+    worker_parser.add_argument('--name', help='工作进程名称（默认 主机名-进程号）')
+    worker_parser.add_argument('--concurrent', type=int, help='本进程的下载线程数')
+    worker_parser.add_argument('--wait', action='store_true', help='队列为空时继续等待新条目')
+
+    subparsers.add_parser('status', help='队列和工作进程状态')
+    subparsers.add_parser('requeue', help='失败的条目重新排队')
+
+    run_parser = subparsers.add_parser('run', help='加入队列并在本机启动多个工作进程')
+    run_parser.add_argument('url', help='B站合集或视频URL')
+    run_parser.add_argument('--workers', type=int, default=2, help='工作进程数')
+    run_parser.add_argument('--concurrent', type=int, help='每个工作进程的下载线程数')
+    run_parser.add_argument('--refresh', action='store_true', help='忽略缓存的合集信息，重新枚举')
+    args = parser.parse_args()
+
+    if args.command is None:
+        parser.print_help()
+        return
+
+    from advanced_extractor import AdvancedBilibiliExtractor
+
+    extractor = AdvancedBilibiliExtractor(args.config)
+    if args.output:
+        extractor.config['output_directory'] = args.output
+        extractor.output_dir = Path(args.output)
+        extractor.output_dir.mkdir(parents=True, exist_ok=True)
+    if args.command == 'worker' and args.concurrent:
+        extractor.config['max_concurrent_downloads'] = args.concurrent
+    if args.output:
+        extractor.setup_ydl_options()
+        extractor.setup_archive()
+        extractor.setup_metadata_cache()
+        extractor.setup_content_store()
+        extractor.setup_catalog()
+
+    queue = open_queue(extractor, args.queue)
+    success = True
+    try:
+        if args.command == 'enqueue':
+            counts = enqueue_collection(extractor, queue, args.url, args.refresh)
+            if counts is None:
+                print("❌ 无法获取视频信息")
+                success = False
+            else:
+                print(f"📥 共 {counts['total']} 个条目，新加入 {counts['added']} 个，"
+                      f"归档中已完成 {counts['skipped']} 个")
+                print(f"🗂️ 队列: {queue.db_path}")
+        elif args.command == 'worker':
+            queue_config = extractor.config.get('work_queue', {})
+            worker = QueueWorker(extractor, queue, args.name,
+                                 heartbeat_interval=queue_config.get('heartbeat_interval'),
+                                 poll_interval=queue_config.get('poll_interval', 2.0), wait=args.wait)
+            # 被 terminate 时与 Ctrl+C 相同：停止领取并交还租约
+            signal.signal(signal.SIGTERM, lambda signum, frame: signal.raise_signal(signal.SIGINT))
+            reporter = extractor.start_metrics_reporter()
+            try:
+                stats = worker.run()
+            finally:
+                if reporter is not None:
+                    reporter.stop()
+            print(f"\n📊 {worker.name}: 完成 {stats['completed']}，失败 {stats['failed']}，"
+                  f"重新排队 {stats['retries']}，接手过期租约 {stats['reclaimed']}")
+            for line in extractor.format_policy.summary_lines():
+                print(line)
+            success = stats['failed'] == 0
+        elif args.command == 'status':
+            print_status(queue)
+        elif args.command == 'requeue':
+            print(f"🔁 {queue.requeue_failed()} 个失败的条目重新排队")
+        elif args.command == 'run':
+            success = run_local(args, extractor, queue)
+    finally:
+        queue.close()
+
+    if not success:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YoutubeDL 实例池
+每个工作线程持有一个长期存活的 YoutubeDL 实例，跨条目复用提取器注册表、
+HTTP 连接（keep-alive）、Cookie 和后处理器链，条目间只重置条目级状态
+"""
+
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+import yt_dlp
+
+class YoutubeDLPool:
+    """按线程分配的 YoutubeDL 实例池"""
+
+    def __init__(self, opts: Dict, reuse: bool = True, ydl_class=yt_dlp.YoutubeDL):
+        # 进度和后处理钩子由池统一分发到当前条目
+        self.opts = {k: v for k, v in opts.items() if k not in ('progress_hooks', 'post_hooks')}
+        # reuse=False 时每个条目新建实例，用完即关闭（旧行为，便于对比）
+        self.reuse = reuse
+        # 可替换为 YoutubeDL 子类（如分段下载的 SegmentedYoutubeDL）
+        self.ydl_class = ydl_class
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._instances: List[yt_dlp.YoutubeDL] = []
+        # close() 之后递增，线程中残留的旧实例不再使用
+        self._generation = 0
+
+    def _dispatch_progress(self, d):
+        hook = getattr(self._local, 'progress_hook', None)
+        if hook is not None:
+            hook(d)
+
+    def _dispatch_post(self, filepath):
+        finished = getattr(self._local, 'finished_files', None)
+        if finished is not None:
+            finished.append(filepath)
+
+    def _get_instance(self) -> yt_dlp.YoutubeDL:
+        ydl = getattr(self._local, 'ydl', None)
+        if ydl is None or not self.reuse or self._local.generation != self._generation:
+            ydl = self.ydl_class(self.opts)
+            ydl.add_progress_hook(self._dispatch_progress)
+            ydl.add_post_hook(self._dispatch_post)
+            self._local.ydl = ydl
+            self._local.generation = self._generation
+            self._local.default_outtmpl = dict(ydl.params['outtmpl'])
+            with self._lock:
+                self._instances.append(ydl)
+        return ydl
+
+    @contextmanager
+    def acquire(self, progress_hook: Optional[Callable] = None, outtmpl: str = None):
+        """取得当前线程的实例，返回 (ydl, finished_files)
+
+        finished_files 收集本条目后处理完成的最终文件路径
+        """
+        ydl = self._get_instance()
+
+        # 重置条目级状态
+        ydl.params['outtmpl'] = dict(self._local.default_outtmpl)
+        if outtmpl:
+            ydl.params['outtmpl']['default'] = outtmpl
+        ydl._download_retcode = 0
+        self._local.progress_hook = progress_hook
+        self._local.finished_files = []
+        try:
+            yield ydl, self._local.finished_files
+        finally:
+            self._local.progress_hook = None
+            self._local.finished_files = None
+            if not self.reuse:
+                with self._lock:
+                    self._instances.remove(ydl)
+                self._local.ydl = None
+                ydl.close()
+
+    @property
+    def size(self) -> int:
+        return len(self._instances)
+
+    def close(self):
+        """关闭所有实例（保存 Cookie、关闭连接）"""
+        with self._lock:
+            instances, self._instances = self._instances, []
+            self._generation += 1
+        for ydl in instances:
+            ydl.close()